@@ -0,0 +1,206 @@
+"""Benchmarks of RunMany's own overhead, compared against a stored baseline to catch speed regressions.
+
+# py benchmarks/benchmark.py                          Run, print, and compare to benchmarks/baseline.json.
+# py benchmarks/benchmark.py -o bench_output.json     Also save the results as JSON.
+# py benchmarks/benchmark.py --examples               Also time running the examples, which is never compared.
+# py benchmarks/benchmark.py --save-baseline          Make the medians of several rounds the new baseline.
+
+Each benchmark reports the median of several repeats in seconds, lower is better. The process exits with code 1 when
+any benchmark is slower than its baseline by more than the threshold plus the noise margin the baseline recorded, how
+far its slowest round was from the median. Baselines are only comparable on the same machine. The examples depend on
+which languages are installed, so they are only timed on request and are never part of the baseline.
+"""
+
+import io
+import sys
+import json
+import time
+import statistics
+import pathlib
+import platform
+import argparse
+from tempfile import TemporaryDirectory
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+ROOT = pathlib.Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT.joinpath('src')))  # Benchmark the local source rather than any installed package.
+
+# pylint: disable=wrong-import-position
+from runmany import runmanys  # noqa
+from runmany.parser import Parser  # noqa
+from runmany.runner import Runner  # noqa
+from runmany.sandbox import DirectoryPool  # noqa
+from runmany.settings import Settings  # noqa
+from runmany.util import Printer  # noqa
+
+BASELINE = ROOT.joinpath('benchmarks', 'baseline.json')
+DEFAULT_THRESHOLD = 0.25
+BASELINE_ROUNDS = 5
+PARSE_LINES = (1_000, 10_000, 100_000)
+RUN_SNIPPETS = 50
+SETTINGS_UPDATE = '{"timeout": 5, "show_code": true, "languages": [{"name": "Python", "runs": 2}]}'
+
+
+def median_of(function: Callable[[], Any], repeats: int, number: int = 1) -> float:
+    """The median of `repeats` timings of calling `function` `number` times, divided by `number`."""
+    timings = []
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        for _ in range(number):
+            function()
+        timings.append((time.perf_counter() - start_time) / number)
+    return statistics.median(timings)
+
+
+def synthetic_manyfile(lines: int) -> str:
+    """A .many file of about `lines` lines mixing every section type, comments, and disabled snippets."""
+    block = '''\
+%% A comment line.
+Argv for Python: 1 2 3
+Also: 4 5 6
+Stdin for Python, Print:
+    line one
+    line two
+Python:
+    import sys
+    print(sys.argv[1:], input())
+Also: print('also')
+!Also: print('disabled')
+Print: printed {0}
+Also:
+    printed again {0}
+    and again
+End.
+
+'''
+    block_lines = block.count('\n')
+    blocks = [block.format(i) for i in range(max(1, lines // block_lines))]
+    return 'Settings: {"show_code": true}\n' + ''.join(blocks)
+
+
+def parse(manyfile: str) -> None:
+    printer = Printer(io.StringIO())
+    settings = Settings(printer)
+    runner = Runner(settings, printer)
+    for section in Parser(manyfile, settings, runner, printer):
+        section.run()
+
+
+def run_prints(manyfile: str) -> None:
+    printer = Printer(io.StringIO())
+    settings = Settings(printer)
+    runner = Runner(settings, printer)
+    for section in Parser(manyfile, settings, runner, printer):
+        section.run()
+    with TemporaryDirectory() as directory:
+        runner.run(DirectoryPool(directory))
+    runner.print_results_footer()
+
+
+def benchmark(quick: bool) -> Dict[str, float]:
+    """The timings of RunMany's own overhead, which don't depend on what languages are installed."""
+    repeats = 3 if quick else 7
+    results: Dict[str, float] = {}
+    for lines in PARSE_LINES[:-1] if quick else PARSE_LINES:
+        manyfile = synthetic_manyfile(lines)
+        results[f'parse_{lines}_lines'] = median_of(lambda: parse(manyfile), repeats)
+
+    printer = Printer(io.StringIO())
+    results['settings_construct'] = median_of(lambda: Settings(printer), repeats, 1000)
+    settings = Settings(printer)
+    results['settings_update'] = median_of(lambda: settings.update_with_json(SETTINGS_UPDATE), repeats, 1000)
+
+    manyfile = ''.join(f'Print: snippet {i}\n' for i in range(RUN_SNIPPETS))
+    results['run_overhead_per_program'] = median_of(lambda: run_prints(manyfile), repeats) / RUN_SNIPPETS
+    return results
+
+
+def benchmark_examples(quick: bool) -> Dict[str, float]:
+    """The timings of running each example, which mostly depend on the installed languages so are never compared."""
+    return {f'example_{path.stem}': median_of(lambda: runmanys(path), 1 if quick else 3)  # pylint: disable=W0640
+            for path in sorted(ROOT.joinpath('examples').glob('*.many'))}
+
+
+def baseline_rounds(quick: bool, rounds: int) -> Tuple[Dict[str, float], Dict[str, float]]:
+    """The median of each benchmark over `rounds` rounds, and its noise margin, how much slower than the median its
+    slowest round was as a fraction of the median."""
+    timings: Dict[str, List[float]] = {}
+    for _ in range(rounds):
+        for name, seconds in benchmark(quick).items():
+            timings.setdefault(name, []).append(seconds)
+    results = {name: statistics.median(seconds) for name, seconds in timings.items()}
+    margins = {name: max(seconds) / results[name] - 1 for name, seconds in timings.items()}
+    return results, margins
+
+
+def compare(results: Dict[str, float], baseline: Dict[str, float], margins: Dict[str, float],
+            threshold: float) -> List[str]:
+    """Returns a line for each benchmark slower than its baseline by more than `threshold`, e.g. 0.25 for 25%, plus
+    the baseline's noise margin for it."""
+    regressions = []
+    for name, seconds in results.items():
+        allowed = threshold + margins.get(name, 0.0)
+        if name in baseline and seconds > baseline[name] * (1 + allowed):
+            regressions.append(f'{name} took {seconds:.6f}s, {seconds / baseline[name]:.2f}x its baseline '
+                               f'{baseline[name]:.6f}s, more than the {1 + allowed:.2f}x allowed')
+    return regressions
+
+
+def load_results(path: pathlib.Path) -> Optional[Tuple[Dict[str, float], Dict[str, float]]]:
+    """The results and noise margins saved at `path`, or None if there are none."""
+    try:
+        with open(path, encoding='utf-8') as file:
+            data = json.load(file)
+    except FileNotFoundError:
+        return None
+    return ({name: float(seconds) for name, seconds in data['results'].items()},
+            {name: float(margin) for name, margin in data.get('margins', {}).items()})
+
+
+def save_results(path: pathlib.Path, results: Dict[str, float], margins: Optional[Dict[str, float]] = None) -> None:
+    data: Dict[str, Any] = {'python': platform.python_version(), 'platform': platform.platform(), 'results': results}
+    if margins is not None:
+        data['margins'] = margins
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(data, file, indent=4)
+        file.write('\n')
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description='Benchmarks RunMany\'s own overhead.')
+    parser.add_argument('-o', '--output', metavar='<results-file>', help='the path to save the results JSON to')
+    parser.add_argument('-b', '--baseline', metavar='<baseline-file>', default=str(BASELINE),
+                        help='the path of the baseline results JSON to compare to')
+    parser.add_argument('-t', '--threshold', metavar='<fraction>', type=float, default=DEFAULT_THRESHOLD,
+                        help=f'how much slower than baseline is a regression, defaults to {DEFAULT_THRESHOLD}')
+    parser.add_argument('-q', '--quick', action='store_true', help='skip the largest parse and use fewer repeats')
+    parser.add_argument('-e', '--examples', action='store_true',
+                        help='also time running the examples, which is never compared to the baseline')
+    parser.add_argument('--save-baseline', action='store_true',
+                        help=f'save the medians of {BASELINE_ROUNDS} rounds and their noise as the new baseline')
+    args = parser.parse_args(argv)
+
+    if args.save_baseline:
+        results, margins = baseline_rounds(args.quick, BASELINE_ROUNDS)
+        save_results(pathlib.Path(args.baseline), results, margins)
+    else:
+        results = benchmark(args.quick)
+    baseline, margins = load_results(pathlib.Path(args.baseline)) or ({}, {})
+    if args.examples:
+        results.update(benchmark_examples(args.quick))
+    for name, seconds in results.items():
+        relative = f' ({seconds / baseline[name]:.2f}x baseline)' if baseline.get(name) else ''
+        print(f'{name:<32}{seconds:.6f}s{relative}')
+    if args.output:
+        save_results(pathlib.Path(args.output), results)
+    if args.save_baseline:
+        return 0
+
+    regressions = compare(results, baseline, margins, args.threshold)
+    for regression in regressions:
+        print(f'REGRESSION: {regression}')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,101 @@
+"""RunMany admission module. Decides when programs running at once may start, from the "jobs" limit, each language's
+"max_concurrent" limit, and whether each language's "memory_estimate_mb" fits in the memory currently available."""
+
+import bisect
+import itertools
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from runmany.settings import Language
+
+MEMINFO = '/proc/meminfo'
+RECHECK_SECONDS = 0.5  # How often waiting programs check whether memory was freed by something other than RunMany.
+
+
+def available_memory_mb() -> Optional[float]:
+    """The MiB of memory that can be used without swapping, from /proc/meminfo, or None where there is none."""
+    try:
+        with open(MEMINFO, encoding='ascii') as file:
+            for line in file:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+class Admission:
+    """Hands out job slots to waiting programs most urgent first, skipping those that can't start yet: a program may
+    start once a job slot is free, fewer than its language's "max_concurrent" are running, and its
+    "memory_estimate_mb" fits in the available memory less what the programs already started are estimated to still
+    need. A program is always let start when nothing else is running, so oversized estimates can't deadlock, and a
+    waiting program that can't start never holds up others that can."""
+
+    def __init__(self, jobs: int) -> None:
+        self.jobs = max(1, jobs)
+        self.condition = threading.Condition()
+        self.running: Dict[str, int] = {}
+        self.reserved_mb = 0.0
+        self.budget_mb = available_memory_mb()  # Programs that just started may not have taken their memory yet.
+        self.waiting: List[Tuple[int, int, Language, Any]] = []  # Sorted by rank then by when they started waiting.
+        self.count = itertools.count()
+
+    def fits(self, language: Language) -> bool:
+        total = sum(self.running.values())
+        if total == 0:
+            return True
+        if total >= self.jobs:
+            return False
+        max_concurrent: Optional[int] = language.max_concurrent
+        if max_concurrent is not None and self.running.get(language.name, 0) >= max(1, max_concurrent):
+            return False
+        estimate: Optional[float] = language.memory_estimate_mb
+        if estimate is None or self.budget_mb is None:
+            return True
+        available = available_memory_mb()
+        return self.reserved_mb + estimate <= self.budget_mb and (available is None or estimate <= available)
+
+    def add(self, rank: int, language: Language, item: Any) -> None:
+        """Queues `item`, a program of `language`, to be handed out by take(). Lower ranks are more urgent."""
+        with self.condition:
+            bisect.insort(self.waiting, (rank, next(self.count), language, item))
+            self.condition.notify_all()
+
+    def claim(self, chosen: Callable[[Any], bool]) -> Any:
+        """Waits until the most urgent waiting program that fits is `chosen`, then counts it as running and returns
+        it, or returns None once nothing is waiting. Must hold the condition."""
+        while self.waiting:
+            entry = next((entry for entry in self.waiting if self.fits(entry[2])), None)
+            if entry is not None and chosen(entry[3]):
+                self.waiting.remove(entry)
+                self.running[entry[2].name] = self.running.get(entry[2].name, 0) + 1
+                self.reserved_mb += entry[2].memory_estimate_mb or 0.0
+                self.condition.notify_all()  # The next most urgent may fit too.
+                return entry[3]
+            self.condition.wait(RECHECK_SECONDS)
+        return None
+
+    def take(self) -> Any:
+        """Waits for the most urgent queued item that may start and counts it as running, or returns None once none
+        are queued. Each item taken must be finished."""
+        with self.condition:
+            return self.claim(lambda item: True)
+
+    def finish(self, language: Language) -> None:
+        with self.condition:
+            self.running[language.name] -= 1
+            self.reserved_mb -= language.memory_estimate_mb or 0.0
+            self.condition.notify_all()
+
+    @contextmanager
+    def admit(self, language: Language, rank: int) -> Iterator[None]:
+        """Waits its turn by `rank` until a program of `language` may start, then counts it as running until exiting.
+        For programs not queued with add(), like those a worker couldn't run."""
+        marker = object()
+        self.add(rank, language, marker)
+        with self.condition:
+            self.claim(lambda item: item is marker)
+        try:
+            yield
+        finally:
+            self.finish(language)
@@ -0,0 +1,82 @@
+"""RunMany affinity module. Pins programs to CPU cores for the "cpu_affinity" setting, so the scheduler never migrates
+them mid-run, and optionally keeps RunMany's own threads off those cores. Only on systems with os.sched_setaffinity.
+
+A thread's affinity is inherited by the processes it spawns, so a program is pinned by pinning the thread that spawns
+it for the duration of the program's runs. Unlike a preexec_fn, this is safe when programs are spawned from several
+threads at once."""
+
+import os
+import queue
+from contextlib import contextmanager
+from typing import Any, Iterator, List, Optional, Set
+from runmany.util import Printer
+
+DEDICATED = 'dedicated'
+
+
+def affinity_supported() -> bool:
+    return hasattr(os, 'sched_setaffinity')
+
+
+class CorePool:
+    """Hands out the cores programs run on, one set per program running at once."""
+
+    def __init__(self, program_cores: List[Set[int]], runmany_cores: Optional[Set[int]]) -> None:
+        self.free: 'queue.Queue[Set[int]]' = queue.Queue()
+        for cores in program_cores:
+            self.free.put(cores)
+        self.runmany_cores = runmany_cores  # The cores RunMany's own threads are kept on, if isolated.
+
+    @contextmanager
+    def pinned(self) -> Iterator[Set[int]]:
+        """Pins the current thread, and so the programs it spawns, to free cores until exiting."""
+        cores = self.free.get()
+        previous = os.sched_getaffinity(0)  # pylint: disable=no-member
+        os.sched_setaffinity(0, cores)  # pylint: disable=no-member
+        try:
+            yield cores
+        finally:
+            os.sched_setaffinity(0, previous)  # pylint: disable=no-member
+            self.free.put(cores)
+
+    @contextmanager
+    def isolated(self) -> Iterator[None]:
+        """Keeps the current thread, and the threads it starts, on the cores not used by programs until exiting."""
+        if self.runmany_cores is None:
+            yield
+            return
+        previous = os.sched_getaffinity(0)  # pylint: disable=no-member
+        os.sched_setaffinity(0, self.runmany_cores)  # pylint: disable=no-member
+        try:
+            yield
+        finally:
+            os.sched_setaffinity(0, previous)  # pylint: disable=no-member
+
+
+def make_core_pool(cpu_affinity: Any, isolate: bool, jobs: int, printer: Printer) -> Optional[CorePool]:
+    """The cores to pin programs to for a "cpu_affinity" of a list of cores that every program may use, or "dedicated"
+    for a core of its own for each of the `jobs` programs running at once, taken from the last usable cores.
+    When `isolate` is true and any usable cores are left over, RunMany's own threads are kept on those."""
+    if cpu_affinity is None or cpu_affinity is False:
+        return None
+    if not affinity_supported():
+        printer.print_err('CPU affinity is not supported on this system. Skipping "cpu_affinity".')
+        return None
+    usable = sorted(os.sched_getaffinity(0))  # pylint: disable=no-member
+    jobs = max(1, jobs)
+    if isinstance(cpu_affinity, str) and cpu_affinity.strip().lower() == DEDICATED:
+        chosen = usable[-jobs:]
+        program_cores = [{core} for core in chosen]
+    elif isinstance(cpu_affinity, list) and cpu_affinity and all(isinstance(core, int) for core in cpu_affinity):
+        unusable = sorted(set(cpu_affinity) - set(usable))
+        if unusable:
+            printer.print_err(f'CPU cores {unusable} are not usable, only {usable} are. Skipping "cpu_affinity".')
+            return None
+        chosen = sorted(set(cpu_affinity))
+        program_cores = [set(chosen) for _ in range(jobs)]
+    else:
+        printer.print_err(f'"cpu_affinity" must be null, "{DEDICATED}", or a list of core numbers, not '
+                          f'{cpu_affinity!r}. Skipping "cpu_affinity".')
+        return None
+    leftover = set(usable) - set(chosen)
+    return CorePool(program_cores, leftover if isolate and leftover else None)
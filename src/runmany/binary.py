@@ -0,0 +1,97 @@
+"""RunMany binary module. Captures program output as bytes, never decoding it, for the "binary_output" setting."""
+
+import time
+import locale
+import hashlib
+import threading
+import subprocess
+from contextlib import ExitStack
+from functools import partial
+from tempfile import SpooledTemporaryFile, TemporaryFile
+from typing import IO, Any, Iterator, Optional, Tuple, Union, cast
+from runmany.tracing import NullTracer
+from runmany.util import Stdin
+
+SPOOL_SIZE = 8 * 1024 * 1024  # Output bigger than this many bytes is kept in a temporary file rather than in memory.
+CHUNK_SIZE = 64 * 1024
+
+
+class BinaryOutput(str):
+    """The bytes a program output. As a string it is a summary with the bytes' hash, so equal outputs compare equal
+    without decoding them. The bytes themselves are in `file`, and are read with chunks()."""
+
+    file: IO[bytes]
+    size: int
+    lock: threading.Lock
+
+    def __new__(cls, file: IO[bytes], digest: str, size: int) -> 'BinaryOutput':
+        output = super().__new__(cls, f'{size} bytes of binary output with SHA-256 {digest}')
+        output.file = file
+        output.size = size
+        output.lock = threading.Lock()
+        return output
+
+    def chunks(self) -> Iterator[bytes]:
+        """The bytes from the start. Each chunk is read at its own offset under the lock, so identical runs sharing
+        this output can print it from several threads at once without moving each other's position in `file`."""
+        position = 0
+        while True:
+            with self.lock:
+                self.file.seek(position)
+                chunk = self.file.read(CHUNK_SIZE)
+            if not chunk:
+                return
+            position += len(chunk)
+            yield chunk
+
+
+def spool(source: IO[bytes], file: IO[bytes], digest: Any) -> int:
+    size = 0
+    for chunk in iter(partial(source.read, CHUNK_SIZE), b''):
+        file.write(chunk)
+        digest.update(chunk)
+        size += len(chunk)
+    return size
+
+
+def run_command_binary(command: str, timeout: Optional[float], cwd: Optional[str], stdin: Stdin,
+                       stderr: int, tracer: NullTracer = NullTracer()) -> Tuple[str, Union[int, str], float]:
+    """Like Runnable.run_command with stdout piped, but the output is read into a SpooledTemporaryFile as bytes while
+    it is hashed. Stderr goes to a temporary file and, as with text output, is only appended on non-zero exit codes."""
+    start_time = time.perf_counter()
+    with ExitStack() as stack:
+        stdin_file: Optional[IO[bytes]] = None if isinstance(stdin, str) else stdin
+        if isinstance(stdin, str):  # From a file rather than a pipe, so a child that ignores stdin never blocks us.
+            stdin_file = stack.enter_context(TemporaryFile())
+            stdin_file.write(stdin.encode(locale.getpreferredencoding(False)))
+            stdin_file.seek(0)
+        stderr_file = stack.enter_context(TemporaryFile()) if stderr == subprocess.PIPE else None
+
+        with tracer.span('spawn'):
+            process = stack.enter_context(subprocess.Popen(command, shell=True, cwd=cwd, stdin=stdin_file,
+                                                           stdout=subprocess.PIPE, stderr=stderr_file or stderr))
+        timed_out = threading.Event()
+
+        def kill() -> None:
+            timed_out.set()
+            process.kill()
+
+        timer = threading.Timer(timeout, kill) if timeout is not None else None
+        if timer:
+            timer.start()
+        file: IO[bytes] = SpooledTemporaryFile(max_size=SPOOL_SIZE)  # pylint: disable=consider-using-with
+        digest = hashlib.sha256()
+        with tracer.span('wait'):
+            size = spool(cast(IO[bytes], process.stdout), file, digest)
+            process.wait()
+        time_taken = time.perf_counter() - start_time
+        if timer:
+            timer.cancel()
+
+        if timed_out.is_set():
+            file.close()
+            return f'TIMED OUT OF {timeout:.3f}s LIMIT\n', 'T', time_taken
+        if process.returncode and stderr_file:
+            stderr_file.seek(0)
+            size += spool(stderr_file, file, digest)
+        return BinaryOutput(file, digest.hexdigest(), size), process.returncode, time_taken
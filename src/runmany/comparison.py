@@ -0,0 +1,65 @@
+"""RunMany comparison module. Summarizes how fast programs that ran on the same argv and stdin were relative to each
+other, with the median of each program's repetitions and a bootstrap confidence interval of that median."""
+
+import random
+from typing import List, Optional, Tuple, Union
+
+CONFIDENCE = 0.95
+BOOTSTRAPS = 1000
+
+Competitor = Tuple[int, str, int, Union[int, str], List[float]]  # The run number, language, code line, exit code,
+# and time of each repetition of one run.
+
+
+def median(samples: List[float]) -> float:
+    ordered = sorted(samples)
+    middle = len(ordered) // 2
+    return ordered[middle] if len(ordered) % 2 else (ordered[middle - 1] + ordered[middle]) / 2
+
+
+def confidence_interval(samples: List[float]) -> Optional[Tuple[float, float]]:
+    """The bootstrap percentile interval the true median of `samples` is in with CONFIDENCE, or None for one sample."""
+    if len(samples) < 2:
+        return None
+    rng = random.Random(0)  # Seeded so summaries are repeatable.
+    medians = sorted(median(rng.choices(samples, k=len(samples))) for _ in range(BOOTSTRAPS))
+    tail = (1 - CONFIDENCE) / 2
+    return medians[int(tail * BOOTSTRAPS)], medians[int((1 - tail) * BOOTSTRAPS) - 1]
+
+
+def relative_speed(seconds: float, reference: float) -> str:
+    if seconds == reference:
+        return '1.00x'
+    if seconds > reference:
+        return f'{seconds / reference:.2f}x slower' if reference > 0 else 'slower'
+    return f'{reference / seconds:.2f}x faster' if seconds > 0 else 'faster'
+
+
+def comparison_table(competitors: List[Competitor], baseline: Optional[str] = None) -> List[str]:
+    """The lines of a table of `competitors` from fastest to slowest median time, each relative to the first program
+    in the `baseline` language, or to the fastest program when `baseline` is None or did not succeed.
+    Failed runs are listed last."""
+    succeeded = sorted((competitor for competitor in competitors if competitor[3] == 0 and competitor[4]),
+                       key=lambda competitor: median(competitor[4]))
+    failed = [competitor for competitor in competitors if competitor not in succeeded]
+    reference = next((competitor for competitor in succeeded
+                      if baseline is not None and competitor[1].lower() == baseline.strip().lower()), None)
+    if reference is None and succeeded:
+        reference = succeeded[0]
+    reference_time = median(reference[4]) if reference else 0.0
+
+    rows = [('Run', 'Program', 'Median', f'{CONFIDENCE:.0%} CI', 'Relative')]
+    for competitor in succeeded:
+        run_number, language, line, _, samples = competitor
+        interval = confidence_interval(samples)
+        relative = relative_speed(median(samples), reference_time)
+        if competitor is reference and baseline is not None:
+            relative = 'baseline'
+        rows.append((f'{run_number}.', f'{language} line {line}', f'{median(samples):.3f}s',
+                     f'{interval[0]:.3f}s-{interval[1]:.3f}s' if interval else '-', relative))
+    for run_number, language, line, exit_code, _ in failed:
+        rows.append((f'{run_number}.', f'{language} line {line}', '-', '-', f'[exit code {exit_code}]'))
+
+    widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+    return ['  '.join(cell.rjust(width) if i in (0, 2) else cell.ljust(width)
+                      for i, (cell, width) in enumerate(zip(row, widths))).rstrip() for row in rows]
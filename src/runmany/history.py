@@ -0,0 +1,157 @@
+"""RunMany history module. Records the timings of every run in a local SQLite database and reports the runs that got
+slower since an earlier invocation on the same .many file."""
+
+import json
+import time
+import random
+import socket
+import sqlite3
+import hashlib
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple, Union, cast
+from runmany.remote import Usage
+from runmany.util import Content, PathLike, Printer
+
+COMPARE_TO = ('baseline', 'last')
+DEFAULT_THRESHOLD = 0.1
+SIGNIFICANCE = 0.05
+MIN_SAMPLES = 5  # Fewer samples than this on either side can't show significance, so only the thresholds are used.
+MIN_DIFFERENCE = 0.01  # The seconds slower a run must also be when there are too few samples, to ignore timing noise.
+PERMUTATIONS = 2000
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS invocations (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    file TEXT NOT NULL,
+    started REAL NOT NULL,
+    wall_time REAL NOT NULL,
+    host TEXT NOT NULL,
+    baseline INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS runs (
+    invocation INTEGER NOT NULL REFERENCES invocations (id),
+    line INTEGER NOT NULL,
+    language TEXT NOT NULL,
+    code_hash TEXT NOT NULL,
+    argv TEXT,
+    stdin TEXT,
+    exit_code TEXT NOT NULL,
+    samples TEXT NOT NULL,
+    cpu_time REAL,
+    max_rss INTEGER,
+    version TEXT
+);
+CREATE INDEX IF NOT EXISTS invocations_by_file ON invocations (file, id);
+CREATE INDEX IF NOT EXISTS runs_by_invocation ON runs (invocation);
+'''
+
+Identity = Tuple[int, str, str, Optional[str], Optional[str]]  # The code line, language, code hash, argv, and stdin.
+Timing = Tuple[str, List[float], str]  # The exit code, time of each repetition, and toolchain version of a run.
+# The identity of a run, how much slower it got, its mean times before and after, p-value, and versions before and now.
+Regression = Tuple[Identity, float, float, float, Optional[float], str, str]
+
+
+def code_hash(code: Content) -> str:
+    return hashlib.sha256(code.text.encode('utf-8')).hexdigest()
+
+
+def mean(samples: List[float]) -> float:
+    return sum(samples) / len(samples)
+
+
+def p_value(before: List[float], after: List[float]) -> float:
+    """The one-sided permutation test p-value of `after` being slower than `before` only by chance."""
+    observed = mean(after) - mean(before)
+    pooled = before + after
+    rng = random.Random(0)  # Seeded so reports are repeatable.
+    extreme = 0
+    for _ in range(PERMUTATIONS):
+        rng.shuffle(pooled)
+        extreme += mean(pooled[len(before):]) - mean(pooled[:len(before)]) >= observed
+    return (extreme + 1) / (PERMUTATIONS + 1)
+
+
+def compare(before: Dict[Identity, Timing], after: Dict[Identity, Timing], threshold: float) -> List[Regression]:
+    """Finds the successful runs in both invocations that became more than `threshold` slower, e.g. 0.1 for 10%,
+    and significantly so when there are enough samples to tell or by at least MIN_DIFFERENCE when there are not."""
+    regressions = []
+    for identity, (exit_code, samples, version) in after.items():
+        if identity not in before or exit_code != '0' or before[identity][0] != '0':
+            continue
+        before_samples, before_version = before[identity][1], before[identity][2]
+        if not samples or not before_samples or mean(before_samples) <= 0:
+            continue
+        ratio = mean(samples) / mean(before_samples)
+        if ratio <= 1 + threshold:
+            continue
+        p = None
+        if min(len(samples), len(before_samples)) >= MIN_SAMPLES:
+            p = p_value(before_samples, samples)
+            if p >= SIGNIFICANCE:
+                continue
+        elif mean(samples) - mean(before_samples) < MIN_DIFFERENCE:
+            continue
+        regressions.append((identity, ratio, mean(before_samples), mean(samples), p, before_version, version))
+    return regressions
+
+
+class History:
+    def __init__(self, path: PathLike) -> None:
+        self.connection = sqlite3.connect(str(path))
+        self.connection.executescript(SCHEMA)
+        self.rows: List[Tuple[Identity, Union[int, str], List[float], Optional[Usage], str]] = []
+
+    def add(self, identity: Identity, exit_code: Union[int, str], samples: List[float], usage: Optional[Usage],
+            version: str) -> None:
+        self.rows.append((identity, exit_code, samples, usage, version))
+
+    def save(self, file: str, wall_time: float, baseline: bool) -> int:
+        """Saves the added runs as a new invocation on `file`, returning its id."""
+        with self.connection:
+            cursor = self.connection.execute(
+                'INSERT INTO invocations (file, started, wall_time, host, baseline) VALUES (?, ?, ?, ?, ?)',
+                (file, time.time() - wall_time, wall_time, socket.gethostname(), int(baseline)))
+            invocation = cast(int, cursor.lastrowid)
+            self.connection.executemany(
+                'INSERT INTO runs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                [(invocation, *identity, str(exit_code), json.dumps(samples), usage[0] if usage else None,
+                  usage[1] if usage else None, version) for identity, exit_code, samples, usage, version in self.rows])
+        return invocation
+
+    def find(self, file: str, before: int, compare_to: str) -> Optional[Tuple[int, float]]:
+        """The id and start time of the latest baseline or, for "last", any invocation on `file` before `before`."""
+        only_baselines = 'AND baseline = 1' if compare_to == 'baseline' else ''
+        row = self.connection.execute(f'SELECT id, started FROM invocations WHERE file = ? AND id < ? {only_baselines} '
+                                      'ORDER BY id DESC LIMIT 1', (file, before)).fetchone()
+        return (int(row[0]), float(row[1])) if row else None
+
+    def timings(self, invocation: int) -> Dict[Identity, Timing]:
+        rows = self.connection.execute('SELECT line, language, code_hash, argv, stdin, exit_code, samples, version '
+                                       'FROM runs WHERE invocation = ?', (invocation,))
+        return {(line, language, code, argv, stdin): (exit_code, json.loads(samples), version or '')
+                for line, language, code, argv, stdin, exit_code, samples, version in rows}
+
+    def report(self, printer: Printer, file: str, invocation: int, compare_to: str, threshold: float) -> int:
+        """Prints the runs of `invocation` that regressed since the invocation chosen by `compare_to`.
+        Returns how many did."""
+        found = self.find(file, invocation, compare_to)
+        if found is None:
+            printer.print(f'No {"baseline" if compare_to == "baseline" else "earlier run"} of this file to compare to.')
+            return 0
+        before, started = found
+        after = self.timings(invocation)
+        regressions = compare(self.timings(before), after, threshold)
+        printer.print(f'Compared to the {compare_to} run from {datetime.fromtimestamp(started):%Y-%m-%d %H:%M:%S}:')
+        for (line, language, _, argv, stdin), ratio, before_mean, after_mean, p, before_version, version in regressions:
+            inputs = ''.join(f' with {name} "{text.strip()}"' for name, text in (('argv', argv), ('stdin', stdin))
+                             if text is not None)
+            significance = f', p={p:.3f}' if p is not None else ''
+            upgrade = f', version "{before_version}" is now "{version}"' if before_version != version else ''
+            printer.print(f'Regression: {language} on line {line}{inputs} took {after_mean:.3f}s, {ratio:.2f}x its '
+                          f'{before_mean:.3f}s before{significance}{upgrade}.')
+        plural = '' if len(after) == 1 else 's'
+        printer.print(f'{len(regressions)}/{len(after)} run{plural} regressed by over {threshold:.0%}.')
+        return len(regressions)
+
+    def close(self) -> None:
+        self.connection.close()
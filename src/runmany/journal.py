@@ -0,0 +1,58 @@
+"""RunMany journal module. Durably records every run as it finishes, so an interrupted invocation can be resumed by
+replaying the runs that finished from the journal rather than running them again."""
+
+import os
+import json
+import hashlib
+import threading
+from typing import Any, Dict, List, Optional, Tuple, Union
+from runmany.remote import Usage
+from runmany.util import PathLike
+
+# The output, exit code, time of each repetition, resource usage, command, and calibration baseline of a run.
+Entry = Tuple[str, Union[int, str], List[float], Optional[Usage], str, Optional[float]]
+
+
+def run_identity(*parts: Any) -> str:
+    """The hash identifying a run by everything that decides its result, so only identical runs are replayed."""
+    return hashlib.sha256(json.dumps(parts, default=str).encode('utf-8')).hexdigest()
+
+
+class Journal:
+    def __init__(self, path: PathLike, resume: bool) -> None:
+        """Starts a new journal at `path`, or continues the one there when `resume` is true."""
+        self.entries: Dict[str, Entry] = {}
+        self.lock = threading.Lock()
+        text = ''
+        if resume and os.path.exists(path):
+            with open(path, encoding='utf-8') as file:
+                text = file.read()
+            for line in text.splitlines():
+                try:
+                    record = json.loads(line)
+                    usage = record['usage']
+                    self.entries[record['id']] = (record['output'], record['exit_code'], record['samples'],
+                                                  (usage[0], usage[1]) if usage else None, record['command'],
+                                                  record['baseline'])
+                except (ValueError, KeyError, TypeError, IndexError):
+                    continue  # Likely the last line, cut off by whatever interrupted the journaled invocation.
+        self.file = open(path, 'a' if resume else 'w', encoding='utf-8')  # pylint: disable=consider-using-with
+        if text and not text.endswith('\n'):
+            self.file.write('\n')
+
+    def find(self, identity: str) -> Optional[Entry]:
+        return self.entries.get(identity)
+
+    def add(self, identity: str, entry: Entry) -> None:
+        """Appends a finished run, only returning once it is on disk."""
+        output, exit_code, samples, usage, command, baseline = entry
+        line = json.dumps({'id': identity, 'output': output, 'exit_code': exit_code, 'samples': samples,
+                           'usage': usage, 'command': command, 'baseline': baseline})
+        with self.lock:
+            self.entries[identity] = entry
+            self.file.write(line + '\n')
+            self.file.flush()
+            os.fsync(self.file.fileno())
+
+    def close(self) -> None:
+        self.file.close()
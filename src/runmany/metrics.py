@@ -0,0 +1,127 @@
+"""RunMany metrics module. Collects run statistics and writes them in the Prometheus text format,
+so node_exporter's textfile collector can scrape them."""
+
+import os
+import time
+import threading
+from collections import defaultdict
+from tempfile import NamedTemporaryFile
+from typing import DefaultDict, Dict, List, Tuple, Union
+from runmany.util import PathLike
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+
+def escape_label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    def __init__(self, buckets: Tuple[float, ...] = DURATION_BUCKETS) -> None:
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.count += 1
+        self.sum += value
+
+    def samples(self, name: str, label: str) -> List[str]:
+        lines = [f'{name}_bucket{{{label},le="{format_value(bound)}"}} {count}'
+                 for bound, count in zip(self.buckets, self.counts)]
+        lines.append(f'{name}_bucket{{{label},le="+Inf"}} {self.count}')
+        lines.append(f'{name}_sum{{{label}}} {format_value(self.sum)}')
+        lines.append(f'{name}_count{{{label}}} {self.count}')
+        return lines
+
+
+class Metrics:
+    """Run statistics per language. Safe to record to from concurrent runs."""
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.runs: DefaultDict[str, int] = defaultdict(int)
+        self.failed: DefaultDict[str, int] = defaultdict(int)
+        self.timeouts: DefaultDict[str, int] = defaultdict(int)
+        self.skipped: DefaultDict[str, int] = defaultdict(int)
+        self.durations: DefaultDict[str, Histogram] = defaultdict(Histogram)
+        self.compile_durations: DefaultDict[str, Histogram] = defaultdict(Histogram)
+
+    def record_run(self, language_name: str, exit_code: Union[int, str], duration: float) -> None:
+        with self.lock:
+            self.runs[language_name] += 1
+            if exit_code == 'S':  # Never started as the "total_timeout" ran out, so neither failed nor took any time.
+                self.skipped[language_name] += 1
+                return
+            self.failed[language_name] += exit_code != 0
+            self.timeouts[language_name] += exit_code == 'T'
+            self.durations[language_name].observe(duration)
+
+    def record_compile(self, language_name: str, duration: float) -> None:
+        with self.lock:
+            self.compile_durations[language_name].observe(duration)
+
+    def render(self, cache_hits: int, cache_misses: int, wall_time: float) -> str:
+        def family(name: str, kind: str, description: str, samples: List[str]) -> None:
+            lines.extend((f'# HELP {name} {description}', f'# TYPE {name} {kind}', *samples))
+
+        def per_language(name: str, counts: Dict[str, int]) -> List[str]:
+            return [f'{name}{{language="{escape_label(language)}"}} {count}'
+                    for language, count in sorted(counts.items())]
+
+        def histograms(name: str, histograms: Dict[str, Histogram]) -> List[str]:
+            return [line for language, histogram in sorted(histograms.items())
+                    for line in histogram.samples(name, f'language="{escape_label(language)}"')]
+
+        lookups = cache_hits + cache_misses
+        lines: List[str] = []
+        with self.lock:
+            family('runmany_runs_total', 'counter', 'Programs run per language.',
+                   per_language('runmany_runs_total', self.runs))
+            family('runmany_runs_failed_total', 'counter', 'Programs that exited non-zero or timed out per language.',
+                   per_language('runmany_runs_failed_total', self.failed))
+            family('runmany_timeouts_total', 'counter', 'Programs that timed out per language.',
+                   per_language('runmany_timeouts_total', self.timeouts))
+            family('runmany_runs_skipped_total', 'counter',
+                   'Programs skipped per language because the total timeout ran out.',
+                   per_language('runmany_runs_skipped_total', self.skipped))
+            family('runmany_run_duration_seconds', 'histogram', 'Average time of one repetition of a program.',
+                   histograms('runmany_run_duration_seconds', self.durations))
+            family('runmany_compile_duration_seconds', 'histogram', 'Time spent compiling programs.',
+                   histograms('runmany_compile_duration_seconds', self.compile_durations))
+        family('runmany_cache_hits_total', 'counter', 'Identical runs that reused an earlier execution.',
+               [f'runmany_cache_hits_total {cache_hits}'])
+        family('runmany_cache_misses_total', 'counter', 'Runs that were executed.',
+               [f'runmany_cache_misses_total {cache_misses}'])
+        family('runmany_cache_hit_ratio', 'gauge', 'Fraction of cacheable runs that reused an earlier execution.',
+               [f'runmany_cache_hit_ratio {format_value(cache_hits / lookups if lookups else 0.0)}'])
+        family('runmany_wall_time_seconds', 'gauge', 'Wall time of the whole RunMany invocation.',
+               [f'runmany_wall_time_seconds {format_value(wall_time)}'])
+        family('runmany_last_run_timestamp_seconds', 'gauge', 'Unix time the metrics were written.',
+               [f'runmany_last_run_timestamp_seconds {format_value(time.time())}'])
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def write(path: PathLike, text: str) -> None:
+        """Writes `text` to `path` atomically, so a scraper never sees a partially written file."""
+        path = os.fsdecode(path)
+        directory = os.path.dirname(os.path.abspath(path))
+        with NamedTemporaryFile(mode='w', encoding='utf-8', dir=directory, prefix='.', suffix='.tmp',
+                                delete=False) as file:
+            file.write(text)
+        try:
+            os.chmod(file.name, 0o644)  # Temporary files are private but the scraper may run as another user.
+            os.replace(file.name, path)
+        except OSError:
+            os.remove(file.name)
+            raise
@@ -8,13 +8,16 @@ from typing import Iterator, List, Optional, Type, cast
 from abc import ABC, abstractmethod
 from runmany.settings import Settings, Language
 from runmany.runner import Runner
-from runmany.util import print_err, convert_smart_yes_no, Content
+from runmany.sweeps import expand
+from runmany.util import Printer, convert_smart_yes_no, Content, FileContent
 
 
 class Syntax(ABC):  # pylint: disable=too-few-public-methods
     SETTINGS = 'Settings'
     ARGV = 'Argv'
     STDIN = 'Stdin'
+    FROM_FILE = 'from\\s+file\\b'
+    SWEEP = 'sweep\\b'
     FOR = 'for'
     ALSO = 'Also'
     END_PATTERN = '^End\\s*\\.\\s*$'
@@ -36,8 +39,10 @@ class Syntax(ABC):  # pylint: disable=too-few-public-methods
     HEADER_START = f'^(?=\\S)({SECTION_DISABLER}|{SECTION_SOLOER}|)?\\s*({DISABLER}|{SOLOER}|)?\\s*'
     HEADER_END = '\\s*:'
     SETTINGS_HEADER = HEADER_START + f'({SETTINGS})' + HEADER_END
-    ARGV_HEADER = HEADER_START + f'{ARGV}(?:\\s+{FOR}\\b([^:]*))?' + HEADER_END
-    STDIN_HEADER = HEADER_START + f'{STDIN}(?:\\s+{FOR}\\b([^:]*))?' + HEADER_END
+    ARGV_HEADER = HEADER_START + f'{ARGV}(?:\\s+{SWEEP})?(?:\\s+{FOR}\\b([^:]*))?' + HEADER_END
+    STDIN_HEADER = HEADER_START + f'{STDIN}(?:\\s+{SWEEP})?(?:\\s+{FROM_FILE})?(?:\\s+{FOR}\\b([^:]*))?' + HEADER_END
+    STDIN_FILE_HEADER = HEADER_START + f'{STDIN}(?:\\s+{SWEEP})?\\s+{FROM_FILE}'
+    SWEEP_HEADER = HEADER_START + f'(?:{ARGV}|{STDIN})\\s+{SWEEP}'
     CODE_HEADER = f'{HEADER_START}([^:]*){HEADER_END}'
     ALSO_HEADER = f'^(?=\\S)({DISABLER}|{SOLOER}|)?\\s*{ALSO}' + HEADER_END
 
@@ -125,7 +130,7 @@ class Section(ABC):
                 snippet_first_line = i
             elif not Snippet.line_is_indented(line):
                 self.parser.lines[i] = ''
-                print_err(f'Skipping invalid unindented line {i + 1} "{line}".')
+                self.parser.printer.print_err(f'Skipping invalid unindented line {i + 1} "{line}".')
             i += 1
         add_snippet()
 
@@ -146,8 +151,22 @@ class Section(ABC):
     def get_header_match(line: str) -> Optional['re.Match[str]']:
         pass  # pragma: no cover
 
+    def expand_sweep(self, content: Optional[Content]) -> List[Content]:
+        """The contents made from a snippet's content, one per value of its placeholder if in a sweep section."""
+        if content is None:
+            return []
+        if not re.match(Syntax.SWEEP_HEADER, self.parser.lines[self.first_line]):
+            return [content]
+        try:
+            expanded = expand(content.text)
+        except ValueError as error:
+            self.parser.printer.print_err(f'Invalid sweep {error} on line {content.line_number}. Skipping snippet.')
+            return []
+        return [type(content)(text, content.line_number - 1, content.prefix_lines, content.newline, value)
+                for text, value in expanded]
+
     @abstractmethod
-    def run(self, directory: str) -> None:
+    def run(self) -> None:
         pass  # pragma: no cover
 
     def __iter__(self) -> Iterator[Snippet]:
@@ -167,11 +186,12 @@ class SettingsSection(Section):
     def get_header_match(line: str) -> Optional['re.Match[str]']:
         return re.match(Syntax.SETTINGS_HEADER, line)
 
-    def run(self, _: str) -> None:
+    def run(self) -> None:
         for snippet in self:
             content = snippet.get_content(True, False, False, '\t', '\n')
             if content is not None:
-                self.parser.settings.update_with_json(content.prefixed_text)
+                with self.parser.runner.context.tracer.span('settings update', line=content.line_number):
+                    self.parser.settings.update_with_json(content.prefixed_text)
 
 
 class ArgvSection(Section):
@@ -198,12 +218,10 @@ class ArgvSection(Section):
             content = snippet.get_content(False, False, True, tab, newline)
         return content
 
-    def run(self, _: str) -> None:
+    def run(self) -> None:
         argvs: List[Content] = []
         for snippet in self:
-            argv = self.get_content(snippet)
-            if argv:
-                argvs.append(argv)
+            argvs.extend(self.expand_sweep(self.get_content(snippet)))
         for language_name in self.language_names or self.parser.settings.computed_languages():
             self.parser.runner.set_argvs(language_name, argvs)
 
@@ -213,7 +231,15 @@ class StdinSection(Section):
     def get_header_match(line: str) -> Optional['re.Match[str]']:
         return re.match(Syntax.STDIN_HEADER, line)
 
+    def get_file_content(self, snippet: Snippet) -> Optional[Content]:
+        content = snippet.get_content(False, True, True, '\t', '\n')
+        if content is None:
+            return None
+        return FileContent(content.text.strip(), content.line_number - 1, 0, content.newline)
+
     def get_content(self, snippet: Snippet) -> Optional[Content]:
+        if re.match(Syntax.STDIN_FILE_HEADER, self.parser.lines[self.first_line]):
+            return self.get_file_content(snippet)
         settings = self.parser.settings
         content: Optional[Content] = None
         strip = convert_smart_yes_no(settings.strip_stdin)
@@ -230,11 +256,14 @@ class StdinSection(Section):
             content = snippet.get_content(False, False, True, tab, newline)
         return content
 
-    def run(self, _: str) -> None:
+    def run(self) -> None:
         stdins: List[Content] = []
         for snippet in self:
-            stdin = self.get_content(snippet)
-            if stdin:
+            for stdin in self.expand_sweep(self.get_content(snippet)):
+                if isinstance(stdin, FileContent) and not os.path.isfile(stdin.text):
+                    self.parser.printer.print_err(f'Stdin file "{stdin.text}" on line {stdin.line_number} not found. '
+                                                  'Skipping stdin.')
+                    continue
                 stdins.append(stdin)
         for language_name in self.language_names or self.parser.settings.computed_languages():
             self.parser.runner.set_stdins(language_name, stdins)
@@ -262,23 +291,25 @@ class CodeSection(Section):
             content = snippet.get_content(False, False, True, tab, newline)
         return content
 
-    def run(self, directory: str) -> None:
+    def run(self) -> None:
         for snippet in self:
             for raw_language_name in self.raw_language_names:
                 language_name = Language.normalize(raw_language_name)
                 if language_name not in self.parser.settings:
-                    print_err(f'Language "{raw_language_name.strip()}" on line {self.first_line + 1} '
-                              'not found in settings JSON. Skipping language.')
+                    self.parser.printer.print_err(
+                        f'Language "{raw_language_name.strip()}" on line {self.first_line + 1} '
+                        'not found in settings JSON. Skipping language.')
                     continue
                 code = self.get_content(snippet, self.parser.settings[language_name])
                 if code:
-                    self.parser.runner.run(language_name, code, directory)
+                    self.parser.runner.add(language_name, code)
 
 
 class Parser:
-    def __init__(self, manyfile: str, settings: Settings, runner: Runner) -> None:
+    def __init__(self, manyfile: str, settings: Settings, runner: Runner, printer: Printer) -> None:
         self.settings = settings
         self.runner = runner
+        self.printer = printer
         self.lines = manyfile.splitlines()
         self.first_line = self.get_first_line()
         self.last_line = self.get_last_line()
@@ -314,7 +345,7 @@ class Parser:
                     section_first_line = i
                     section_type = tried_section_type
                 elif line.strip():
-                    print_err(f'Line {i+1} "{line}" is not part of a section. Skipping line.')
+                    self.printer.print_err(f'Line {i+1} "{line}" is not part of a section. Skipping line.')
             elif re.match(Syntax.END_PATTERN, line) or Section.try_get_section_type(line):
                 in_section = False
                 self.sections.append(section_type(self, section_first_line, i - 1))
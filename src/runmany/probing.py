@@ -0,0 +1,148 @@
+"""RunMany probing module. Finds which languages are installed without running any programs in them.
+Results are kept for one RunMany invocation and cached on disk for "probe_ttl" seconds."""
+
+import os
+import re
+import json
+import time
+import shlex
+import shutil
+import threading
+import subprocess
+from tempfile import NamedTemporaryFile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+from runmany.settings import Settings, Language
+
+COMMAND_SEPARATORS = '&&|\\|\\||;|\\|'
+SHELL_BUILTINS = {'cd', 'echo', 'type', 'set', 'export'}
+VERSION_TIMEOUT = 10.0
+
+Probe = Tuple[bool, str]  # Whether a language is installed, and its version if so or why not otherwise.
+
+LOCK = threading.Lock()  # Guards the on disk cache, which every invocation in the process shares.
+
+
+def command_executables(command: str) -> List[str]:
+    executables = []
+    for part in re.split(COMMAND_SEPARATORS, command):
+        try:
+            tokens = shlex.split(part)
+        except ValueError:
+            tokens = part.split()
+        if tokens and '$' not in tokens[0] and tokens[0] not in SHELL_BUILTINS:
+            executables.append(tokens[0])
+    return executables
+
+
+def cache_path(name: str = 'probes.json') -> str:
+    cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(cache_home, 'runmany', name)
+
+
+def load_cache(name: str = 'probes.json') -> Dict[str, Any]:
+    try:
+        with open(cache_path(name), encoding='utf-8') as file:
+            cache = json.load(file)
+        return cache if isinstance(cache, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def save_cache(cache: Dict[str, Any], name: str = 'probes.json') -> None:
+    """Saves atomically, so concurrent RunMany processes never read a partial cache. Failures only lose the cache."""
+    path = cache_path(name)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with NamedTemporaryFile(mode='w', encoding='utf-8', dir=os.path.dirname(path), suffix='.tmp',
+                                delete=False) as file:
+            json.dump(cache, file)
+        os.replace(file.name, path)
+    except OSError:
+        pass
+
+
+def first_line(text: str) -> str:
+    return next((line.strip() for line in text.splitlines() if line.strip()), '')
+
+
+def run_probe(command: str, cwd: Optional[str]) -> Tuple[bool, str]:
+    try:
+        result = subprocess.run(command, shell=True, cwd=cwd, timeout=VERSION_TIMEOUT, check=False,
+                                universal_newlines=True, stdin=subprocess.DEVNULL,
+                                stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    except (OSError, subprocess.TimeoutExpired) as error:
+        return False, str(error)
+    return result.returncode == 0, first_line(result.stdout)
+
+
+def probe_key(language: Language) -> str:
+    identity = language.probe or [language.compile_command, language.command]
+    return json.dumps([identity, language.cwd, os.environ.get('PATH', '')])
+
+
+def do_probe(language: Language, with_version: bool) -> Dict[str, Any]:
+    if language.probe:
+        installed, output = run_probe(language.probe, language.cwd)
+        if installed:
+            return {'installed': True, 'detail': output, 'version': output}
+        return {'installed': False, 'detail': f'probe "{language.probe}" failed', 'version': None}
+    executables = command_executables(language.compile_command or '') + command_executables(language.command)
+    for executable in executables:
+        if not shutil.which(executable):
+            return {'installed': False, 'detail': f'"{executable}" was not found', 'version': None}
+    version = None
+    if with_version and executables:
+        succeeded, output = run_probe(f'"{shutil.which(executables[0])}" --version', language.cwd)
+        version = output if succeeded else ''
+    return {'installed': True, 'detail': version or '', 'version': version}
+
+
+class Probes:
+    """The probes done or loaded by one RunMany invocation, by probe key, so invocations in the same process with
+    different settings or PATH never see each other's. Only the on disk cache is shared."""
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.results: Dict[str, Dict[str, Any]] = {}
+
+    def probe(self, language: Language, with_version: bool = False) -> Probe:
+        """Probes whether `language` is installed, by running its "probe" command if it has one, or otherwise by
+        looking up its command's executables on PATH. Versions come from the probe's output or the first executable's
+        --version, and are only found when `with_version` is true or a "probe" command is used."""
+        key = probe_key(language)
+        ttl: float = language.probe_ttl or 0.0
+        with self.lock:
+            result = self.results.get(key)
+        if result is None and ttl > 0:
+            with LOCK:
+                cached = load_cache().get(key)
+            if cached and time.time() - cached.get('time', 0) < ttl:
+                result = cached
+                with self.lock:
+                    self.results[key] = cached
+        if result is None or (with_version and result['installed'] and result['version'] is None):
+            result = do_probe(language, with_version)
+            result['time'] = time.time()
+            with self.lock:
+                self.results[key] = result
+            if ttl > 0:
+                with LOCK:
+                    cache = {other: value for other, value in load_cache().items()
+                             if time.time() - value.get('time', 0) < ttl}
+                    cache[key] = result
+                    save_cache(cache)
+        return result['installed'], result['detail']
+
+
+def probe_languages(settings: Settings, with_version: bool = False) -> Dict[str, Probe]:
+    """Probes every language in `settings` at once, by language name."""
+    languages = sorted(settings.computed_languages().values(), key=lambda language: Language.normalize(language.name))
+    probes = Probes()
+    with ThreadPoolExecutor(max_workers=max(1, min(len(languages), os.cpu_count() or 1))) as executor:
+        results = executor.map(lambda language: probes.probe(language, with_version), languages)
+        return {language.name: result for language, result in zip(languages, results)}
+
+
+def installed_languages(settings: Settings) -> List[str]:
+    return sorted(name for name, (installed, _) in probe_languages(settings).items() if installed)
@@ -0,0 +1,181 @@
+"""RunMany remote module. Sends programs to runmany-worker processes and collects their results."""
+
+import os
+import json
+import base64
+import socket
+import threading
+from typing import Any, Dict, List, Optional, Tuple, Union, TYPE_CHECKING
+from runmany.settings import Language
+from runmany.util import Content, Printer
+
+if TYPE_CHECKING:
+    from runmany.runner import Runnable  # pragma: no cover
+
+UNIX_PREFIX = 'unix:'
+ENCODING = 'utf-8'
+CONNECT_TIMEOUT = 5.0
+TOKEN_VARIABLE = 'RUNMANY_WORKER_TOKEN'  # The environment variable holding the token when "worker_token" is null.
+DEFAULT_HOST = '127.0.0.1'  # Only this machine can connect unless another host is given.
+
+Usage = Tuple[float, int]  # The CPU time in seconds and peak resident memory in kilobytes of a run.
+# The run number, output, exit code, time of each repetition, and resource usage if known of each run of a program.
+Results = List[Tuple[int, str, Union[int, str], List[float], Optional[Usage]]]
+
+
+class WorkerError(Exception):
+    """An error a worker replied with, e.g. for a program it could not run, as opposed to a lost connection."""
+
+
+def parse_address(address: str) -> Union[str, Tuple[str, int]]:
+    if address.startswith(UNIX_PREFIX):
+        return address[len(UNIX_PREFIX):]
+    host, _, port = address.strip().rpartition(':')
+    return host or DEFAULT_HOST, int(port)
+
+
+def worker_token(token: Optional[str]) -> str:
+    """`token`, otherwise the token in the RUNMANY_WORKER_TOKEN environment variable, or '' if there is none."""
+    return token if token is not None else os.environ.get(TOKEN_VARIABLE, '')
+
+
+def connect(address: str, timeout: Optional[float]) -> socket.socket:
+    parsed = parse_address(address)
+    if isinstance(parsed, str):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)  # pylint: disable=no-member
+        sock.settimeout(timeout)
+        try:
+            sock.connect(parsed)
+        except OSError:
+            sock.close()
+            raise
+        return sock
+    sock = socket.create_connection(parsed, timeout)
+    sock.settimeout(None)  # Programs may take a long time, the timeout is only for connecting.
+    return sock
+
+
+def send_message(sock: socket.socket, message: Dict[str, Any]) -> None:
+    sock.sendall(json.dumps(message).encode(ENCODING) + b'\n')
+
+
+def receive_message(sock: socket.socket) -> Dict[str, Any]:
+    with sock.makefile('rb') as file:
+        line = file.readline()
+    if not line.endswith(b'\n'):
+        raise ConnectionError('connection closed before a full message was received')
+    message = json.loads(line.decode(ENCODING))
+    if 'error' in message:
+        raise WorkerError(message['error'])
+    return message  # type: ignore
+
+
+def request(address: str, message: Dict[str, Any], timeout: Optional[float] = CONNECT_TIMEOUT) -> Dict[str, Any]:
+    with connect(address, timeout) as sock:
+        send_message(sock, message)
+        return receive_message(sock)
+
+
+def encode_bytes(data: bytes) -> str:
+    """`data`, such as the output of a program with binary output, as text that can be sent as JSON."""
+    return base64.b64encode(data).decode('ascii')
+
+
+def decode_bytes(text: str) -> bytes:
+    return base64.b64decode(text.encode('ascii'), validate=True)
+
+
+def encode_content(content: Optional[Content]) -> Optional[List[Any]]:
+    if content is None:
+        return None
+    return [content.text, content.line_number - 1, content.prefix_lines, content.newline]
+
+
+def decode_content(data: Optional[List[Any]]) -> Optional[Content]:
+    if data is None:
+        return None
+    return Content(*data)
+
+
+def encode_runnable(runnable: 'Runnable') -> Dict[str, Any]:
+    """The message to run `runnable`. The worker runs it with its own commands for the language, not those sent."""
+    settings = {key: value for key, value in runnable.settings.dict.items()
+                if key not in ('computed_languages', 'worker_token')}
+    runs = [[run_number, encode_content(argv), encode_content(stdin)] for run_number, argv, stdin in runnable.runs]
+    return {'type': 'run', 'settings': settings, 'language': runnable.language.dict,
+            'code': encode_content(runnable.code), 'runs': runs, 'encoding': runnable.printer.encoding}
+
+
+class RemoteWorker:  # pylint: disable=too-few-public-methods
+    def __init__(self, address: str, languages: List[str], jobs: int) -> None:
+        self.address = address
+        self.languages = set(languages)
+        self.jobs = max(1, jobs)
+        self.busy = 0
+        self.alive = True
+
+
+class RemotePool:
+    def __init__(self, addresses: List[str], token: str, printer: Printer) -> None:
+        self.printer = printer
+        self.token = token
+        self.lock = threading.Lock()
+        self.workers: List[RemoteWorker] = []
+        if not token:
+            printer.print_err(f'Workers need a "worker_token" setting or {TOKEN_VARIABLE} environment variable. '
+                              'Skipping workers.')
+            return
+        for address in addresses:
+            try:
+                info = request(address, {'type': 'info', 'token': token})
+                self.workers.append(RemoteWorker(address, info['languages'], info['jobs']))
+            except (OSError, ValueError, KeyError, TypeError, WorkerError) as error:
+                printer.print_err(f'Worker "{address}" is unavailable "{error}". Skipping worker.')
+
+    @property
+    def jobs(self) -> int:
+        return sum(worker.jobs for worker in self.workers)
+
+    def choose(self, language_name: str) -> Optional[RemoteWorker]:
+        with self.lock:
+            capable = [worker for worker in self.workers if worker.alive and language_name in worker.languages]
+            if not capable:
+                return None
+            worker = min(capable, key=lambda worker: worker.busy / worker.jobs)
+            worker.busy += 1
+            return worker
+
+    def run(self, runnable: 'Runnable') -> Optional[Tuple[bytes, Results]]:
+        """Runs `runnable` on the least busy capable worker, retrying elsewhere if a worker is lost.
+        Returns the printed output and results, or `None` if no capable worker remains.
+        The worker is sent the time left before the "total_timeout" runs out, and keeps to it."""
+        message = {**encode_runnable(runnable), 'token': self.token, 'total_timeout': runnable.context.total_timeout}
+        language_name = Language.normalize(runnable.language.name)
+        while True:
+            worker = self.choose(language_name)
+            if worker is None:
+                return None
+            try:
+                message['time_left'] = runnable.context.timeout(None)
+                response = request(worker.address, message)
+                results: Results = [(run_number, output, exit_code, [float(sample) for sample in samples],
+                                     (float(usage[0]), int(usage[1])) if usage else None)
+                                    for run_number, output, exit_code, samples, usage in response['results']]
+                return decode_bytes(response['output']), results
+            except WorkerError as error:  # The worker is fine, only this program could not be run.
+                runnable.printer.print_err(f'Worker "{worker.address}" could not run {runnable.language.name} on line '
+                                           f'{runnable.code.line_number} "{error}". Skipping program.')
+                return b'', []
+            except (OSError, ValueError, KeyError, TypeError) as error:
+                with self.lock:
+                    worker.alive = False
+                self.printer.print_err(f'Lost worker "{worker.address}" "{error}". Retrying on another worker.')
+            finally:
+                with self.lock:
+                    worker.busy -= 1
+
+    def __str__(self) -> str:
+        return str([(worker.address, worker.alive, worker.busy) for worker in self.workers])  # pragma: no cover
+
+    def __repr__(self) -> str:
+        return str(self)  # pragma: no cover
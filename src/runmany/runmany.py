@@ -2,18 +2,26 @@
 
 import io
 import sys
+import time
+import hashlib
 import pathlib
 import argparse
-from contextlib import redirect_stdout
 from tempfile import TemporaryDirectory
-from typing import List, Union, Optional, TextIO, cast
+from typing import List, Union, Optional, TextIO, Tuple, cast
 
 sys.path.insert(0, str(pathlib.Path(__file__).parent.parent))  # Dumb hack so project can be tested locally.
 
 # pylint: disable=wrong-import-position
-from runmany.util import PathLike, JsonLike, nullcontext, debugging  # noqa
+from runmany.util import PathLike, JsonLike, Printer, nullcontext, debugging  # noqa
 from runmany.settings import Settings  # noqa
 from runmany.runner import Runner  # noqa
+from runmany.tracing import NullTracer, Tracer  # noqa
+from runmany.probing import probe_languages  # noqa
+from runmany.history import History, COMPARE_TO, DEFAULT_THRESHOLD  # noqa
+from runmany.journal import Journal  # noqa
+from runmany.remote import decode_bytes  # noqa
+from runmany.sharding import Shard, load_partial, merge_partials, parse_shard, write_partial  # noqa
+from runmany.sandbox import DirectoryPool  # noqa
 from runmany.parser import Parser  # noqa
 
 
@@ -24,19 +32,74 @@ def load_manyfile(manyfile: Union[PathLike, str], from_string: bool) -> str:
         return file.read()
 
 
-def run(manyfile: Union[PathLike, str], settings: JsonLike, outfile: TextIO, from_string: bool) -> None:
-    manyfile = load_manyfile(manyfile, from_string)
-    settings = Settings.from_json(settings)
-    runner = Runner(settings)
-    parser = Parser(manyfile, settings, runner)
-    with redirect_stdout(outfile), TemporaryDirectory() as directory:
-        for section in parser:
-            section.run(directory)
-        runner.print_results_footer()
+def run(manyfile: Union[PathLike, str], settings: JsonLike, outfile: TextIO, from_string: bool,
+        trace: Optional[PathLike] = None, metrics_file: Optional[PathLike] = None,
+        history: Optional[PathLike] = None, compare_to: Optional[str] = None,
+        regression_threshold: float = DEFAULT_THRESHOLD, mark_baseline: bool = False,
+        sweep_file: Optional[PathLike] = None, journal: Optional[PathLike] = None, resume: bool = False,
+        deadline: Optional[float] = None, shard: Optional[Shard] = None, shard_file: Optional[PathLike] = None,
+        balance_shards: bool = False, errfile: Optional[TextIO] = None) -> int:
+    """Returns how many runs regressed since the run `compare_to` chose. Errors go to `errfile`, or stderr if None."""
+    tracer = Tracer() if trace is not None else NullTracer()
+    history_store = History(history) if history is not None else None
+    journal_store = Journal(journal, resume) if journal is not None else None
+    file = '<string>' if from_string else str(pathlib.Path(cast(str, manyfile)).resolve())
+    try:
+        printer = Printer(outfile, errfile)
+        with tracer.span('load'):
+            manyfile = load_manyfile(manyfile, from_string)
+        with tracer.span('settings'):
+            settings = Settings.from_json(settings, printer)
+        if resume and journal_store is None:
+            printer.print_err('Can only resume when there is a journal file. Skipping resume.')
+        if shard is not None and shard_file is None:
+            printer.print_err(f'Can only run shard {shard[0]}/{shard[1]} when there is a shard file to write its '
+                              'results to. Skipping shard.')
+            shard = None
+        runner = Runner(settings, printer, tracer, history_store, journal_store, deadline, shard, balance_shards)
+        with tracer.span('parse'):
+            parser = Parser(manyfile, settings, runner, printer)
+        with tracer.span('plan'):
+            for section in parser:
+                section.run()
+        with tracer.span('execute'), TemporaryDirectory() as directory:
+            runner.run(DirectoryPool(directory))
+        with tracer.span('footer'):
+            runner.print_results_footer()
+        if metrics_file is not None:
+            runner.write_metrics(metrics_file)
+        if sweep_file is not None:
+            runner.sweep.export(sweep_file)
+        if shard is not None:
+            write_partial(cast(PathLike, shard_file),
+                          runner.get_partial(hashlib.sha256(manyfile.encode('utf-8')).hexdigest()))
+        if compare_to is not None and (history_store is None or compare_to not in COMPARE_TO):
+            printer.print_err(f'Can only compare to {" or ".join(COMPARE_TO)} when there is a history file, '
+                              f'not "{compare_to}". Skipping comparison.')
+            compare_to = None
+        if history_store is None:
+            return 0
+        invocation = history_store.save(file, time.perf_counter() - runner.start_time, mark_baseline)
+        if compare_to is None:
+            return 0
+        return history_store.report(printer, file, invocation, compare_to, regression_threshold)
+    finally:
+        if history_store is not None:
+            history_store.close()
+        if journal_store is not None:
+            journal_store.close()
+        if trace is not None:
+            tracer.write(trace)
 
 
-def runmany(manyfile: Union[PathLike, str], settings: JsonLike = None,
-            outfile: Optional[Union[PathLike, TextIO]] = None, from_string: bool = False) -> None:
+def runmany(manyfile: Union[PathLike, str], settings: JsonLike = None,  # pylint: disable=too-many-arguments
+            outfile: Optional[Union[PathLike, TextIO]] = None, from_string: bool = False,
+            trace: Optional[PathLike] = None, metrics_file: Optional[PathLike] = None,
+            history: Optional[PathLike] = None, compare_to: Optional[str] = None,
+            regression_threshold: float = DEFAULT_THRESHOLD, mark_baseline: bool = False,
+            sweep_file: Optional[PathLike] = None, journal: Optional[PathLike] = None, resume: bool = False,
+            deadline: Optional[float] = None, shard: Optional[Shard] = None, shard_file: Optional[PathLike] = None,
+            balance_shards: bool = False, errfile: Optional[TextIO] = None) -> int:
     """Runs `manyfile` with the settings from `settings` JSON, outputting the results to stdout or `outfile`.
 
     Args:
@@ -48,8 +111,38 @@ def runmany(manyfile: Union[PathLike, str], settings: JsonLike = None,
           output to, or `None` to send output to stdout. Defaults to `None`.
         - `from_string` (optional bool): When `True`, `manyfile` is read as a string rather than a file path.
           Defaults to `False`.
+        - `trace` (optional PathLike | None): The file path to write a Chrome trace event JSON file of the run to,
+          viewable in chrome://tracing or Perfetto, or `None` to not trace. Defaults to `None`.
+        - `metrics_file` (optional PathLike | None): The file path to atomically write run statistics to in the
+          Prometheus text format, e.g. for node_exporter's textfile collector, or `None` to not. Defaults to `None`.
+        - `history` (optional PathLike | None): The file path of a SQLite database to record the timings of every run
+          to, or `None` to not record them. Defaults to `None`.
+        - `compare_to` (optional str | None): `"baseline"` or `"last"` to report the runs that got slower since the
+          latest baseline or latest run of the same file in `history`, or `None` to not compare. Defaults to `None`.
+        - `regression_threshold` (optional float): How much slower a run must be to count as a regression, e.g. `0.1`
+          for 10%. Defaults to `0.1`.
+        - `mark_baseline` (optional bool): When `True`, this run is recorded as the baseline to compare later runs to.
+          Defaults to `False`.
+        - `sweep_file` (optional PathLike | None): The file path to write the timings of swept runs and how each
+          program's time grows to, as JSON if it ends with .json and as CSV otherwise, or `None` to not.
+          Defaults to `None`.
+        - `journal` (optional PathLike | None): The file path to durably record every run to as it finishes, so an
+          interrupted run can be resumed, or `None` to not. Defaults to `None`.
+        - `resume` (optional bool): When `True`, runs already recorded in `journal` by an interrupted run of the same
+          file are replayed rather than run again. Otherwise `journal` is started over. Defaults to `False`.
+        - `deadline` (optional float | None): The seconds the whole run may take, overriding the `"total_timeout"`
+          setting, or `None` to use the setting. Defaults to `None`.
+        - `shard` (optional Tuple[int, int] | None): `(k, n)` to only run the programs of shard k of n, e.g. on one of n
+          machines, writing their results to `shard_file` for merging, or `None` to run every program.
+          Defaults to `None`.
+        - `shard_file` (optional PathLike | None): The file path to write the results of `shard` to, required with
+          `shard`. Defaults to `None`.
+        - `balance_shards` (optional bool): When `True`, programs are split between shards by their languages'
+          `"expected_time"` so shards take about as long, rather than by a hash of each snippet. Defaults to `False`.
+        - `errfile` (optional TextIO | None): The opened file object to send RunMany's error messages to, or `None` to
+          send them to stderr. Defaults to `None`.
 
-    Returns: `None`
+    Returns: (int) 1 if any run regressed compared to `compare_to` and 0 otherwise.
     """
     def opener() -> TextIO:
         if outfile is None:
@@ -59,10 +152,19 @@ def runmany(manyfile: Union[PathLike, str], settings: JsonLike = None,
         return open(cast(PathLike, outfile), 'w', encoding='utf-8')
 
     with opener() as output_file:
-        run(manyfile, settings, output_file, from_string)
+        regressions = run(manyfile, settings, output_file, from_string, trace, metrics_file, history, compare_to,
+                          regression_threshold, mark_baseline, sweep_file, journal, resume, deadline, shard, shard_file,
+                          balance_shards, errfile)
+        return 1 if regressions else 0
 
 
-def runmanys(manyfile: Union[PathLike, str], settings: JsonLike = None, from_string: bool = False) -> str:
+def runmanys(manyfile: Union[PathLike, str], settings: JsonLike = None,  # pylint: disable=too-many-arguments
+             from_string: bool = False, trace: Optional[PathLike] = None, metrics_file: Optional[PathLike] = None,
+             history: Optional[PathLike] = None, compare_to: Optional[str] = None,
+             regression_threshold: float = DEFAULT_THRESHOLD, mark_baseline: bool = False,
+             sweep_file: Optional[PathLike] = None, journal: Optional[PathLike] = None, resume: bool = False,
+             deadline: Optional[float] = None, shard: Optional[Shard] = None, shard_file: Optional[PathLike] = None,
+             balance_shards: bool = False, errfile: Optional[TextIO] = None) -> str:
     """Runs `manyfile` with the settings from `settings` JSON, returning the results as a string.
 
     Args:
@@ -72,31 +174,143 @@ def runmanys(manyfile: Union[PathLike, str], settings: JsonLike = None, from_str
           When `None`, all default settings are used. Defaults to `None`
         - `from_string` (optional bool): When `True`, `manyfile` is read as a string rather than a file path.
           Defaults to `False`.
+        - `trace` (optional PathLike | None): The file path to write a Chrome trace event JSON file of the run to,
+          viewable in chrome://tracing or Perfetto, or `None` to not trace. Defaults to `None`.
+        - `metrics_file` (optional PathLike | None): The file path to atomically write run statistics to in the
+          Prometheus text format, e.g. for node_exporter's textfile collector, or `None` to not. Defaults to `None`.
+        - `history` (optional PathLike | None): The file path of a SQLite database to record the timings of every run
+          to, or `None` to not record them. Defaults to `None`.
+        - `compare_to` (optional str | None): `"baseline"` or `"last"` to report the runs that got slower since the
+          latest baseline or latest run of the same file in `history`, or `None` to not compare. Defaults to `None`.
+        - `regression_threshold` (optional float): How much slower a run must be to count as a regression, e.g. `0.1`
+          for 10%. Defaults to `0.1`.
+        - `mark_baseline` (optional bool): When `True`, this run is recorded as the baseline to compare later runs to.
+          Defaults to `False`.
+        - `sweep_file` (optional PathLike | None): The file path to write the timings of swept runs and how each
+          program's time grows to, as JSON if it ends with .json and as CSV otherwise, or `None` to not.
+          Defaults to `None`.
+        - `journal` (optional PathLike | None): The file path to durably record every run to as it finishes, so an
+          interrupted run can be resumed, or `None` to not. Defaults to `None`.
+        - `resume` (optional bool): When `True`, runs already recorded in `journal` by an interrupted run of the same
+          file are replayed rather than run again. Otherwise `journal` is started over. Defaults to `False`.
+        - `deadline` (optional float | None): The seconds the whole run may take, overriding the `"total_timeout"`
+          setting, or `None` to use the setting. Defaults to `None`.
+        - `shard` (optional Tuple[int, int] | None): `(k, n)` to only run the programs of shard k of n, e.g. on one of n
+          machines, writing their results to `shard_file` for merging, or `None` to run every program.
+          Defaults to `None`.
+        - `shard_file` (optional PathLike | None): The file path to write the results of `shard` to, required with
+          `shard`. Defaults to `None`.
+        - `balance_shards` (optional bool): When `True`, programs are split between shards by their languages'
+          `"expected_time"` so shards take about as long, rather than by a hash of each snippet. Defaults to `False`.
+        - `errfile` (optional TextIO | None): The opened file object to send RunMany's error messages to, or `None` to
+          send them to stderr. Defaults to `None`.
 
     Returns: (str) The results of the run that would normally appear on stdout as a string.
     """
     with io.StringIO() as output_file:
-        run(manyfile, settings, output_file, from_string)
+        run(manyfile, settings, output_file, from_string, trace, metrics_file, history, compare_to,
+            regression_threshold, mark_baseline, sweep_file, journal, resume, deadline, shard, shard_file,
+            balance_shards, errfile)
         output_file.seek(0)
         return output_file.read()
 
 
+def merge_shards(shard_files: List[PathLike], outfile: TextIO) -> None:
+    """Prints the output and footer of the shard results in `shard_files` as one run of the whole file would have."""
+    printer = Printer(outfile)
+    programs, footer_settings, wall_time = merge_partials([load_partial(path) for path in shard_files], printer)
+    runner = Runner(Settings.from_json(footer_settings, printer), printer)
+    for program in programs:
+        printer.print_raw(decode_bytes(program['output']))
+        runner.record_merged(program['results'])
+    runner.start_time = time.perf_counter() - wall_time
+    runner.print_results_footer()
+
+
+def print_languages(settings: JsonLike, outfile: TextIO) -> None:
+    """Prints whether each language in `settings` is installed, along with its version or what is missing."""
+    printer = Printer(outfile)
+    probes = probe_languages(Settings.from_json(settings, printer), True)
+    width = max(map(len, probes), default=0)
+    for name, (installed, detail) in probes.items():
+        printer.print(f'{name:<{width}}  {"installed" if installed else "missing  "}  {detail}'.rstrip())
+
+
+def shard_type(text: str) -> Tuple[int, int]:
+    try:
+        return parse_shard(text)
+    except ValueError as error:
+        raise argparse.ArgumentTypeError(str(error)) from error
+
+
 def cmdline(argv: List[str]) -> None:
     """The command line parser for runmany. Usually called via "runmany <argv>" in terminal but can be called from code.
 
     Args:
         - `argv` (List[str]): The space separated args that would normally be given on the command line.
 
-    Returns: `None`
+    Returns: `None`, but exits with code 1 if any run regressed compared to `--compare-to`.
     """
     description = 'Runs a .many file. Full documentation: https://github.com/discretegames/runmany/blob/main/README.md'
     parser = argparse.ArgumentParser(prog='runmany', description=description)
-    parser.add_argument('manyfile', metavar='<input-file>', help='the path to the .many file to run')
+    parser.add_argument('manyfile', metavar='<input-file>', nargs='?', help='the path to the .many file to run')
     parser.add_argument('-s', '--settings', metavar='<settings-file>',
                         help='the path to the .json settings file to use which overrides any embedded settings')
     parser.add_argument('-o', '--outfile', metavar='<output-file>', help='the path to the file output is redirected to')
+    parser.add_argument('-t', '--trace', metavar='<trace-file>',
+                        help='the path to write a Chrome trace event .json file of where the run spent its time to')
+    parser.add_argument('-m', '--metrics-file', metavar='<metrics-file>',
+                        help='the path to write run statistics to in the Prometheus text format, e.g. a .prom file')
+    parser.add_argument('--history', metavar='<history-file>',
+                        help='the path of the SQLite database to record the timings of every run to')
+    parser.add_argument('--compare-to', choices=COMPARE_TO,
+                        help='report runs that got slower since the latest baseline or last run in the history')
+    parser.add_argument('--regression-threshold', metavar='<fraction>', type=float, default=DEFAULT_THRESHOLD,
+                        help=f'how much slower a run must be to count as a regression, defaults to {DEFAULT_THRESHOLD}')
+    parser.add_argument('--mark-baseline', action='store_true',
+                        help='record this run in the history as the baseline to compare later runs to')
+    parser.add_argument('--sweep-file', metavar='<sweep-file>',
+                        help='the path to write the timings of swept runs to, as JSON if it ends with .json else CSV')
+    parser.add_argument('--journal', metavar='<journal-file>',
+                        help='the path to durably record every run to as it finishes, so the run can be resumed')
+    parser.add_argument('--resume', action='store_true',
+                        help='replay the runs already recorded in the journal instead of running them again')
+    parser.add_argument('--deadline', metavar='<seconds>', type=float,
+                        help='the seconds the whole run may take, after which runs are skipped, like "total_timeout"')
+    parser.add_argument('--shard', metavar='<k/n>', type=shard_type,
+                        help='only run the programs of shard k of n, writing their results to --shard-file to merge')
+    parser.add_argument('--shard-file', metavar='<shard-file>',
+                        help='the path to write the results of --shard to, defaults to shard<k>.json')
+    parser.add_argument('--balance-shards', action='store_true',
+                        help='split programs between shards by their expected time rather than by a hash')
+    parser.add_argument('--merge', metavar='<shard-file>', nargs='+',
+                        help='print the merged output of the --shard results files instead of running')
+    parser.add_argument('-l', '--languages', action='store_true',
+                        help='list which languages are installed along with their versions instead of running')
     args = parser.parse_args(argv)
-    runmany(args.manyfile, args.settings, args.outfile)
+    if args.languages:
+        print_languages(args.settings, sys.stdout)
+        return
+    if args.merge:
+        with open(args.outfile, 'w', encoding='utf-8') if args.outfile else nullcontext(sys.stdout) as outfile:
+            merge_shards(args.merge, outfile)
+        return
+    if args.manyfile is None:
+        parser.error('the following arguments are required: <input-file>')
+    if args.compare_to and not args.history:
+        parser.error('--compare-to requires --history')
+    if args.resume and not args.journal:
+        parser.error('--resume requires --journal')
+    if (args.shard_file or args.balance_shards) and not args.shard:
+        parser.error('--shard-file and --balance-shards require --shard')
+    if args.shard and not args.shard_file:
+        args.shard_file = f'shard{args.shard[0]}.json'
+    if runmany(args.manyfile, args.settings, args.outfile, trace=args.trace, metrics_file=args.metrics_file,
+               history=args.history, compare_to=args.compare_to, regression_threshold=args.regression_threshold,
+               mark_baseline=args.mark_baseline, sweep_file=args.sweep_file, journal=args.journal, resume=args.resume,
+               deadline=args.deadline, shard=args.shard, shard_file=args.shard_file,
+               balance_shards=args.balance_shards):
+        sys.exit(1)
 
 
 def main() -> None:
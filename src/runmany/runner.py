@@ -1,23 +1,54 @@
 """RunMany runner module. Handles running the code snippets and generating the output."""
 
 import os
+import re
 import time
+import random
+import threading
 import subprocess
+from contextlib import ExitStack
+from concurrent.futures import ThreadPoolExecutor, Future
+from functools import lru_cache
 from pathlib import PurePath
 from pprint import pformat
 from collections import defaultdict
-from typing import List, DefaultDict, Dict, Optional, Union, Tuple, cast
+from typing import Any, Callable, ContextManager, List, DefaultDict, Dict, Optional, Union, Tuple, cast
 from tempfile import NamedTemporaryFile
 from runmany.settings import Settings, Language
-from runmany.util import Content, convert_smart_yes_no
+from runmany.sandbox import DirectoryPool
+from runmany.remote import RemotePool, Results, Usage, encode_bytes, worker_token
+from runmany.timing import precise_timing_supported, run_command_precise
+from runmany.tracing import NullTracer
+from runmany.metrics import Metrics
+from runmany.probing import Probes
+from runmany.history import History, code_hash
+from runmany.comparison import Competitor, comparison_table
+from runmany.binary import BinaryOutput, run_command_binary
+from runmany.sweeps import Sweep
+from runmany.affinity import CorePool, make_core_pool
+from runmany.admission import Admission
+from runmany.journal import Entry, Journal, run_identity
+from runmany.scheduling import Durations, expected_time
+from runmany.sharding import FOOTER_SETTINGS, Shard, assign_shards, output_hash
+from runmany.util import Content, FileContent, PathLike, Printer, Stdin, convert_smart_yes_no
 
 DIVIDER_CHAR, SUBDIVIDER_CHAR, DIVIDER_WIDTH = '*', '-', 60
+SKIPPED = 'S'  # The exit code of runs that never started because the "total_timeout" ran out.
+
+PlannedRun = Tuple[int, Optional[Content], Optional[Content]]  # The run number, argv, and stdin of one run.
+# The unstripped output, exit code, time of each repetition, and resource usage (when precisely timed) of one run.
+Execution = Tuple[str, Union[int, str], List[float], Optional[Usage]]
+Repetition = Tuple[str, Union[int, str], float, Optional[Usage]]  # The output, exit code, time, and usage of one.
+Inputs = Tuple[Optional[str], Optional[str]]  # The argv and stdin text of a run.
+Compilation = Tuple[str, Union[int, str], float, str]  # The output, exit code, time, and command of a compile step.
+CacheKey = Tuple[Any, ...]
 
 
 class Placeholders:  # pylint: disable=too-few-public-methods
     prefix = '$'
     ARGV = 'argv'
     CODE = 'code'
+    LINE = 'line'  # The .many line the code starts on, or in line directives the line after the directive.
     # For file .../dir/file.ext the parts are:
     RAWDIR = 'rawdir'        # .../dir
     DIR = 'dir'              # ".../dir"
@@ -29,6 +60,56 @@ class Placeholders:  # pylint: disable=too-few-public-methods
     STEM = 'stem'            # file
     EXT = 'ext'              # .ext
     SEP = 'sep'              # /
+    FILES = 'files'  # Every $file of the batch in batch compile commands, otherwise just $file.
+    DIRS = 'dirs'    # Every $dir of the batch in batch compile commands, otherwise just $dir.
+
+    @classmethod
+    def names(cls) -> List[str]:
+        return [value for key, value in vars(cls).items() if key.isupper()]
+
+
+class CommandTemplate:
+    """A command split into literal text and placeholders once, so filling it in is a single pass where longer
+    placeholder names always win, e.g. $rawdir is never $raw then dir, and filled in text is never filled again."""
+
+    PATTERN = re.compile(re.escape(Placeholders.prefix) +
+                         f'({"|".join(sorted(Placeholders.names(), key=len, reverse=True))})')
+
+    def __init__(self, command: str) -> None:
+        self.command = command
+        self.implicit = Placeholders.prefix not in command  # Then the file and any argv are appended.
+        self.segments: List[Tuple[str, Optional[str]]] = []  # Each literal text and the placeholder after it, if any.
+        position = 0
+        for match in self.PATTERN.finditer(command):
+            self.segments.append((command[position:match.start()], match.group(1)))
+            position = match.end()
+        self.segments.append((command[position:], None))
+
+    @property
+    def placeholders(self) -> List[str]:
+        return [placeholder for _, placeholder in self.segments if placeholder is not None]
+
+    def fill(self, fills: Dict[str, str]) -> str:
+        """The command with each placeholder replaced by its value in `fills`. Placeholders without one are kept."""
+        if self.implicit:
+            command = f'{self.command} {fills[Placeholders.FILE]}'
+            argv = fills.get(Placeholders.ARGV)
+            return f'{command} {argv}' if argv else command
+        return ''.join(text if placeholder is None else text + fills.get(placeholder, Placeholders.prefix + placeholder)
+                       for text, placeholder in self.segments)
+
+    def __str__(self) -> str:
+        return ''.join(text if placeholder is None else f'{text}<{placeholder}>' for text, placeholder in self.segments)
+
+    def __repr__(self) -> str:
+        return f'CommandTemplate({self.command!r})'
+
+
+@lru_cache(maxsize=None)
+def command_template(command: str) -> CommandTemplate:
+    """The template of `command`, made once per distinct command. Its `segments` and `placeholders` show how RunMany
+    reads the command, and its string form marks each placeholder like "gcc <file> -o <branch>"."""
+    return CommandTemplate(command)
 
 
 class PathParts:
@@ -47,33 +128,172 @@ class PathParts:
         self.parts[Placeholders.STEM] = purepath.stem
         self.parts[Placeholders.EXT] = purepath.suffix
         self.parts[Placeholders.SEP] = os.sep
-
-    @staticmethod
-    def fill_part(command: str, part: str, fill: str) -> str:
-        return command.replace(f'{Placeholders.prefix}{part}', fill)
-
-    def fill_command(self, command: str, argv: str, code: str) -> str:
-        if Placeholders.prefix not in command:
-            command += f' {self.parts[Placeholders.FILE]}'
-            if argv:
-                command += f' {argv}'
-        else:
-            for part, fill in self.parts.items():
-                command = self.fill_part(command, part, fill)
-            command = self.fill_part(command, Placeholders.ARGV, argv)
-            command = self.fill_part(command, Placeholders.CODE, code)
-        return command
+        self.parts[Placeholders.FILES] = self.parts[Placeholders.FILE]  # A program on its own is a batch of one.
+        self.parts[Placeholders.DIRS] = self.parts[Placeholders.DIR]
+
+    def fill_command(self, command: str, argv: str, code: str, line_number: int = 1) -> str:
+        return command_template(command).fill({**self.parts, Placeholders.ARGV: argv, Placeholders.CODE: code,
+                                               Placeholders.LINE: str(line_number)})
+
+
+class RunCache:
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.executions: Dict[CacheKey, 'Future[Execution]'] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def run(self, key: CacheKey, execute: Callable[[], Execution], counted: bool = True) -> Execution:
+        """Executes identical runs only once. Whichever run claims `key` first executes it, so no run ever
+        waits on one that hasn't started, even when programs run concurrently or out of order.
+        Only `counted` lookups, those of programs rather than e.g. of calibration baselines, count as hits or misses."""
+        with self.lock:
+            execution = self.executions.get(key)
+            claimed = execution is None
+            if execution is None:
+                execution = self.executions[key] = Future()
+                self.misses += counted
+            else:
+                self.hits += counted
+        if claimed:
+            try:
+                execution.set_result(execute())
+            except BaseException as error:
+                execution.set_exception(error)
+                raise
+        return execution.result()
+
+    def close(self) -> None:
+        """Closes the files of cached binary outputs, as they may be printed again until no more programs run."""
+        with self.lock:
+            for execution in self.executions.values():
+                output = execution.result()[0] if execution.done() and not execution.exception() else None
+                if isinstance(output, BinaryOutput):
+                    output.file.close()
+
+
+class RunContext:  # pylint: disable=too-few-public-methods
+    """The state shared by every program run in one RunMany invocation."""
+
+    def __init__(self, tracer: Optional[NullTracer] = None, journal: Optional[Journal] = None) -> None:
+        self.cache = RunCache()
+        self.probes = Probes()
+        self.tracer = tracer or NullTracer()
+        self.journal = journal
+        self.metrics = Metrics()
+        self.cores: Optional[CorePool] = None
+        self.deadline: Optional[float] = None  # The time.perf_counter() the "total_timeout" runs out at.
+        self.total_timeout: Optional[float] = None
+
+    def timeout(self, timeout: Optional[float]) -> Optional[float]:
+        """`timeout` shortened to the time left before the deadline, so no program runs past it."""
+        if self.deadline is None:
+            return timeout
+        left = max(0.0, self.deadline - time.perf_counter())
+        return left if timeout is None else min(timeout, left)
+
+    def expired(self) -> bool:
+        return self.deadline is not None and time.perf_counter() >= self.deadline
+
+    def skipped(self) -> Execution:
+        return f'SKIPPED, THE {self.total_timeout:.3f}s TOTAL TIMEOUT RAN OUT\n', SKIPPED, [], None
+
+    def pinned(self) -> ContextManager[Any]:
+        """Pins the programs the current thread spawns to their cores while in it, if "cpu_affinity" is set."""
+        return self.cores.pinned() if self.cores else ExitStack()
 
 
 class Runnable:
-    def __init__(self, settings: Settings, language: Language, code: Content, filename: str):
+    def __init__(self, settings: Settings, language: Language, code: Content, runs: List[PlannedRun],
+                 printer: Printer, context: RunContext):
         self.settings = settings
+        self.printer = printer
         self.language = language
         self.code = code
-        self.filename = filename
+        self.runs = runs
+        self.context = context
+        self.filename = ''
+        self.parts: Optional[PathParts] = None  # The parts of `filename`, found once it is written.
+        self.directory: Optional[str] = None
+        self.compilation: Optional[Compilation] = None
+        self.prepared: Optional['Future[bool]'] = None  # Set when the program is prepared ahead of time.
+        self.measured: Dict[int, Execution] = {}  # Executions by run number that were run ahead of printing.
+        self.replays: Dict[int, Entry] = {}  # Runs by run number that finished in a resumed invocation.
+        if context.journal:
+            for run_number, argv, stdin in runs:
+                entry = context.journal.find(self.get_identity(run_number, argv, stdin))
+                if entry is not None:
+                    self.replays[run_number] = entry
+
+    @property
+    def replayed(self) -> bool:
+        """Whether every run is replayed from the journal, so the program need not even be written or compiled."""
+        return bool(self.runs) and len(self.replays) == len(self.runs)
+
+    def get_identity(self, run_number: int, argv: Optional[Content], stdin: Optional[Content]) -> str:
+        return run_identity(run_number, self.language.name, self.language.command, self.language.compile_command,
+                            self.language.extension, self.language.cwd, self.language.timeout, self.language.runs,
+                            self.language.stderr, bool(self.language.precise_time), self.code.prefixed_text,
+                            argv.text if argv else None, stdin.text if stdin else None, isinstance(stdin, FileContent))
+
+    def write_file(self, directory: str) -> None:
+        with self.context.tracer.span('write file', language=self.language.name, line=self.code.line_number):
+            with NamedTemporaryFile(mode='w', suffix=self.language.extension, dir=directory, delete=False) as file:
+                self.filename = file.name
+                self.parts = PathParts(file.name)
+                file.write(self.get_file_text())
+
+    def get_file_text(self) -> str:
+        """The code as written to its file. Code that keeps its .many line numbers starts with the language's line
+        directive when it has one, rather than with a blank line for every line above it in the .many file."""
+        directive: Optional[str] = self.language.line_directive
+        if not directive or not self.code.prefix_lines:
+            return self.code.prefixed_text
+        template = command_template(directive)
+        if not template.implicit:
+            directive = template.fill({**cast(PathParts, self.parts).parts,
+                                       Placeholders.LINE: str(self.code.prefix_lines + 1)})
+        return directive + self.code.newline + self.code.text
+
+    def prepare(self, pool: DirectoryPool, compile_alone: bool = True) -> bool:
+        """Writes the program to a sandbox and compiles it, unless it is compiled in a batch with others, returning
+        whether it can be run. Programs may be prepared on another thread while earlier programs run."""
+        if self.language.skip_missing:
+            installed, reason = self.context.probes.probe(self.language)
+            if not installed:
+                self.printer.print_err(f'Cannot run {self.language.name} on line {self.code.line_number}, '
+                                       f'it is not installed ({reason}). Skipping program.')
+                return False
+        self.directory = pool.acquire()
+        self.write_file(self.directory)
+        if self.language.compile_command and compile_alone and not self.context.expired():
+            self.compilation = self.compile()
+        return True
+
+    def compile(self) -> Compilation:
+        command = cast(PathParts, self.parts).fill_command(self.language.compile_command, '', self.code.text,
+                                                           self.code.line_number)
+        with self.context.tracer.span('compile', language=self.language.name, line=self.code.line_number) as args:
+            output, exit_code, time_taken = self.run_command(command, self.context.timeout(self.language.timeout),
+                                                             self.language.cwd, None, subprocess.PIPE,
+                                                             self.get_stderr(), self.context.tracer)
+            args['exit_code'] = exit_code
+        self.context.metrics.record_compile(self.language.name, time_taken)
+        return output, exit_code, time_taken, command
+
+    def run_all(self, pool: DirectoryPool) -> Results:
+        if not self.replayed and not (self.prepared.result() if self.prepared else self.prepare(pool)):
+            return []
+        try:
+            with self.context.pinned():
+                return [(run_number, *self.run(run_number, argv, stdin)) for run_number, argv, stdin in self.runs]
+        finally:
+            if self.directory is not None:
+                pool.release(self.directory)
 
     def get_command(self, argv: Optional[Content]) -> str:
-        return PathParts(self.filename).fill_command(self.language.command, argv.text if argv else '', self.code.text)
+        return cast(PathParts, self.parts).fill_command(self.language.command, argv.text if argv else '',
+                                                        self.code.text, self.code.line_number)
 
     def get_stderr(self) -> int:
         stderr = convert_smart_yes_no(self.language.stderr)
@@ -84,88 +304,195 @@ class Runnable:
         return subprocess.DEVNULL
 
     @staticmethod
-    def run_command(command: str, timeout: Optional[float], cwd: Optional[str],
-                    stdin: Optional[str], stdout: int, stderr: int) -> Tuple[str, Union[int, str], float]:
+    def run_command(command: str, timeout: Optional[float], cwd: Optional[str], stdin: Stdin, stdout: int,
+                    stderr: int, tracer: NullTracer = NullTracer()) -> Tuple[str, Union[int, str], float]:
+        """Like subprocess.run but spawning and waiting on the process are traced separately."""
         start_time = time.perf_counter()
-        try:
-            result = subprocess.run(command,
-                                    input=stdin,
-                                    timeout=timeout,
-                                    cwd=cwd,
-                                    shell=True,
-                                    check=False,
-                                    universal_newlines=True,  # Keep for 3.6 backwards compatibility.
-                                    stdout=stdout,
-                                    stderr=stderr)
-            time_taken = time.perf_counter() - start_time
-        except subprocess.TimeoutExpired:
-            time_taken = time.perf_counter() - start_time
-            output = f'TIMED OUT OF {timeout:.3f}s LIMIT\n'
-            exit_code: Union[int, str] = 'T'
-        else:
-            output = result.stdout
-            exit_code = result.returncode
-            if exit_code and stderr == subprocess.PIPE:
-                output += result.stderr
+        with tracer.span('spawn'):
+            process = subprocess.Popen(command,
+                                       stdin=subprocess.PIPE if isinstance(stdin, str) else stdin,
+                                       cwd=cwd,
+                                       shell=True,
+                                       universal_newlines=True,  # Keep for 3.6 backwards compatibility.
+                                       stdout=stdout,
+                                       stderr=stderr)
+        with process, tracer.span('wait'):
+            try:
+                result_stdout, result_stderr = process.communicate(stdin if isinstance(stdin, str) else None, timeout)
+                time_taken = time.perf_counter() - start_time
+            except subprocess.TimeoutExpired:
+                time_taken = time.perf_counter() - start_time
+                process.kill()  # Then wait on it when leaving the with block, as subprocess.run does.
+                return f'TIMED OUT OF {timeout:.3f}s LIMIT\n', 'T', time_taken
+        output = result_stdout
+        exit_code: Union[int, str] = process.returncode
+        if exit_code and stderr == subprocess.PIPE:
+            output += result_stderr
         return output, exit_code, time_taken
 
-    def run(self, run_number: int, argv: Optional[Content], stdin: Optional[Content]) -> Tuple[str, bool]:
-        command = self.get_command(argv)
-        stdin_text = stdin.text if stdin else None
+    def get_cache_key(self, argv: Optional[Content], stdin: Optional[Content], stderr: int) -> Optional[CacheKey]:
+        """The key runs share a single execution by. It has the stripped code rather than the code as written to its
+        file, so the same snippet on different lines shares one, unless a command takes the line as $line."""
+        if self.language.runs != 1 or self.language.nondeterministic:
+            return None
+        commands = (self.language.command, self.language.compile_command)
+        uses_line = any(command and Placeholders.LINE in command_template(command).placeholders for command in commands)
+        return (*commands, self.language.extension, self.language.cwd, self.language.timeout, stderr,
+                bool(self.language.binary_output), bool(self.language.precise_time), self.language.line_directive,
+                self.code.text, self.code.line_number if uses_line else None,
+                argv.text if argv else None, stdin.text if stdin else None, isinstance(stdin, FileContent))
+
+    def repeat(self, command: str, stdin: Optional[Content], stderr: int, last: bool) -> Repetition:
+        """Runs one repetition of a run. Only the output of the last repetition is kept."""
+        with ExitStack() as stack:
+            stdin_data: Stdin = stdin.text if stdin else None
+            if isinstance(stdin, FileContent):  # Passed as the program's stdin as is, and reopened every repetition.
+                stdin_data = stack.enter_context(open(stdin.text, 'rb'))
+            run_stdout, run_stderr = (subprocess.PIPE, stderr) if last else (subprocess.DEVNULL, subprocess.DEVNULL)
+            timeout = self.context.timeout(self.language.timeout)
+            args = (command, timeout, self.language.cwd, stdin_data, run_stdout, run_stderr, self.context.tracer)
+            if last and self.language.binary_output:
+                return (*run_command_binary(command, timeout, self.language.cwd, stdin_data, stderr,
+                                            self.context.tracer), None)
+            if self.language.precise_time and precise_timing_supported():
+                return run_command_precise(*args)
+            return (*self.run_command(*args), None)
+
+    @staticmethod
+    def add_repetition(execution: Execution, repetition: Repetition) -> Execution:
+        _, _, samples, usage = execution
+        output, exit_code, time_taken, repetition_usage = repetition
+        if repetition_usage is not None:
+            usage = (usage[0] + repetition_usage[0], max(usage[1], repetition_usage[1])) if usage else repetition_usage
+        samples.append(time_taken)
+        return output, exit_code, samples, usage
+
+    def execute(self, command: str, stdin: Optional[Content], stderr: int, runs: Optional[int] = None) -> Execution:
+        runs = self.language.runs if runs is None else runs
+        execution: Execution = 'NO RUNS OCCURRED\n', 'N', [], None
+        for run_num in range(1, runs + 1):
+            execution = self.add_repetition(execution, self.repeat(command, stdin, stderr, run_num == runs))
+        return execution
+
+    def get_baseline(self) -> float:
+        """The average time the language takes to run an empty program, measured once per command and directory."""
+        def measure() -> Execution:
+            with NamedTemporaryFile(mode='w', suffix=self.language.extension,
+                                    dir=os.path.dirname(self.filename), delete=False) as file:
+                empty_filename = file.name
+            parts = PathParts(empty_filename)
+            if self.language.compile_command:
+                self.run_command(parts.fill_command(self.language.compile_command, '', ''),
+                                 self.context.timeout(self.language.timeout),
+                                 self.language.cwd, None, subprocess.DEVNULL, subprocess.DEVNULL)
+            command = parts.fill_command(self.language.command, '', '')
+            return self.execute(command, None, subprocess.DEVNULL, max(1, self.language.runs))
+        key = ('baseline', self.language.command, self.language.compile_command, self.language.extension,
+               self.language.cwd, self.language.timeout, bool(self.language.precise_time))
+        _, _, samples, _ = self.context.cache.run(key, measure, False)
+        return sum(samples) / len(samples)
+
+    def run(self, run_number: int, argv: Optional[Content], stdin: Optional[Content]) -> Execution:
+        tracer = self.context.tracer
+        with tracer.span('run', language=self.language.name, line=self.code.line_number, run=run_number) as args:
+            execution = self.traced_run(run_number, argv, stdin)
+            args['exit_code'] = execution[1]
+        return execution
+
+    def traced_run(self, run_number: int, argv: Optional[Content], stdin: Optional[Content]) -> Execution:
+        replay = self.replays.get(run_number)
+        command = replay[4] if replay else self.get_command(argv)
         stderr = self.get_stderr()
+        tracer = self.context.tracer
 
         if self.settings.show_runs:
-            self.start_printing_headline(run_number)
-
-        output = 'NO RUNS OCCURRED\n'
-        exit_code: Union[int, str] = 'N'
-        total_time = 0.0
-        for run_num in range(1, self.language.runs + 1):
-            if run_num == self.language.runs:
-                run_stdout = subprocess.PIPE
-                run_stderr = stderr
-            else:
-                run_stdout = run_stderr = subprocess.DEVNULL
-            output, exit_code, time_taken = self.run_command(
-                command, self.language.timeout, self.language.cwd, stdin_text, run_stdout, run_stderr)
-            total_time += time_taken
+            with tracer.span('print'):
+                self.start_printing_headline(run_number)
+
+        key = self.get_cache_key(argv, stdin, stderr)
+        execution: Execution
+        cached = False
+        compile_time: Optional[float] = None
+        if replay:
+            execution = replay[0], replay[1], replay[2], replay[3]
+        elif self.compilation and self.compilation[1] != 0:  # Show why compiling failed instead of running.
+            execution = self.compilation[0], self.compilation[1], [], None
+            compile_time, command = self.compilation[2], self.compilation[3]
+        elif run_number in self.measured:
+            execution = self.measured[run_number]
+        elif self.context.expired():
+            execution = self.context.skipped()
+        elif key is None:
+            execution = self.execute(command, stdin, stderr)
+        else:
+            execution = self.context.cache.run(key, lambda: self.execute(command, stdin, stderr))
+            cached = True
+        output, exit_code, samples, usage = execution
+        baseline: Optional[float] = None
+        calibrate = self.language.show_time and self.language.calibrate_time
+        if self.settings.show_runs and calibrate and exit_code != SKIPPED and compile_time is None:
+            baseline = replay[5] if replay else self.get_baseline()
+        if self.context.journal and not replay and exit_code != SKIPPED and not isinstance(output, BinaryOutput):
+            self.context.journal.add(self.get_identity(run_number, argv, stdin),
+                                     (output, exit_code, samples, usage, command, baseline))
 
         strip = convert_smart_yes_no(self.language.strip_output)
-        if strip is None:
+        if isinstance(output, BinaryOutput):
+            pass  # Binary output is never decoded so can't be stripped.
+        elif strip is None:
             output = output.strip('\r\n')
         elif strip:
             output = output.strip()
 
         if self.settings.show_runs:
-            self.finish_printing_headline(total_time, exit_code, command)
-            self.print_results(argv, stdin, output)
-        return output, exit_code == 0
+            with tracer.span('print'):
+                cpu_time = usage[0] if usage else None
+                self.finish_printing_headline(sum(samples), exit_code, command, cpu_time, baseline, compile_time)
+                self.print_results(argv, stdin, output)
+        if isinstance(output, BinaryOutput) and not cached:  # Cached outputs are closed along with the cache.
+            output.file.close()
+        return output, exit_code, samples, usage
 
     def start_printing_headline(self, run_number: int) -> None:
         if not self.settings.minimalist:
-            print(DIVIDER_CHAR * DIVIDER_WIDTH, flush=True)
-        print(f'{run_number}. {self.language.name}', end='', flush=True)
-
-    def finish_printing_headline(self, total_time: float, exit_code: Union[str, int], command: str) -> None:
+            self.printer.print(DIVIDER_CHAR * DIVIDER_WIDTH)
+        self.printer.print(f'{run_number}. {self.language.name}', end='')
+
+    def finish_printing_headline(self, total_time: float, exit_code: Union[str, int], command: str,
+                                 cpu_time: Optional[float] = None, baseline: Optional[float] = None,
+                                 compile_time: Optional[float] = None) -> None:
+        """Ends the headline of a run. A run whose compile step failed never ran, so `command` is the compile command
+        and its `compile_time` is shown instead."""
         headline = []
         if self.language.show_time:
             runs: int = self.language.runs
-            if runs <= 1:
+            if compile_time is not None:
+                time_str = f'{compile_time:.3f}s compile'
+            elif runs <= 1:
                 time_str = f'{total_time:.3f}s'
+                if cpu_time is not None:
+                    time_str += f', {cpu_time:.3f}s cpu'
             else:
                 avg_time = total_time / runs
                 time_str = f'{avg_time:.3f}s avg over {runs} runs, {total_time:.3f}s total'
+                if cpu_time is not None:
+                    time_str += f', {cpu_time / runs:.3f}s cpu avg'
+            if baseline is not None:
+                time_str += f', {baseline:.3f}s baseline'
             headline.append(f' ({time_str})')
         if exit_code != 0:
             headline.append(f' [exit code {exit_code}]')
         if self.language.show_command:
             headline.append(f' > {command}')
-        print(''.join(headline), flush=True)
+        self.printer.print(''.join(headline))
 
     def print_result_part(self, title: str, text: str, line_number: int, strip: bool) -> None:
         if not self.settings.minimalist:
-            print(f'{f" {title} line {line_number} ":{SUBDIVIDER_CHAR}^{DIVIDER_WIDTH}}', flush=True)
-        print(text.strip('\r\n') if strip else text, flush=True)
+            self.printer.print(f'{f" {title} line {line_number} ":{SUBDIVIDER_CHAR}^{DIVIDER_WIDTH}}')
+        if isinstance(text, BinaryOutput):
+            self.printer.print_bytes(text.chunks())
+        else:
+            self.printer.print(text.strip('\r\n') if strip else text)
 
     def print_results(self, argv: Optional[Content], stdin: Optional[Content], output: str) -> None:
         if not self.settings.minimalist:
@@ -174,22 +501,42 @@ class Runnable:
             if self.language.show_argv and argv:
                 self.print_result_part('argv at', argv.text, argv.line_number, True)
             if self.language.show_stdin and stdin:
-                self.print_result_part('stdin at', stdin.text, stdin.line_number, True)
+                title = 'stdin file at' if isinstance(stdin, FileContent) else 'stdin at'
+                self.print_result_part(title, stdin.text, stdin.line_number, True)
         if self.language.show_output:
             self.print_result_part('output from', output, self.code.line_number, False)
         for _ in range(self.language.spacing):
             # print annoyingly does not use os.linesep, so just repeat blank prints for consistency.
-            print(flush=True)
+            self.printer.print()
 
 
 class Runner:
-    def __init__(self, settings: Settings) -> None:
+    def __init__(self, settings: Settings, printer: Printer, tracer: Optional[NullTracer] = None,
+                 history: Optional[History] = None, journal: Optional[Journal] = None,
+                 total_timeout: Optional[float] = None, shard: Optional[Shard] = None,
+                 balance_shards: bool = False) -> None:
         self.settings = settings
+        self.printer = printer
+        self.history = history
+        self.runnables: List[Runnable] = []
+        self.context = RunContext(tracer, journal)
+        self.planned_runs = 0
         self.total_runs = 0
         self.successful_runs = 0
+        self.skipped_runs = 0
+        self.total_timeout = total_timeout  # Overrides the "total_timeout" setting when not None.
         self.argvs: DefaultDict[str, List[Content]] = defaultdict(list)
         self.stdins: DefaultDict[str, List[Content]] = defaultdict(list)
         self.equal_outputs: DefaultDict[str, List[int]] = defaultdict(list)
+        self.competitors: DefaultDict[Inputs, List[Competitor]] = defaultdict(list)
+        self.sweep = Sweep()
+        self.admission = Admission(1)
+        self.durations: Optional[Durations] = None  # The expected durations of programs, when run longest first.
+        self.shard = shard
+        self.balance_shards = balance_shards
+        self.indexes: Dict[Runnable, int] = {}  # The index of each program among all the file's programs.
+        self.partial_programs: List[Dict[str, Any]] = []  # The output and results of each program run in this shard.
+        self.compare = False  # Whether programs are compared, as "compare" asks unless sharding.
         self.start_time = time.perf_counter()
 
     def set_argvs(self, language_name: str, argvs: List[Content]) -> None:
@@ -198,29 +545,350 @@ class Runner:
     def set_stdins(self, language_name: str, stdins: List[Content]) -> None:
         self.stdins[language_name] = stdins
 
-    def run(self, language_name: str, code: Content, directory: str) -> None:
-        language = self.settings[language_name]
-        with NamedTemporaryFile(mode='w', suffix=language.extension, dir=directory, delete=False) as file:
-            file.write(code.prefixed_text)
-            runnable = Runnable(self.settings, language, code, file.name)
+    def get_pairs(self, language: Language, language_name: str,
+                  code: Content) -> Optional[List[Tuple[Optional[Content], Optional[Content]]]]:
+        argvs = self.argvs[language_name] or [cast(Content, None)]  # Weird cast here since mypy was being a jerk.
+        stdins = self.stdins[language_name] or [cast(Content, None)]
+        if str(language.pairing).strip().lower() != 'zip':
+            return [(argv, stdin) for argv in argvs for stdin in stdins]
+        if len(argvs) == 1:
+            argvs = argvs * len(stdins)
+        elif len(stdins) == 1:
+            stdins = stdins * len(argvs)
+        elif len(argvs) != len(stdins):
+            self.printer.print_err(f'Cannot zip {len(argvs)} argvs with {len(stdins)} stdins for {language.name} '
+                                   f'on line {code.line_number}. Skipping program.')
+            return None
+        return list(zip(argvs, stdins))
+
+    def add(self, language_name: str, code: Content) -> None:
+        with self.context.tracer.span('plan', language=language_name, line=code.line_number):
+            self.plan(language_name, code)
+
+    def plan(self, language_name: str, code: Content) -> None:
+        settings = self.settings.snapshot()
+        language = settings[language_name]
+        pairs = self.get_pairs(language, language_name, code)
+        if pairs is None:
+            return
+        runs: List[PlannedRun] = []
+        for argv, stdin in pairs:
+            self.planned_runs += 1
+            runs.append((self.planned_runs, argv, stdin))
+        printer = Printer(self.printer.outfile, self.printer.errfile, settings.show_errors)  # As of the program's line.
+        self.runnables.append(Runnable(settings, language, code, runs, printer, self.context))
+
+    def record(self, runnable: Runnable, results: Results) -> None:
+        runs: int = runnable.language.runs
+        for run_number, output, exit_code, samples, _ in results:
+            self.total_runs += 1
+            self.successful_runs += exit_code == 0
+            self.skipped_runs += exit_code == SKIPPED
+            self.context.metrics.record_run(runnable.language.name, exit_code, sum(samples) / max(1, runs))
+            if self.settings.show_equal:
+                self.equal_outputs[output].append(run_number)
+        if self.compare:
+            inputs = self.get_inputs(runnable)
+            for run_number, _, exit_code, samples, _ in results:
+                self.competitors[inputs[run_number]].append(
+                    (run_number, runnable.language.name, runnable.code.line_number, exit_code, samples))
+        self.add_sweep(runnable, results)
+        if self.history:
+            self.add_history(self.history, runnable, results)
+
+    def add_sweep(self, runnable: Runnable, results: Results) -> None:
+        """Adds the mean times of runs whose argv or stdin came from a sweep, by the swept value of the argv if it was
+        swept and otherwise of the stdin."""
+        inputs = {run_number: (argv, stdin) for run_number, argv, stdin in runnable.runs}
+        for run_number, _, exit_code, samples, _ in results:
+            argv, stdin = inputs[run_number]
+            value = argv.sweep if argv and argv.sweep is not None else stdin.sweep if stdin else None
+            if value is not None:
+                mean_time = sum(samples) / len(samples) if exit_code == 0 and samples else None
+                self.sweep.add((runnable.language.name, runnable.code.line_number), value, mean_time)
+
+    @staticmethod
+    def get_inputs(runnable: Runnable) -> Dict[int, Inputs]:
+        return {run_number: (argv.text if argv else None, stdin.text if stdin else None)
+                for run_number, argv, stdin in runnable.runs}
+
+    def add_history(self, history: History, runnable: Runnable, results: Results) -> None:
+        installed, version = self.context.probes.probe(runnable.language, True)
+        inputs = self.get_inputs(runnable)
+        for run_number, _, exit_code, samples, usage in results:
+            identity = (runnable.code.line_number, runnable.language.name, code_hash(runnable.code),
+                        *inputs[run_number])
+            history.add(identity, exit_code, samples, usage, version if installed else '')
+
+    def run_remote(self, runnable: Runnable, pool: DirectoryPool, remote: RemotePool,
+                   rank: int) -> Tuple[bytes, Results]:
+        """Runs `runnable` on a worker, or locally once admitted by its `rank` if no worker can run it."""
+        local = runnable.replays or runnable.prepared or any(isinstance(stdin, FileContent)
+                                                             for _, _, stdin in runnable.runs)
+        if not local and not self.context.expired():  # Stdin files, the journal, and batches are local.
+            start_time = time.perf_counter()
+            with self.context.tracer.span('remote', language=runnable.language.name, line=runnable.code.line_number):
+                remote_result = remote.run(runnable)
+            if remote_result is not None:
+                self.record_duration(runnable, remote_result[1], start_time)
+                return remote_result
+        with self.admission.admit(runnable.language, rank):
+            return self.run_buffered(runnable, pool)
+
+    def run_admitted(self, pool: DirectoryPool, futures: Dict[Runnable, 'Future[Tuple[bytes, Results]]']) -> None:
+        """Runs the programs admission hands out, most urgent first, until none are left."""
+        while True:
+            runnable: Optional[Runnable] = self.admission.take()
+            if runnable is None:
+                return
+            try:
+                futures[runnable].set_result(self.run_buffered(runnable, pool))
+            except BaseException as error:  # pylint: disable=broad-except # Raised again when it is printed.
+                futures[runnable].set_exception(error)
+            finally:
+                self.admission.finish(runnable.language)
+
+    def run_buffered(self, runnable: Runnable, pool: DirectoryPool) -> Tuple[bytes, Results]:
+        start_time = time.perf_counter()
+        runnable.printer = runnable.printer.buffered()  # Bytes, so binary output is copied out intact.
+        results = runnable.run_all(pool)
+        self.record_duration(runnable, results, start_time)
+        return runnable.printer.getvalue(), results
+
+    def record_duration(self, runnable: Runnable, results: Results, start_time: float) -> None:
+        """Records how long a program took to compile and run, unless it didn't fully run."""
+        if self.durations and results and not runnable.replays and all(result[2] != SKIPPED for result in results):
+            self.durations.record(runnable.language, runnable.code, time.perf_counter() - start_time)
+
+    def run_serially(self, pool: DirectoryPool) -> None:
+        """Runs one program at a time while compiling upcoming programs in the background, so compiling rarely delays
+        runs. Compile time is never part of a run's time."""
+        compile_jobs: int = self.settings.compile_jobs
+        compiled = [runnable for runnable in self.runnables
+                    if runnable.language.compile_command and not runnable.replayed and not runnable.prepared]
+        if compile_jobs <= 0 or not compiled:
+            for runnable in self.runnables:
+                self.record(runnable, runnable.run_all(pool))
+            return
+        with ThreadPoolExecutor(max_workers=compile_jobs, thread_name_prefix='runmany-compile') as executor:
+            for runnable in compiled:
+                runnable.prepared = executor.submit(runnable.prepare, pool)
+            for runnable in self.runnables:
+                self.record(runnable, runnable.run_all(pool))
+
+    def run_compared(self, pool: DirectoryPool) -> None:
+        """Runs the repetitions of all the runs with the same argv and stdin interleaved in a random order, so drift
+        in machine speed affects competing programs alike, then prints every run in order. Runs one thing at a time."""
+        with ThreadPoolExecutor(max_workers=max(1, self.settings.compile_jobs),
+                                thread_name_prefix='runmany-compile') as executor:
+            for runnable in self.runnables:
+                if not runnable.replayed and not runnable.prepared:
+                    runnable.prepared = executor.submit(runnable.prepare, pool)
+
+            groups: DefaultDict[Inputs, List[Tuple[Runnable, int, str, Optional[Content], int]]] = defaultdict(list)
+            for runnable in self.runnables:
+                prepared = runnable.prepared is not None and runnable.prepared.result()
+                if not prepared or (runnable.compilation and runnable.compilation[1] != 0):
+                    continue
+                for run_number, argv, stdin in runnable.runs:
+                    if run_number in runnable.replays:
+                        continue
+                    runnable.measured[run_number] = 'NO RUNS OCCURRED\n', 'N', [], None
+                    groups[argv.text if argv else None, stdin.text if stdin else None].append(
+                        (runnable, run_number, runnable.get_command(argv), stdin, runnable.get_stderr()))
+
+            with self.context.pinned():
+                self.run_interleaved(groups)
+
+            for runnable in self.runnables:
+                self.record(runnable, runnable.run_all(pool))
+
+    def run_interleaved(self, groups: Dict[Inputs, List[Tuple['Runnable', int, str, Optional[Content], int]]]) -> None:
+        shuffler = random.Random()
+        for group in groups.values():
+            rounds: int = max(runnable.language.runs for runnable, *_ in group)
+            for repetition in range(1, rounds + 1):
+                order = [run for run in group if run[0].language.runs >= repetition]
+                shuffler.shuffle(order)
+                for runnable, run_number, command, stdin, stderr in order:
+                    if self.context.expired() and not runnable.measured[run_number][2]:
+                        runnable.measured[run_number] = self.context.skipped()
+                        continue
+                    with self.context.tracer.span('repeat', language=runnable.language.name,
+                                                  line=runnable.code.line_number, run=run_number):
+                        result = runnable.repeat(command, stdin, stderr, repetition == runnable.language.runs)
+                    runnable.measured[run_number] = runnable.add_repetition(runnable.measured[run_number], result)
+
+    def run(self, pool: DirectoryPool) -> None:
+        total_timeout: Optional[float] = self.total_timeout
+        if total_timeout is None:
+            total_timeout = self.settings.total_timeout
+        if total_timeout is not None:  # Counted from when RunMany started, so parsing and compiling count too.
+            self.context.total_timeout = total_timeout
+            self.context.deadline = self.start_time + total_timeout
+        self.compare = self.settings.compare
+        if self.shard:
+            self.select_shard(*self.shard)
+            if self.compare:
+                self.printer.print_err('Cannot compare programs in a shard, as the programs they compete with may '
+                                       'run in other shards. Skipping comparison.')
+                self.compare = False
+        jobs: int = 1 if self.compare else self.settings.jobs
+        cores = make_core_pool(self.settings.cpu_affinity, self.settings.isolate_cores, jobs, self.printer)
+        self.context.cores = cores
+        with cores.isolated() if cores else ExitStack():
+            try:
+                self.compile_batches(pool)
+                if self.compare:
+                    self.run_compared(pool)
+                else:
+                    self.run_programs(pool)
+            finally:
+                self.context.cache.close()
+
+    def compile_batches(self, pool: DirectoryPool) -> None:
+        """Writes the programs of languages with a "batch_compile_command" and compiles each language's in one go."""
+        batches: DefaultDict[Tuple[str, str, Optional[str]], List[Runnable]] = defaultdict(list)
+        for runnable in self.runnables:
+            language = runnable.language
+            if language.batch_compile_command and not runnable.replayed:
+                batches[language.name, language.batch_compile_command, language.cwd].append(runnable)
+        for runnables in batches.values():
+            written = []
+            for runnable in runnables:
+                runnable.prepared = Future()
+                runnable.prepared.set_result(runnable.prepare(pool, False))
+                if runnable.prepared.result():
+                    written.append(runnable)
+            if written and not self.context.expired():
+                self.compile_batch(written)
+
+    def compile_batch(self, runnables: List[Runnable]) -> None:
+        """Compiles `runnables` with one run of their batch compile command. When it fails, each program named in the
+        compiler output gets the lines about it as its compile error, and the rest are compiled again in a new batch,
+        as compilers may not build anything when any file has errors."""
+        while runnables:
+            language = runnables[0].language
+            parts = [cast(PathParts, runnable.parts).parts for runnable in runnables]
+            files = ' '.join(part[Placeholders.FILE] for part in parts)
+            command = command_template(language.batch_compile_command).fill(
+                {Placeholders.FILE: files, Placeholders.FILES: files,
+                 Placeholders.DIRS: ' '.join(part[Placeholders.DIR] for part in parts)})
+            timeout = language.timeout * len(runnables) if language.timeout is not None else None  # As if one by one.
+            with self.context.tracer.span('batch compile', language=language.name, programs=len(runnables)) as args:
+                output, exit_code, time_taken = Runnable.run_command(
+                    command, self.context.timeout(timeout), language.cwd, None, subprocess.PIPE,
+                    runnables[0].get_stderr(), self.context.tracer)
+                args['exit_code'] = exit_code
+            self.context.metrics.record_compile(language.name, time_taken)
+            errors = self.split_compile_errors(output, [part[Placeholders.RAWFILE] for part in parts])
+            if exit_code == 0 or not errors:
+                for runnable in runnables:
+                    runnable.compilation = output, exit_code, time_taken / len(runnables), command
+                return
+            for index, error in errors.items():
+                runnables[index].compilation = error, exit_code, time_taken / len(runnables), command
+            runnables = [runnable for index, runnable in enumerate(runnables) if index not in errors]
 
-        for argv in self.argvs[language_name] or [cast(Content, None)]:  # Weird cast here since mypy was being a jerk.
-            for stdin in self.stdins[language_name] or [cast(Content, None)]:
-                self.total_runs += 1
-                output, success = runnable.run(self.total_runs, argv, stdin)
-                self.successful_runs += success
-                if self.settings.show_equal:
-                    self.equal_outputs[output].append(self.total_runs)
+    @staticmethod
+    def split_compile_errors(output: str, paths: List[str]) -> Dict[int, str]:
+        """The lines of compiler `output` about each of the files at `paths`, by index. A line is about the last file
+        named on or before it, by its full path or by its name followed by a colon as in "name.ext:3:", so a name
+        that is part of another name or appears in some other message doesn't count. Lines before any file is named
+        are about every file named later."""
+        patterns = [re.compile(f'{re.escape(path)}(?![\\w.])|(?<![\\w.-]){re.escape(os.path.basename(path))}:')
+                    for path in paths]
+        preamble: List[str] = []
+        errors: Dict[int, List[str]] = {}
+        current: Optional[int] = None
+        for line in output.splitlines(keepends=True):
+            searches = (pattern.search(line) for pattern in patterns)
+            starts = {index: match.start() for index, match in enumerate(searches) if match}
+            if starts:
+                current = min(starts, key=starts.__getitem__)  # The file named first on the line.
+                errors.setdefault(current, list(preamble))
+            if current is None:
+                preamble.append(line)
+            else:
+                errors[current].append(line)
+        return {index: ''.join(lines) for index, lines in errors.items()}
+
+    def run_programs(self, pool: DirectoryPool) -> None:
+        jobs: int = self.settings.jobs
+        workers: List[str] = self.settings.workers
+        remote = RemotePool(workers, worker_token(self.settings.worker_token), self.printer) if workers else None
+        if remote is None or not remote.workers:
+            remote = None
+            if jobs <= 1 and not self.shard:  # Shards need the output of each program apart, as buffering gives.
+                self.run_serially(pool)
+                return
+
+        self.admission = Admission(jobs)  # Programs no worker can run are run locally.
+        order = self.runnables
+        if self.settings.longest_first:
+            durations = self.durations = Durations()
+            order = sorted(self.runnables, key=lambda runnable: -durations.expected(runnable.language, runnable.code))
+        threads = remote.jobs if remote else jobs
+        with ThreadPoolExecutor(max_workers=threads, thread_name_prefix='runmany-job') as executor:
+            # Each program prints to its own buffer, then the buffers are output in order.
+            if remote:
+                futures = {runnable: executor.submit(self.run_remote, runnable, pool, remote, rank)
+                           for rank, runnable in enumerate(order)}
+            else:
+                futures = {runnable: Future() for runnable in self.runnables}
+                for rank, runnable in enumerate(order):
+                    self.admission.add(rank, runnable.language, runnable)
+                for _ in range(min(jobs, len(order))):
+                    executor.submit(self.run_admitted, pool, futures)
+            for runnable in self.runnables:
+                output, results = futures[runnable].result()
+                with self.context.tracer.span('print'):
+                    self.printer.print_raw(output)
+                self.record(runnable, results)
+                if self.shard:
+                    self.partial_programs.append({'index': self.indexes[runnable], 'output': encode_bytes(output),
+                                                  'results': [[run_number, output_hash(run_output), exit_code]
+                                                              for run_number, run_output, exit_code, _, _ in results]})
+        if self.durations:
+            self.durations.save()
+
+    def select_shard(self, shard: int, count: int) -> None:
+        """Keeps only the programs assigned to `shard` of `count`."""
+        self.indexes = {runnable: index for index, runnable in enumerate(self.runnables)}
+        snippets = [(runnable.language, runnable.code) for runnable in self.runnables]
+        costs = [expected_time(runnable.language) * len(runnable.runs) for runnable in self.runnables]
+        shards = assign_shards(snippets, count, costs if self.balance_shards else [])
+        self.runnables = [runnable for runnable, assigned in zip(self.runnables, shards) if assigned == shard]
+
+    def get_partial(self, file: str) -> Dict[str, Any]:
+        """The results of this shard, for merging with the other shards' into the results of the whole `file`."""
+        shard, count = cast(Shard, self.shard)
+        return {'file': file, 'shard': shard, 'shards': count, 'wall_time': time.perf_counter() - self.start_time,
+                'settings': {key: getattr(self.settings, key) for key in FOOTER_SETTINGS},
+                'programs': self.partial_programs}
+
+    def record_merged(self, results: List[List[Any]]) -> None:
+        """Counts the results of a program run in a shard, as record() does, for the footer of merged shards."""
+        for run_number, output, exit_code in results:
+            self.total_runs += 1
+            self.successful_runs += exit_code == 0
+            self.skipped_runs += exit_code == SKIPPED
+            if self.settings.show_equal:
+                self.equal_outputs[output].append(run_number)
 
     def print_results_stats(self) -> bool:
         if self.settings.show_stats:
             timer = f' in {time.perf_counter() - self.start_time:.3f}s' if self.settings.show_time else ''
             plural = '' if self.total_runs == 1 else 's'
             start = f'{self.successful_runs}/{self.total_runs} program{plural} successfully run{timer}'
-            end = '!'
-            if self.successful_runs < self.total_runs:
-                end = f'. {self.total_runs - self.successful_runs} failed due to non-zero exit code or timeout.'
-            print(start + end, flush=True)
+            problems = []
+            failed = self.total_runs - self.successful_runs - self.skipped_runs
+            if failed:
+                problems.append(f'{failed} failed due to non-zero exit code or timeout.')
+            if self.skipped_runs:
+                problems.append(f'{self.skipped_runs} skipped when the total timeout ran out.')
+            end = '. ' + ' '.join(problems) if problems else '!'
+            self.printer.print(start + end)
             return True
         return False
 
@@ -232,17 +900,48 @@ class Runner:
             end = '!'
             if biggest != self.total_runs:
                 end = '. Equal runs grouped: ' + ' '.join('[' + ' '.join(map(str, group)) + ']' for group in groups)
-            print(start + end, flush=True)
+            self.printer.print(start + end)
             return True
         return False
 
+    def print_results_comparison(self) -> bool:
+        had_comparison = False
+        if self.compare:
+            for (argv, stdin), competitors in self.competitors.items():
+                if len(competitors) < 2:
+                    continue
+                inputs = ''.join(f' with {name} "{text.strip()}"' for name, text in (('argv', argv), ('stdin', stdin))
+                                 if text is not None)
+                self.printer.print(f'Comparison of {len(competitors)} runs{inputs}:')
+                for line in comparison_table(competitors, self.settings.compare_baseline):
+                    self.printer.print(line)
+                had_comparison = True
+        return had_comparison
+
+    def print_results_sweep(self) -> bool:
+        if not self.sweep.values:
+            return False
+        values, programs = len(self.sweep.values), len(self.sweep.times)
+        self.printer.print(f'Sweep of {programs} program{"" if programs == 1 else "s"} over '
+                           f'{values} value{"" if values == 1 else "s"}:')
+        for line in self.sweep.table() + self.sweep.growth():
+            self.printer.print(line)
+        return True
+
     def print_results_footer(self) -> None:
         if not self.settings.minimalist:
-            print(DIVIDER_CHAR * DIVIDER_WIDTH, flush=True)
+            self.printer.print(DIVIDER_CHAR * DIVIDER_WIDTH)
         had_stats = self.print_results_stats()
         had_equals = self.print_results_equals()
-        if not self.settings.minimalist and (had_stats or had_equals):
-            print(DIVIDER_CHAR * DIVIDER_WIDTH, flush=True)
+        had_comparison = self.print_results_comparison()
+        had_sweep = self.print_results_sweep()
+        if not self.settings.minimalist and (had_stats or had_equals or had_comparison or had_sweep):
+            self.printer.print(DIVIDER_CHAR * DIVIDER_WIDTH)
+
+    def write_metrics(self, path: PathLike) -> None:
+        cache = self.context.cache
+        text = self.context.metrics.render(cache.hits, cache.misses, time.perf_counter() - self.start_time)
+        self.context.metrics.write(path, text)
 
     def __str__(self) -> str:
         return pformat((self.total_runs, self.successful_runs, self.argvs, self.stdins))  # pragma: no cover
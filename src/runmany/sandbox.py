@@ -0,0 +1,55 @@
+"""RunMany sandbox module. Hands out isolated working directories that are cleaned and reused between programs."""
+
+import os
+import shutil
+import threading
+from contextlib import contextmanager
+from typing import Iterator, List
+
+
+class DirectoryPool:
+    def __init__(self, root: str) -> None:
+        self.root = root
+        self.free: List[str] = []
+        self.created = 0
+        self.lock = threading.Lock()
+
+    def acquire(self) -> str:
+        with self.lock:
+            if self.free:
+                return self.free.pop()
+            self.created += 1
+            directory = os.path.join(self.root, f'sandbox{self.created}')
+        os.mkdir(directory)
+        return directory
+
+    def release(self, directory: str) -> None:
+        if self.clean(directory):
+            with self.lock:
+                self.free.append(directory)
+
+    @staticmethod
+    def clean(directory: str) -> bool:
+        try:
+            for entry in os.scandir(directory):
+                if entry.is_dir(follow_symlinks=False):
+                    shutil.rmtree(entry.path)
+                else:
+                    os.remove(entry.path)
+        except OSError:  # E.g. a file still in use on Windows. Never reuse a directory that could not be emptied.
+            return False
+        return True
+
+    @contextmanager
+    def sandbox(self) -> Iterator[str]:
+        directory = self.acquire()
+        try:
+            yield directory
+        finally:
+            self.release(directory)
+
+    def __str__(self) -> str:
+        return str((self.root, self.created, self.free))  # pragma: no cover
+
+    def __repr__(self) -> str:
+        return str(self)  # pragma: no cover
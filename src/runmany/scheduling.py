@@ -0,0 +1,56 @@
+"""RunMany scheduling module. Starts the programs run at once longest first, by how long each took in earlier
+invocations, so a slow program queued behind many quick ones doesn't hold up the end of the run.
+Durations are cached on disk in the same directory as the probes."""
+
+import json
+import hashlib
+import threading
+from typing import Dict
+from runmany.settings import Language
+from runmany.probing import load_cache, save_cache
+from runmany.util import Content
+
+CACHE_NAME = 'durations.json'
+MAX_DURATIONS = 10000  # The most snippets whose durations are kept, dropping those recorded longest ago.
+COMPILED_SECONDS = 1.0  # The expected seconds of programs in languages without an "expected_time" nor a history.
+INTERPRETED_SECONDS = 0.1
+
+
+def expected_time(language: Language) -> float:
+    """The seconds a program of `language` is expected to take before any has run: its "expected_time", otherwise a
+    guess from whether the language is compiled."""
+    if language.expected_time is not None:
+        return float(language.expected_time)
+    return COMPILED_SECONDS if language.compile_command else INTERPRETED_SECONDS
+
+
+def snippet_key(language: Language, code: Content) -> str:
+    """Identifies a snippet by its language and code, but not its line, so it is still known after lines are added."""
+    parts = [language.name, language.command, language.compile_command, language.runs, code.text]
+    return hashlib.sha256(json.dumps(parts, default=str).encode('utf-8')).hexdigest()
+
+
+class Durations:
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.known: Dict[str, float] = {key: value for key, value in load_cache(CACHE_NAME).items()
+                                        if isinstance(value, (int, float))}
+        self.recorded: Dict[str, float] = {}
+
+    def expected(self, language: Language, code: Content) -> float:
+        """The seconds a program is expected to take to compile and run: its time in the last invocation it ran in,
+        otherwise the expected time of its language."""
+        known = self.known.get(snippet_key(language, code))
+        return expected_time(language) if known is None else known
+
+    def record(self, language: Language, code: Content, seconds: float) -> None:
+        with self.lock:
+            self.recorded[snippet_key(language, code)] = seconds
+
+    def save(self) -> None:
+        """Merges the recorded durations into the cache, as another RunMany process may have saved it meanwhile."""
+        if not self.recorded:
+            return
+        cache = {key: value for key, value in load_cache(CACHE_NAME).items() if key not in self.recorded}
+        cache.update(self.recorded)
+        save_cache(dict(list(cache.items())[-MAX_DURATIONS:]), CACHE_NAME)
@@ -5,10 +5,11 @@ import pathlib
 import platform
 from itertools import chain
 from typing import Any, Dict, List, Optional, cast
-from runmany.util import JsonLike, print_err, set_show_errors
+from runmany.util import JsonLike, Printer
 
 
 PLATFORMS = {'windows': 'windows', 'linux': 'linux', 'darwin': 'mac'}
+COMPILE_KEYS = ('compile_command', 'batch_compile_command')  # Only inherited along with the "command" they build for.
 
 
 def load_default_settings() -> Dict[str, Any]:
@@ -16,38 +17,39 @@ def load_default_settings() -> Dict[str, Any]:
         return cast(Dict[str, Any], json.load(file))
 
 
-def load_json_settings(settings: JsonLike, from_string: bool = False) -> Dict[str, Any]:
+def load_json_settings(settings: JsonLike, printer: Printer, from_string: bool = False) -> Dict[str, Any]:
     if settings in (None, ''):
         return {}
     if isinstance(settings, dict):
         return settings
     if any(isinstance(settings, t) for t in (list, int, float, bool)):
-        print_err(f'JSON base type must be dict or string, not {type(settings).__name__}. Using default settings JSON.')
+        printer.print_err(f'JSON base type must be dict or string, not {type(settings).__name__}. '
+                          'Using default settings JSON.')
         return {}
     if from_string:
         try:
             # Recursively call load in case JSON is a string filepath.
-            return load_json_settings(json.loads(cast(str, settings)))
+            return load_json_settings(json.loads(cast(str, settings)), printer)
         except Exception as error:  # pylint: disable=broad-except # (JSONDecodeError misses a few things.)
-            print_err(f'Embedded JSON issue "{error}". Using default settings JSON.')
+            printer.print_err(f'Embedded JSON issue "{error}". Using default settings JSON.')
     else:
         try:
             with open(cast(str, settings), encoding='utf-8') as file:
-                return load_json_settings(json.load(file))
+                return load_json_settings(json.load(file), printer)
         except Exception as error:  # pylint: disable=broad-except
-            print_err(f'JSON file issue "{error}". Using default settings JSON.')
+            printer.print_err(f'JSON file issue "{error}". Using default settings JSON.')
     return {}
 
 
 class Language:
-    def __init__(self, language_dict: Dict[str, Any], parent: 'Settings') -> None:
+    def __init__(self, language_dict: Dict[str, Any], parent: Dict[str, Any]) -> None:
         self.dict = language_dict
-        self.parent = parent
+        self.parent = parent  # The base settings at the time, so queued programs are unaffected by later updates.
 
     def __getattr__(self, key: str) -> Any:
         if key in self.dict:
             return self.dict[key]
-        return getattr(self.parent, key)
+        return self.parent[key]
 
     @staticmethod
     def normalize(language_name: str) -> str:
@@ -61,7 +63,9 @@ class Language:
 
 
 class Settings:
-    def __init__(self, provided_settings: Optional[Dict[str, Any]] = None, updatable: bool = True) -> None:
+    def __init__(self, printer: Printer, provided_settings: Optional[Dict[str, Any]] = None,
+                 updatable: bool = True) -> None:
+        self.printer = printer
         self.default_settings = load_default_settings()
         self.updatable = updatable
         self.update(provided_settings or {})
@@ -70,10 +74,11 @@ class Settings:
         try:
             self.dict = self.combine_settings(self.default_settings, new_provided_settings)
         except Exception as error:  # pylint: disable=broad-except
-            print_err(f'Issue combining JSONs "{error}". Something may be the wrong type. Using default settings JSON.')
+            self.printer.print_err(f'Issue combining JSONs "{error}". Something may be the wrong type. '
+                                   'Using default settings JSON.')
             self.dict = self.combine_settings(self.default_settings, {})
 
-        set_show_errors(self.show_errors)
+        self.printer.show_errors = self.show_errors
 
     def combine_settings(self, default_settings: Dict[str, Any], provided_settings: Dict[str, Any]) -> Dict[str, Any]:
         combined = {key: provided_settings.get(key, value) for key, value in default_settings.items()}
@@ -90,7 +95,7 @@ class Settings:
             languages = self.combine_dicts(languages_os, languages)
 
         computed_languages = self.combine_dicts(languages, supplied_languages)
-        combined['computed_languages'] = {name: Language(value, self) for name, value in computed_languages.items()}
+        combined['computed_languages'] = {name: Language(value, combined) for name, value in computed_languages.items()}
         return combined
 
     def computed_languages(self) -> Dict[str, Language]:
@@ -105,6 +110,10 @@ class Settings:
                 new_language, base_language = new.get(name, {}), base.get(name, {})
                 for key in chain(base_language, new_language):
                     combined[name][key] = new_language.get(key, base_language.get(key))
+                if 'command' in new_language:  # A new command may not expect the old build step to run first.
+                    for key in COMPILE_KEYS:
+                        if key in base_language and key not in new_language:
+                            combined[name][key] = None
         return combined
 
     def __getattr__(self, key: str) -> Any:  # "." is for retrieving base settings
@@ -116,6 +125,11 @@ class Settings:
     def __getitem__(self, language_name: str) -> Language:  # "[ ]" is for retrieving Languages
         return self.computed_languages()[language_name]
 
+    def snapshot(self) -> 'Settings':  # update() replaces self.dict rather than mutating it, so sharing it is safe.
+        snapshot: Settings = object.__new__(Settings)
+        snapshot.__dict__.update(self.__dict__)
+        return snapshot
+
     @staticmethod
     def with_os(key: str) -> str:
         return f'{key}_{PLATFORMS.get(platform.system().lower().strip(), "unknown")}'
@@ -124,25 +138,24 @@ class Settings:
     def has_os() -> bool:
         return platform.system().lower().strip() in PLATFORMS
 
-    @staticmethod
-    def make_language_dict(language_list: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    def make_language_dict(self, language_list: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
         name_key = 'name'
         language_dict: Dict[str, Any] = {}
         for language in language_list:
             if name_key not in language:
-                print_err(f'No "{name_key}" key found for {language}. Skipping language.')
+                self.printer.print_err(f'No "{name_key}" key found for {language}. Skipping language.')
                 continue
             language[name_key] = language[name_key].strip()
             language_dict[Language.normalize(language[name_key])] = language
         return language_dict
 
     @staticmethod
-    def from_json(settings: JsonLike) -> 'Settings':
-        return Settings(load_json_settings(settings), settings is None)
+    def from_json(settings: JsonLike, printer: Printer) -> 'Settings':
+        return Settings(printer, load_json_settings(settings, printer), settings is None)
 
     def update_with_json(self, raw_settings_json: str) -> None:
         if self.updatable:
-            self.update(load_json_settings(raw_settings_json, from_string=True))
+            self.update(load_json_settings(raw_settings_json, self.printer, from_string=True))
 
     def __str__(self) -> str:
         return str((self.updatable, self.dict))  # pragma: no cover
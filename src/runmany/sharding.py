@@ -0,0 +1,83 @@
+"""RunMany sharding module. Splits the programs of a .many file between machines by a stable hash of each snippet, and
+merges the partial results each machine wrote back into the output and footer one machine would have printed."""
+
+import json
+import hashlib
+from typing import Any, Dict, List, Tuple
+from runmany.settings import Language
+from runmany.util import Content, PathLike, Printer
+
+FOOTER_SETTINGS = ('minimalist', 'show_stats', 'show_equal', 'show_time')
+
+Shard = Tuple[int, int]  # The 1-based number of a shard and how many shards there are.
+
+
+def parse_shard(text: str) -> Shard:
+    """Parses "k/n" into (k, n), raising ValueError unless 1 <= k <= n."""
+    number, _, count = text.partition('/')
+    shard = int(number), int(count)
+    if not 1 <= shard[0] <= shard[1]:
+        raise ValueError(f'"{text}" is not a shard k/n with 1 <= k <= n')
+    return shard
+
+
+def snippet_hash(language: Language, code: Content) -> int:
+    """A hash of a snippet that is the same on every machine, unlike hash()."""
+    parts = [language.name, code.line_number, code.text]
+    return int(hashlib.sha256(json.dumps(parts).encode('utf-8')).hexdigest(), 16)
+
+
+def assign_shards(snippets: List[Tuple[Language, Content]], count: int, costs: List[float]) -> List[int]:
+    """The 1-based shard of each snippet. Without `costs`, each is assigned by its hash. With them, snippets are dealt
+    out most costly first to the shard with the least total cost so far, so shards take about as long as each other.
+    Either way every machine assigns the same snippets to the same shards, as long as the costs are the same."""
+    hashes = [snippet_hash(language, code) for language, code in snippets]
+    if not costs:
+        return [snippet % count + 1 for snippet in hashes]
+    shards = [0] * len(snippets)
+    loads = [0.0] * count
+    for i in sorted(range(len(snippets)), key=lambda i: (-costs[i], hashes[i])):
+        lightest = loads.index(min(loads))
+        loads[lightest] += costs[i]
+        shards[i] = lightest + 1
+    return shards
+
+
+def output_hash(output: str) -> str:
+    return hashlib.sha256(output.encode('utf-8')).hexdigest()
+
+
+def load_partial(path: PathLike) -> Dict[str, Any]:
+    with open(path, encoding='utf-8') as file:
+        partial: Dict[str, Any] = json.load(file)
+    return partial
+
+
+def write_partial(path: PathLike, partial: Dict[str, Any]) -> None:
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(partial, file, indent=4)
+        file.write('\n')
+
+
+def merge_partials(partials: List[Dict[str, Any]],
+                   printer: Printer) -> Tuple[List[Dict[str, Any]], Dict[str, Any], float]:
+    """The programs of all `partials` in file order, the footer settings, and the wall time of the slowest shard.
+    Reports shards that are missing, repeated, or from another file or sharding, skipping those that don't match the
+    first."""
+    first = partials[0]
+    seen: Dict[int, Dict[str, Any]] = {}
+    for partial in partials:
+        if (partial['file'], partial['shards']) != (first['file'], first['shards']):
+            printer.print_err(f'Shard {partial["shard"]}/{partial["shards"]} is not of the same file and sharding as '
+                              f'shard {first["shard"]}/{first["shards"]}. Skipping shard.')
+        elif partial['shard'] in seen:
+            printer.print_err(f'Shard {partial["shard"]}/{partial["shards"]} was given more than once. Skipping shard.')
+        else:
+            seen[partial['shard']] = partial
+    missing = [str(shard) for shard in range(1, first['shards'] + 1) if shard not in seen]
+    if missing:
+        printer.print_err(f'Shard{"s" if len(missing) > 1 else ""} {", ".join(missing)} of {first["shards"]} '
+                          'missing. Merging the rest.')
+    programs = sorted((program for partial in seen.values() for program in partial['programs']),
+                      key=lambda program: program['index'])
+    return programs, first['settings'], max(partial['wall_time'] for partial in seen.values())
@@ -0,0 +1,168 @@
+"""RunMany sweeps module. Expands sweep placeholders like {1000..64000 x2} in argv and stdin snippets, collects the
+timings of each program over the swept values, and fits how each program's time grows with them."""
+
+import os
+import re
+import csv
+import json
+import math
+from typing import Callable, Dict, List, Optional, Tuple
+from runmany.util import PathLike
+
+PLACEHOLDER = re.compile(r'\{([^{}]*)\}')
+NUMBER = r'[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?'
+RANGE = re.compile(f'^\\s*({NUMBER})\\s*\\.\\.\\s*({NUMBER})\\s*(?:(step|x|\\*)\\s*({NUMBER}))?\\s*$')
+MAX_VALUES = 10000
+MIN_FIT_SIZES = 3
+CONSTANT = 'O(1)'
+MODELS: Dict[str, Callable[[float], float]] = {
+    'O(log n)': math.log,
+    'O(n)': lambda n: n,
+    'O(n log n)': lambda n: n * math.log(n),
+    'O(n^2)': lambda n: n ** 2,
+    'O(n^3)': lambda n: n ** 3,
+}
+SIGNIFICANT_FIT = 0.5  # How much less RMS error than O(1) a growing model must have to be chosen over O(1).
+
+Fit = Tuple[str, float, float, float]  # The model, constant seconds, seconds per unit of the model, and RMS error.
+Program = Tuple[str, int]  # The language and code line of a program.
+
+
+def format_number(number: float) -> str:
+    return str(int(number)) if number == int(number) and abs(number) < 1e15 else repr(number)
+
+
+def sweep_values(spec: str) -> List[str]:
+    """The values of a sweep placeholder's contents: `a..b` or `a..b step s` for arithmetic series, `a..b x f` for
+    geometric ones, both including b when reached, or `a|b|c` for a list. Raises ValueError when invalid."""
+    if '|' in spec:
+        return [value.strip() for value in spec.split('|')]
+    match = RANGE.match(spec)
+    if not match:
+        raise ValueError(f'"{spec}" is not a range or list')
+    start, stop = float(match.group(1)), float(match.group(2))
+    kind, amount = match.group(3), float(match.group(4) or 1)
+    geometric = kind in ('x', '*')
+    if (amount <= 1 if geometric else amount <= 0) or (geometric and start <= 0):
+        raise ValueError(f'"{spec}" never reaches its end')
+    values: List[str] = []
+    value = start
+    while value <= stop + abs(stop) * 1e-9:  # Allowing for float error, so e.g. 0..1 step 0.1 includes 1.
+        if len(values) == MAX_VALUES:
+            raise ValueError(f'"{spec}" has over {MAX_VALUES} values')
+        values.append(format_number(round(value, 9)))
+        value = value * amount if geometric else start + amount * len(values)
+    if not values:
+        raise ValueError(f'"{spec}" is empty')
+    return values
+
+
+def expand(text: str) -> List[Tuple[str, Optional[str]]]:
+    """Each text made by substituting the first sweep placeholder in `text`, along with the value substituted.
+    Text without a placeholder is returned as is."""
+    match = PLACEHOLDER.search(text)
+    if not match:
+        return [(text, None)]
+    return [(text[:match.start()] + value + text[match.end():], value) for value in sweep_values(match.group(1))]
+
+
+def fit(sizes: List[float], times: List[float]) -> Optional[Fit]:
+    """The least squares fit of `times` to `a + b * f(size)` for the f of each model, choosing the model with the
+    least RMS error relative to the mean time. Needs at least MIN_FIT_SIZES different positive sizes."""
+    if len(set(sizes)) < MIN_FIT_SIZES or min(sizes) <= 0:
+        return None
+    mean_time = sum(times) / len(times)
+
+    def rms(predictions: List[float]) -> float:
+        error = math.sqrt(sum((prediction - t) ** 2 for prediction, t in zip(predictions, times)) / len(times))
+        return error / mean_time if mean_time > 0 else 0.0
+
+    best: Fit = CONSTANT, mean_time, 0.0, rms([mean_time] * len(times))
+    constant_error = best[3]
+    for name, model in MODELS.items():
+        xs = [model(n) for n in sizes]
+        mean_x = sum(xs) / len(xs)
+        variance = sum((x - mean_x) ** 2 for x in xs)
+        if variance == 0:
+            continue
+        slope = sum((x - mean_x) * (t - mean_time) for x, t in zip(xs, times)) / variance
+        if slope <= 0:
+            continue
+        constant = mean_time - slope * mean_x
+        error = rms([constant + slope * x for x in xs])
+        if error < best[3] and (best[0] != CONSTANT or error < constant_error * SIGNIFICANT_FIT):
+            best = name, constant, slope, error
+    return best
+
+
+def describe_fit(best: Fit) -> str:
+    model, constant, slope, error = best
+    if model == CONSTANT:
+        return f'{model} ({constant:.3g}s, {error:.1%} RMS error)'
+    return f'{model} ({constant:.3g}s + {slope:.3g}s * {model[2:-1]}, {error:.1%} RMS error)'
+
+
+class Sweep:
+    """The mean times of each program by swept value, in the order programs and values were first seen."""
+
+    def __init__(self) -> None:
+        self.values: List[str] = []
+        self.times: Dict[Program, Dict[str, List[float]]] = {}
+
+    def add(self, program: Program, value: str, mean_time: Optional[float]) -> None:
+        """Adds a run's mean time, or None if the run failed."""
+        if value not in self.values:
+            self.values.append(value)
+        times = self.times.setdefault(program, {}).setdefault(value, [])
+        if mean_time is not None:
+            times.append(mean_time)
+
+    def time(self, program: Program, value: str) -> Optional[float]:
+        times = self.times[program].get(value)
+        return sum(times) / len(times) if times else None
+
+    def fit(self, program: Program) -> Optional[Fit]:
+        points = [(float(value), time) for value, time in ((value, self.time(program, value)) for value in self.values)
+                  if time is not None and re.fullmatch(NUMBER, value)]
+        return fit([size for size, _ in points], [time for _, time in points]) if points else None
+
+    @staticmethod
+    def label(program: Program) -> str:
+        return f'{program[0]} line {program[1]}'
+
+    def table(self) -> List[str]:
+        rows = [['Value', *map(self.label, self.times)]]
+        for value in self.values:
+            rows.append([value, *(f'{time:.3f}s' if time is not None else '-'
+                                  for time in (self.time(program, value) for program in self.times))])
+        widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+        return ['  '.join(cell.rjust(width) for cell, width in zip(row, widths)) for row in rows]
+
+    def growth(self) -> List[str]:
+        lines = []
+        for program in self.times:
+            best = self.fit(program)
+            fitted = describe_fit(best) if best else f'too few sizes to fit, needs {MIN_FIT_SIZES} positive numbers'
+            lines.append(f'{self.label(program)} grows as {fitted}')
+        return lines
+
+    def export(self, path: PathLike) -> None:
+        """Writes the timings and fits to `path`, as JSON when it ends with .json and as CSV otherwise."""
+        if os.fsdecode(path).lower().endswith('.json'):
+            programs = []
+            for program in self.times:
+                best = self.fit(program)
+                programs.append({'language': program[0], 'line': program[1],
+                                 'times': [self.time(program, value) for value in self.values],
+                                 'fit': dict(zip(('model', 'constant', 'coefficient', 'rms_error'), best))
+                                 if best else None})
+            with open(path, 'w', encoding='utf-8') as file:
+                json.dump({'values': self.values, 'programs': programs}, file, indent=4)
+                file.write('\n')
+            return
+        with open(path, 'w', encoding='utf-8', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(['value', *map(self.label, self.times)])
+            for value in self.values:
+                writer.writerow([value, *('' if time is None else repr(time)
+                                          for time in (self.time(program, value) for program in self.times))])
@@ -0,0 +1,74 @@
+"""RunMany timing module. Runs commands so only the child process itself is timed, with its CPU time from rusage."""
+
+import os
+import sys
+import time
+import locale
+import threading
+import subprocess
+from contextlib import ExitStack
+from tempfile import TemporaryFile
+from typing import IO, Optional, Tuple, Union
+from runmany.tracing import NullTracer
+from runmany.util import Stdin
+
+
+def precise_timing_supported() -> bool:
+    return hasattr(os, 'wait4')
+
+
+def exit_code_of(status: int) -> int:
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+
+def decode_output(file: IO[bytes]) -> str:
+    """Decodes like subprocess's universal_newlines=True does."""
+    file.seek(0)
+    text = file.read().decode(locale.getpreferredencoding(False), errors='replace')
+    return text.replace('\r\n', '\n').replace('\r', '\n')
+
+
+def run_command_precise(command: str, timeout: Optional[float], cwd: Optional[str], stdin: Stdin,
+                        stdout: int, stderr: int,
+                        tracer: NullTracer = NullTracer()) -> Tuple[str, Union[int, str], float, Tuple[float, int]]:
+    """Like Runnable.run_command but the wall time spans from just after the child is spawned until it is reaped,
+    and output goes to temporary files rather than pipes so nothing is read or decoded while the child runs.
+    Also returns the CPU time and peak memory in KB the child (and anything it waited on) used. POSIX only."""
+    with ExitStack() as stack:
+        stdin_file: Optional[IO[bytes]] = None if isinstance(stdin, str) else stdin
+        if isinstance(stdin, str):
+            stdin_file = stack.enter_context(TemporaryFile())
+            stdin_file.write(stdin.encode(locale.getpreferredencoding(False)))
+            stdin_file.seek(0)
+        stdout_file = stack.enter_context(TemporaryFile()) if stdout == subprocess.PIPE else None
+        stderr_file = stack.enter_context(TemporaryFile()) if stderr == subprocess.PIPE else None
+
+        with tracer.span('spawn'):
+            process = stack.enter_context(subprocess.Popen(command, shell=True, cwd=cwd, stdin=stdin_file,
+                                                           stdout=stdout_file or stdout, stderr=stderr_file or stderr))
+        start_time = time.perf_counter()
+        timed_out = threading.Event()
+
+        def kill() -> None:
+            timed_out.set()
+            process.kill()
+
+        timer = threading.Timer(timeout, kill) if timeout is not None else None
+        if timer:
+            timer.start()
+        with tracer.span('wait'):
+            _, status, usage = os.wait4(process.pid, 0)  # pylint: disable=no-member
+        time_taken = time.perf_counter() - start_time
+        if timer:
+            timer.cancel()
+        process.returncode = exit_code_of(status)  # Already reaped, so Popen must not wait on it.
+        resources = usage.ru_utime + usage.ru_stime, usage.ru_maxrss // (1024 if sys.platform == 'darwin' else 1)
+
+        if timed_out.is_set():
+            return f'TIMED OUT OF {timeout:.3f}s LIMIT\n', 'T', time_taken, resources
+        output = decode_output(stdout_file) if stdout_file else ''
+        if process.returncode and stderr_file:
+            output += decode_output(stderr_file)
+        return output, process.returncode, time_taken, resources
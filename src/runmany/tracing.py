@@ -0,0 +1,57 @@
+"""RunMany tracing module. Records spans of RunMany's own phases as Chrome trace event JSON for chrome://tracing
+or Perfetto. Each thread, such as each job when "jobs" is above 1, gets its own track."""
+
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List
+from runmany.util import PathLike
+
+
+class NullTracer:
+    """Does nothing, so tracing costs next to nothing when it is off."""
+
+    @contextmanager
+    def span(self, name: str, **args: Any) -> Iterator[Dict[str, Any]]:  # pylint: disable=unused-argument
+        yield args
+
+    def write(self, path: PathLike) -> None:
+        pass
+
+
+class Tracer(NullTracer):
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.events: List[Dict[str, Any]] = []
+        self.threads: Dict[int, str] = {}
+        self.pid = os.getpid()
+        self.start_time = time.perf_counter()
+
+    def microseconds(self, seconds: float) -> float:
+        return round((seconds - self.start_time) * 1e6, 3)
+
+    @contextmanager
+    def span(self, name: str, **args: Any) -> Iterator[Dict[str, Any]]:
+        """Records the time spent in the with block. The yielded args dict may be updated inside the block."""
+        start_time = time.perf_counter()
+        try:
+            yield args
+        finally:
+            end_time = time.perf_counter()
+            thread = threading.current_thread()
+            event = {'name': name, 'cat': 'runmany', 'ph': 'X', 'pid': self.pid, 'tid': thread.ident,
+                     'ts': self.microseconds(start_time), 'dur': round((end_time - start_time) * 1e6, 3),
+                     'args': args}
+            with self.lock:
+                self.events.append(event)
+                self.threads.setdefault(thread.ident or 0, thread.name)
+
+    def write(self, path: PathLike) -> None:
+        with self.lock:
+            metadata = [{'name': 'thread_name', 'ph': 'M', 'pid': self.pid, 'tid': tid, 'args': {'name': name}}
+                        for tid, name in self.threads.items()]
+            trace = {'traceEvents': metadata + self.events, 'displayTimeUnit': 'ms'}
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(trace, file, default=str)
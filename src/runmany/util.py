@@ -1,24 +1,80 @@
 """RunMany utility module."""
 
+import io
 import os
 import sys
+import locale
 from contextlib import contextmanager
-from typing import Any, Union, TextIO, Iterator, Optional
+from typing import IO, Any, Union, TextIO, Iterable, Iterator, Optional, cast
 
 PathLike = Union[str, bytes, 'os.PathLike[Any]']
 JsonLike = Union[Any, PathLike, None]
+Stdin = Union[str, IO[bytes], None]  # The text sent to a program's stdin, or the opened file used as its stdin.
+
+
+class Printer:
+    """Where one RunMany invocation sends its output and error messages, so concurrent invocations never share
+    sys.stdout or any globals."""
+
+    def __init__(self, outfile: TextIO, errfile: Optional[TextIO] = None, show_errors: bool = True) -> None:
+        self.outfile = outfile
+        self.errfile = errfile if errfile is not None else sys.stderr
+        self.show_errors = show_errors
+
+    def print(self, text: str = '', end: str = '\n') -> None:
+        print(text, end=end, flush=True, file=self.outfile)
+
+    def print_bytes(self, chunks: Iterable[bytes], end: str = '\n') -> None:
+        """Writes `chunks` of bytes to the output as is when it has a binary buffer, like sys.stdout does.
+        Otherwise, e.g. for a StringIO, the bytes are decoded."""
+        buffer = getattr(self.outfile, 'buffer', None)
+        if buffer is None:
+            self.outfile.write(b''.join(chunks).decode(locale.getpreferredencoding(False), errors='replace'))
+        else:
+            self.outfile.flush()
+            for chunk in chunks:
+                buffer.write(chunk)
+            buffer.flush()
+        self.print(end=end)
 
-DISPLAY_ERRORS = True  # The only mutating global.
-
-
-def print_err(message: str) -> None:
-    if DISPLAY_ERRORS:
-        print(f"||| RunMany Error: {message} |||", flush=True, file=sys.stderr)
-
-
-def set_show_errors(show_errors: bool) -> None:
-    global DISPLAY_ERRORS  # pylint: disable=global-statement
-    DISPLAY_ERRORS = show_errors
+    @property
+    def encoding(self) -> str:
+        return getattr(self.outfile, 'encoding', None) or 'utf-8'
+
+    @staticmethod
+    def in_memory(encoding: str, errors: Optional[str] = None, newline: Optional[str] = None,
+                  errfile: Optional[TextIO] = None, show_errors: bool = True) -> 'Printer':
+        """A printer whose output is kept in memory as bytes in `encoding`, so binary output stays intact, until
+        getvalue() is written out with print_raw()."""
+        stream = io.TextIOWrapper(io.BytesIO(), encoding, errors, newline, write_through=True)
+        return Printer(cast(TextIO, stream), errfile, show_errors)
+
+    def buffered(self) -> 'Printer':
+        """An in memory printer reporting errors like this one, whose output can be written here with print_raw()."""
+        has_buffer = getattr(self.outfile, 'buffer', None) is not None  # Then newlines are translated as it would.
+        return self.in_memory(self.encoding, getattr(self.outfile, 'errors', None), None if has_buffer else '',
+                              self.errfile, self.show_errors)
+
+    def getvalue(self) -> bytes:
+        """The output so far of an in memory printer."""
+        self.outfile.flush()
+        return cast(io.BytesIO, cast(io.TextIOWrapper, self.outfile).buffer).getvalue()
+
+    def print_raw(self, data: bytes) -> None:
+        """Writes `data`, text in this printer's encoding that may include binary output, to the output as is when it
+        has a binary buffer. Otherwise the bytes are decoded."""
+        buffer = getattr(self.outfile, 'buffer', None)
+        if buffer is None:
+            self.outfile.write(data.decode(self.encoding, errors='replace'))
+            self.outfile.flush()
+        else:
+            self.outfile.flush()
+            buffer.write(data)
+            buffer.flush()
+
+    def print_err(self, message: str) -> None:
+        if self.show_errors:
+            print(f"||| RunMany Error: {message} |||", flush=True, file=self.errfile)
 
 
 def convert_smart_yes_no(val: Union[None, bool, str]) -> Optional[bool]:
@@ -38,11 +94,12 @@ def debugging() -> bool:
 
 
 class Content:
-    def __init__(self, text: str, line_index: int, prefix_lines: int, newline: str):
+    def __init__(self, text: str, line_index: int, prefix_lines: int, newline: str, sweep: Optional[str] = None):
         self.text = text
         self.line_number = line_index + 1
         self.prefix_lines = prefix_lines
         self.newline = newline
+        self.sweep = sweep  # The value substituted for the snippet's sweep placeholder, if it had one.
 
     @property
     def prefixed_text(self) -> str:
@@ -53,3 +110,10 @@ class Content:
 
     def __repr__(self) -> str:
         return str((self.line_number, self.text))  # pragma: no cover
+
+
+class FileContent(Content):
+    """Content whose text is the path of a file to use the data of, e.g. as stdin, without reading it into memory."""
+
+    def __repr__(self) -> str:
+        return str((self.line_number, 'file', self.text))  # pragma: no cover
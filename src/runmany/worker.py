@@ -0,0 +1,151 @@
+"""RunMany worker module. Runs programs sent over TCP or a Unix socket by RunMany processes with "workers" set."""
+
+import os
+import sys
+import hmac
+import json
+import time
+import argparse
+import threading
+import socketserver
+from functools import partial
+from tempfile import TemporaryDirectory
+from typing import Any, Dict, List, Optional
+from runmany.settings import Settings, Language
+from runmany.runner import Runnable, RunContext
+from runmany.sandbox import DirectoryPool
+from runmany.remote import ENCODING, TOKEN_VARIABLE, parse_address, decode_content, encode_bytes
+from runmany.probing import installed_languages
+from runmany.util import Printer
+
+DEFAULT_ADDRESS = '127.0.0.1:7000'
+# The language settings that decide what is run in the worker's shell, which are always the worker's own.
+OWN_KEYS = ('command', 'compile_command', 'batch_compile_command', 'extension', 'cwd', 'probe')
+
+
+class Worker:
+    def __init__(self, settings: Settings, jobs: int, token: str, languages: Optional[List[str]] = None) -> None:
+        """Runs programs for those who send `token`, in the languages of `settings` that are installed, or in
+        `languages`, with the commands `settings` gives them."""
+        if not token:
+            raise ValueError('a worker needs a token')
+        self.settings = settings
+        self.token = token.encode(ENCODING)
+        self.jobs = max(1, jobs)
+        self.slots = threading.Semaphore(self.jobs)
+        if languages is None:
+            languages = installed_languages(settings)
+        self.languages = sorted(Language.normalize(name) for name in languages)
+        self.directory = TemporaryDirectory()
+        self.pool = DirectoryPool(self.directory.name)
+        self.programs_run = 0
+        self.lock = threading.Lock()
+
+    def respond(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        if not hmac.compare_digest(str(message.get('token', '')).encode(ENCODING), self.token):
+            raise PermissionError('wrong or missing token')
+        if message['type'] == 'info':
+            return {'languages': self.languages, 'jobs': self.jobs}
+        if message['type'] == 'run':
+            with self.slots:
+                return self.run(message)
+        raise ValueError(f'unknown message type "{message["type"]}"')
+
+    def run(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        printer = Printer.in_memory(message['encoding'], show_errors=False)
+        settings = Settings(printer, message['settings'], False)
+        name = Language.normalize(message['language']['name'])
+        if name not in self.languages or name not in self.settings:
+            raise ValueError(f'language "{message["language"]["name"]}" is not run by this worker')
+        own = self.settings[name]
+        language = Language({**message['language'], **{key: getattr(own, key) for key in OWN_KEYS}}, settings.dict)
+        runs = [(number, decode_content(argv), decode_content(stdin)) for number, argv, stdin in message['runs']]
+        code = decode_content(message['code'])
+        if code is None:
+            raise ValueError('no code sent')
+        context = RunContext()
+        if message.get('time_left') is not None:  # The seconds until the sender's "total_timeout" runs out.
+            context.deadline = time.perf_counter() + float(message['time_left'])
+            context.total_timeout = float(message['total_timeout'])
+        try:
+            results = Runnable(settings, language, code, runs, printer, context).run_all(self.pool)
+        finally:
+            context.cache.close()
+        with self.lock:
+            self.programs_run += 1
+        return {'output': encode_bytes(printer.getvalue()), 'results': results}
+
+    def close(self) -> None:
+        self.directory.cleanup()
+
+    def __enter__(self) -> 'Worker':
+        return self
+
+    def __exit__(self, *_: Any) -> None:
+        self.close()
+
+
+class WorkerHandler(socketserver.StreamRequestHandler):
+    def __init__(self, worker: Worker, *args: Any) -> None:
+        self.worker = worker
+        super().__init__(*args)
+
+    def handle(self) -> None:
+        try:
+            response = self.worker.respond(json.loads(self.rfile.readline().decode(ENCODING)))
+        except Exception as error:  # pylint: disable=broad-except # Any failure is reported back to the coordinator.
+            response = {'error': f'{type(error).__name__}: {error}'}
+        self.wfile.write(json.dumps(response).encode(ENCODING) + b'\n')
+
+
+def make_server(address: str, worker: Worker) -> socketserver.BaseServer:
+    """Makes a threaded server for `worker` on `address`, either "host:port" or "unix:<path>". Port 0 picks any."""
+    parsed = parse_address(address)
+    handler = partial(WorkerHandler, worker)
+    server: socketserver.BaseServer
+    if isinstance(parsed, str):
+        server = socketserver.ThreadingUnixStreamServer(parsed, handler)  # pylint: disable=no-member
+    else:
+        server = socketserver.ThreadingTCPServer(parsed, handler)
+    setattr(server, 'daemon_threads', True)
+    return server
+
+
+def server_address(server: socketserver.BaseServer) -> str:
+    address: Any = server.server_address
+    if isinstance(address, str):
+        return f'unix:{address}'
+    return f'{address[0]}:{address[1]}'
+
+
+def cmdline(argv: List[str]) -> None:
+    description = 'Runs programs sent by RunMany processes that list this worker\'s address in their "workers" setting.'
+    parser = argparse.ArgumentParser(prog='runmany-worker', description=description)
+    parser.add_argument('address', metavar='<address>', nargs='?', default=DEFAULT_ADDRESS,
+                        help=f'the "host:port" or "unix:<path>" address to listen on, defaults to {DEFAULT_ADDRESS}')
+    parser.add_argument('-t', '--token', metavar='<token>', default=os.environ.get(TOKEN_VARIABLE),
+                        help=f'the secret senders must give, defaults to the {TOKEN_VARIABLE} environment variable')
+    parser.add_argument('-s', '--settings', metavar='<settings-file>',
+                        help='the path to the .json settings file used to find which languages are installed')
+    parser.add_argument('-j', '--jobs', metavar='<jobs>', type=int, default=os.cpu_count() or 1,
+                        help='the number of programs to run at once, defaults to the number of CPUs')
+    args = parser.parse_args(argv)
+    if not args.token:
+        parser.error(f'a token is required, from --token or the {TOKEN_VARIABLE} environment variable')
+    printer = Printer(sys.stdout)
+    with Worker(Settings.from_json(args.settings, printer), args.jobs, args.token) as worker:
+        with make_server(args.address, worker) as server:
+            printer.print(f'RunMany worker listening on {server_address(server)} with {worker.jobs} jobs '
+                          f'for {len(worker.languages)} languages: {", ".join(worker.languages)}')
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                pass
+
+
+def main() -> None:
+    cmdline(sys.argv[1:])  # pragma: no cover
+
+
+if __name__ == '__main__':  # pragma: no cover
+    main()
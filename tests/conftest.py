@@ -0,0 +1,12 @@
+"""Fixtures shared by all the tests."""
+
+import pathlib
+from typing import Iterator
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def cache_home(tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch) -> Iterator[pathlib.Path]:
+    """Keeps the probes and durations RunMany caches while testing out of the real ~/.cache."""
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'cache'))
+    yield tmp_path / 'cache'
@@ -0,0 +1,68 @@
+"""Tests recording run timings to a history database and reporting regressions."""
+
+import io
+import pathlib
+import sqlite3
+from contextlib import redirect_stdout
+import pytest
+from runmany import runmany, runmanys, cmdline
+from runmany.history import compare, p_value
+
+
+def write_files(tmp_path: pathlib.Path, delay: float) -> pathlib.Path:
+    delay_path = tmp_path / 'delay.txt'
+    delay_path.write_text(str(delay))
+    many_path = tmp_path / 'timed.many'
+    many_path.write_text(f'Argv for Python: a\nPython: import time; time.sleep(float(open(r"{delay_path}").read()))\n'
+                         'Print: printed\n')
+    return many_path
+
+
+def test_history_regressions(tmp_path: pathlib.Path) -> None:
+    history = tmp_path / 'history.db'
+    many_path = write_files(tmp_path, 0)
+    output = runmanys(many_path, history=history, compare_to='baseline', mark_baseline=True)
+    assert output.endswith('No baseline of this file to compare to.\n')
+    assert runmany(many_path, outfile=tmp_path / 'out.txt', history=history, compare_to='last') == 0
+
+    write_files(tmp_path, 0.5)
+    output = runmanys(many_path, history=history, compare_to='baseline')
+    assert 'Compared to the baseline run from ' in output
+    assert 'Regression: Python on line 2 with argv "a" took 0.' in output
+    assert output.endswith('1/2 runs regressed by over 10%.\n')
+    assert runmany(many_path, outfile=tmp_path / 'out.txt', history=history, compare_to='last') == 0
+    assert runmany(many_path, outfile=tmp_path / 'out.txt', history=history, compare_to='baseline') == 1
+    assert runmany(many_path, outfile=tmp_path / 'out.txt', history=history, compare_to='baseline',
+                   regression_threshold=1000) == 0
+
+    with sqlite3.connect(str(history)) as connection:
+        assert connection.execute('SELECT COUNT(*), SUM(baseline) FROM invocations').fetchone() == (6, 1)
+        rows = connection.execute('SELECT language, argv, exit_code, version FROM runs ORDER BY rowid').fetchall()
+    assert rows[0][:3] == ('Python', 'a', '0') and rows[0][3].startswith('Python')
+    assert rows[1][:3] == ('Print', None, '0')
+    connection.close()
+
+
+def test_cmdline_exit_code(tmp_path: pathlib.Path) -> None:
+    history = str(tmp_path / 'history.db')
+    many_path = str(write_files(tmp_path, 0))
+    with io.StringIO() as stdout, redirect_stdout(stdout):
+        cmdline([many_path, '--history', history, '--mark-baseline'])
+        write_files(tmp_path, 0.5)
+        cmdline([many_path, '--history', history, '--compare-to', 'last', '--regression-threshold', '1000'])
+        with pytest.raises(SystemExit) as error:
+            cmdline([many_path, '--history', history, '--compare-to', 'baseline'])
+    assert error.value.code == 1
+
+
+def test_significance() -> None:
+    before = [1.0, 1.1, 0.9, 1.0, 1.05, 0.95]
+    assert p_value(before, [1.5, 1.6, 1.4, 1.5, 1.55, 1.45]) < 0.01
+    assert p_value(before, [1.0, 1.1, 0.9, 1.0, 1.05, 0.95]) > 0.4
+    identity = (1, 'Python', 'hash', None, None)
+    noisy = [0.5, 2.0, 0.6, 1.9, 0.5, 2.1]
+    assert not compare({identity: ('0', before, 'v1')}, {identity: ('0', noisy, 'v1')}, 0.1)
+    (regression,) = compare({identity: ('0', [1.0], 'v1')}, {identity: ('0', [1.2], 'v2')}, 0.1)
+    assert regression[0] == identity and round(regression[1], 6) == 1.2
+    assert regression[2:] == (1.0, 1.2, None, 'v1', 'v2')
+    assert not compare({identity: ('0', [1.0], 'v1')}, {identity: ('1', [1.2], 'v1')}, 0.1)
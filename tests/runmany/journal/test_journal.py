@@ -0,0 +1,35 @@
+"""Tests journaling runs as they finish and resuming interrupted runs from the journal."""
+
+import pathlib
+import pytest
+from runmany import runmanys, cmdline
+from runmany.journal import Journal
+
+
+def test_resume(tmp_path: pathlib.Path) -> None:
+    log = tmp_path / 'log'
+    code = f'import sys; open(r"{log}", "a").write(sys.argv[1]); print(sys.argv[1])'
+    many_file = f'Argv for Python: 1\nAlso: 2\nPython: {code}\nAlso: {code}\nC: int main() {{ retur }}\n'
+    journal = tmp_path / 'journal.jsonl'
+    settings = {"show_equal": True, "nondeterministic": True}  # Each run logs, so none are shared.
+    expected = runmanys(many_file, settings, from_string=True, journal=journal)
+    assert log.read_text() == '1212'
+    lines = journal.read_text().splitlines()
+    assert len(lines) == 5
+
+    journal.write_text(lines[0] + '\n' + lines[4] + '\n' + lines[1][:10])  # As if interrupted mid-write.
+    log.unlink()
+    assert runmanys(many_file, settings, from_string=True, journal=journal, resume=True) == expected
+    assert log.read_text() == '212'
+    assert runmanys(many_file, settings, from_string=True, journal=journal, resume=True) == expected
+    assert log.read_text() == '212'
+    assert len(Journal(journal, True).entries) == 5
+
+    runmanys(many_file, settings, from_string=True, journal=journal)
+    assert log.read_text() == '2121212'
+    assert len(journal.read_text().splitlines()) == 5
+
+
+def test_resume_requires_journal() -> None:
+    with pytest.raises(SystemExit):
+        cmdline(['file.many', '--resume'])
@@ -1,12 +1,21 @@
 """Tests all the JSON settings."""
 
 import io
+import os
+import re
 import json
+import time
+import shutil
 import pathlib
+import pytest
 from itertools import chain
 from typing import Dict, Any, Optional, Callable, List
 from contextlib import redirect_stderr
 from runmany import runmanys
+from runmany.runner import PathParts, command_template
+from runmany.settings import Settings
+from runmany.admission import Admission
+from runmany.util import Printer
 
 BASE_SETTINGS = {
     "timeout": 10.0,
@@ -319,6 +328,42 @@ Python:
     verify(settings_json, 'timeout2.txt', many_file)
 
 
+def test_total_timeout(tmp_path: pathlib.Path) -> None:
+    many_file = '''\
+Python: print(1)
+Python:
+    import time
+    time.sleep(2)
+Python: print(3)
+Print: 4
+'''
+    settings_json: Dict[str, Any] = {"show_runs": True, "show_output": True, "show_stats": True, "minimalist": True,
+                                     "timeout": 5.0, "total_timeout": 1.0}
+    skipped = 'SKIPPED, THE 1.000s TOTAL TIMEOUT RAN OUT'
+    expected = ['1. Python', '1', '2. Python [exit code T]', 'TIMED OUT', '3. Python [exit code S]', skipped,
+                '4. Print [exit code S]', skipped, '1/4 programs successfully run. 1 failed due to non-zero exit code '
+                'or timeout. 2 skipped when the total timeout ran out.']
+    for deadline in (None, 1.0):
+        if deadline:
+            settings_json["total_timeout"] = 60.0
+        start_time = time.perf_counter()
+        lines = runmanys(many_file, combine_with_base(settings_json), from_string=True, deadline=deadline).splitlines()
+        assert time.perf_counter() - start_time < 1.5
+        assert [line[:9] if line.startswith('TIMED') else line for line in lines if line] == expected
+
+    metrics_path = tmp_path / 'runmany.prom'
+    runmanys(many_file, combine_with_base(settings_json), from_string=True, deadline=1.0, metrics_file=metrics_path)
+    samples = dict(line.rsplit(' ', 1) for line in metrics_path.read_text().splitlines() if not line.startswith('#'))
+    assert samples['runmany_runs_failed_total{language="Python"}'] == '1'
+    assert samples['runmany_runs_skipped_total{language="Python"}'] == '1'
+    assert samples['runmany_runs_skipped_total{language="Print"}'] == '1'
+    assert samples['runmany_run_duration_seconds_count{language="Python"}'] == '2'
+
+    settings_json["total_timeout"] = None
+    lines = runmanys(many_file, combine_with_base({**settings_json, "timeout": 0.2}), from_string=True).splitlines()
+    assert lines[-1] == '3/4 programs successfully run. 1 failed due to non-zero exit code or timeout.'
+
+
 def test_stderr() -> None:
     many_file = '''\
 Python:
@@ -396,6 +441,18 @@ def test_show_errors() -> None:
             assert not file.read()
 
 
+def test_show_errors_per_program() -> None:
+    absent = '"languages": [{"name": "Absent", "command": "runmany-absent-executable $file", "skip_missing": true}]'
+    for jobs in (1, 2):
+        many_file = f'Settings: {{"show_errors": true, "jobs": {jobs}, {absent}}}\nAbsent: 1\n' \
+            f'Settings: {{"show_errors": false, "jobs": {jobs}, {absent}}}\nAbsent: 2\n'
+        with io.StringIO() as file, redirect_stderr(file):
+            runmanys(many_file, from_string=True)
+            errors = file.getvalue()
+        assert 'Cannot run Absent on line 2' in errors
+        assert 'line 4' not in errors
+
+
 def test_show_stats() -> None:
     verify({"show_stats": True}, "show_stats.txt")
 
@@ -418,3 +475,312 @@ Python:
 Python: print(0)
 '''
     verify({"show_equal": True, "show_stats": True}, "footer.txt", many_file)
+
+
+def test_jobs() -> None:
+    many_file = '''\
+Python:
+    import os, sys, time
+    time.sleep(0.2)
+    print(os.listdir(os.path.dirname(os.path.abspath(sys.argv[0]))) == [os.path.basename(sys.argv[0])])
+Also:
+    print(1)
+Also:
+    import os, sys
+    open(os.path.join(os.path.dirname(sys.argv[0]), 'artifact'), 'w').close()
+    print(2)
+Also:
+    import os, sys
+    print(os.listdir(os.path.dirname(os.path.abspath(sys.argv[0]))) == [os.path.basename(sys.argv[0])])
+'''
+    settings_json: Dict[str, Any] = {"show_runs": True, "show_output": True, "show_equal": True, "show_stats": True}
+    expected = runmanys(many_file, combine_with_base(settings_json), from_string=True)
+    assert expected.count('True') == 2
+    for jobs in (2, 4):
+        settings_json["jobs"] = jobs
+        assert runmanys(many_file, combine_with_base(settings_json), from_string=True) == expected
+
+
+def test_nondeterministic() -> None:
+    many_file = '''\
+Argv: 1
+Also: 1
+Python, Python: import random, sys
+    print(sys.argv[1], random.random())
+'''
+    settings_json: Dict[str, Any] = {"show_runs": True, "show_output": True, "show_equal": True}
+    for jobs in (1, 3):
+        settings_json["jobs"] = jobs
+        settings_json["nondeterministic"] = False
+        verify(settings_json, None, many_file, lambda actual, _: assert_in('4/4 had the exact same stdout!', actual))
+        settings_json["nondeterministic"] = True
+        verify(settings_json, None, many_file, lambda actual, _: assert_in('1/4 had the exact same stdout.', actual))
+        settings_json["nondeterministic"] = False
+        settings_json["runs"] = 2
+        verify(settings_json, None, many_file, lambda actual, _: assert_in('1/4 had the exact same stdout.', actual))
+        del settings_json["runs"]
+
+
+def assert_in(expected: str, actual: str) -> None:
+    assert expected in actual
+
+
+def test_pairing() -> None:
+    many_file = '''\
+Argv: 1
+Also: 2
+Also: 3
+Stdin: a
+Also: b
+Also: c
+Python: import sys
+    print(sys.argv[1] + input())
+'''
+    settings_json: Dict[str, Any] = {"show_runs": True, "show_output": True, "minimalist": True, "spacing": 0,
+                                     "strip_output": "yes"}
+
+    def asserter(*outputs: str) -> Callable[[str, str], None]:
+        def assert_outputs(actual: str, _: str) -> None:
+            assert actual.splitlines()[1::2] == list(outputs)
+        return assert_outputs
+
+    verify(settings_json, None, many_file, asserter('1a', '1b', '1c', '2a', '2b', '2c', '3a', '3b', '3c'))
+    settings_json["pairing"] = "zip"
+    verify(settings_json, None, many_file, asserter('1a', '2b', '3c'))
+    verify(settings_json, None, many_file.replace('Also: 3\n', ''), asserter())
+    verify(settings_json, None, many_file.replace('Also: 2\nAlso: 3\n', ''), asserter('1a', '1b', '1c'))
+    with io.StringIO() as file, redirect_stderr(file):
+        runmanys(many_file.replace('Also: c\n', ''), combine_with_base({**settings_json, "show_errors": True}),
+                 from_string=True)
+        assert file.getvalue() == '||| RunMany Error: Cannot zip 3 argvs with 2 stdins for Python on line 6. ' \
+            'Skipping program. |||\n'
+
+
+def test_precise_time() -> None:
+    many_file = '''\
+Stdin: 3
+Python: print(sum(range(int(input()))))
+'''
+
+    def make_asserter(pattern: str) -> Callable[[str, str], None]:
+        def asserter(actual: str, _: str) -> None:
+            assert re.match(pattern, actual.splitlines()[0])
+            assert actual.splitlines()[1] == '3'
+        return asserter
+
+    settings_json: Dict[str, Any] = {"show_runs": True, "show_time": True, "show_output": True, "minimalist": True,
+                                     "precise_time": True}
+    cpu = r', \d+\.\d{3}s cpu' if hasattr(os, 'wait4') else ''
+    verify(settings_json, None, many_file, make_asserter(rf'^1\. Python \(\d+\.\d{{3}}s{cpu}\)$'))
+    settings_json["calibrate_time"] = True
+    baseline = r', \d+\.\d{3}s baseline'
+    verify(settings_json, None, many_file, make_asserter(rf'^1\. Python \(\d+\.\d{{3}}s{cpu}{baseline}\)$'))
+    settings_json["precise_time"] = False
+    verify(settings_json, None, many_file, make_asserter(rf'^1\. Python \(\d+\.\d{{3}}s{baseline}\)$'))
+
+
+def test_command_override_drops_compile() -> None:
+    many_file = 'Rust: this is not Rust, so compiling it would fail\n'
+    settings_json = {"show_runs": True, "show_output": True, "show_command": True, "minimalist": True,
+                     "strip_output": "yes", "spacing": 0}
+    languages: List[Dict[str, Any]] = [{"name": "Rust", "command": "echo custom-rust-runner"}]
+    output = runmanys(many_file, combine_with_base({**settings_json, "languages": languages}), from_string=True)
+    assert output.splitlines()[1].startswith('custom-rust-runner ')
+    languages[0]["compile_command"] = 'echo compiled > "$rawbranch"'
+    languages[0]["command"] = 'cat "$rawbranch"'
+    output = runmanys(many_file, combine_with_base({**settings_json, "languages": languages}), from_string=True)
+    assert output.splitlines()[1] == 'compiled'
+    settings = Settings(Printer(io.StringIO()), {"languages": [{"name": "Rust", "timeout": 5}]})
+    assert settings['rust'].compile_command == 'rustc $file --out-dir $dir'
+
+
+def test_compile_command(tmp_path: pathlib.Path) -> None:
+    # "Compiling" checks the syntax and copies the code to $branch.py after a pause, so runs need compiling first.
+    compiled = {"name": "Compiled", "extension": ".txt", "command": 'python "$rawbranch.py" $argv', "runs": 1,
+                "compile_command": 'python -c "import shutil, sys, time; time.sleep(0.3); '
+                                   'compile(open(sys.argv[1]).read(), sys.argv[1], \'exec\'); '
+                                   'shutil.copy(sys.argv[1], sys.argv[2] + \'.py\')" $file "$rawbranch"'}
+    many_file = '''\
+Compiled: import time; time.sleep(0.3); print(1)
+Also: print(2)
+Also: print(3
+'''
+    settings_json = {"languages": [compiled], "show_runs": True, "show_time": True, "show_output": True,
+                     "minimalist": True, "strip_output": "yes", "show_errors": False}
+    trace_path = tmp_path / 'trace.json'
+    output = runmanys(many_file, combine_with_base(settings_json), from_string=True, trace=trace_path)
+    lines = output.splitlines()
+    assert re.match(r'^1\. Compiled \(0\.[34]\d\ds\)$', lines[0]) and lines[1] == '1'
+    assert re.match(r'^2\. Compiled \(0\.[0-2]\d\ds\)$', lines[3]) and lines[4] == '2'
+    assert re.match(r'^3\. Compiled \(0\.[3-9]\d\ds compile\) \[exit code 1\]$', lines[6]) and 'SyntaxError' in output
+
+    with open(trace_path, encoding='utf-8') as file:
+        events = json.load(file)['traceEvents']
+    compiles = sorted((event for event in events if event['name'] == 'compile'), key=lambda event: event['ts'])
+    runs = sorted((event for event in events if event['name'] == 'run'), key=lambda event: event['ts'])
+    assert [event['args']['exit_code'] for event in compiles] == [0, 0, 1]
+    assert compiles[1]['ts'] < runs[0]['ts'] + runs[0]['dur']  # The second program compiled during the first run.
+    assert runs[0]['ts'] + runs[0]['dur'] <= runs[1]['ts']  # Runs never overlap.
+
+    settings_json["show_command"] = True
+    lines = runmanys(many_file, combine_with_base(settings_json), from_string=True).splitlines()
+    assert re.match(r'^1\. Compiled \(0\.\d{3}s\) > python "[^"]+\.py"', lines[0])
+    assert ' compile) [exit code 1] > python -c "import shutil' in lines[6]
+
+
+def test_compare(tmp_path: pathlib.Path) -> None:
+    many_file = '''\
+Argv: 0.05
+Python: import sys, time; time.sleep(float(sys.argv[1])); print(1)
+Also: import sys, time; time.sleep(2 * float(sys.argv[1])); print(1)
+Also: exit(3)
+Argv: 0.01
+Python: import sys, time; time.sleep(float(sys.argv[1]))
+'''
+    settings_json = {"compare": True, "compare_baseline": "python", "runs": 3, "show_stats": False,
+                     "show_equal": False}
+    trace_path = tmp_path / 'trace.json'
+    output = runmanys(many_file, combine_with_base(settings_json), from_string=True, trace=trace_path)
+    lines = output.splitlines()
+    start = lines.index('Comparison of 3 runs with argv "0.05":')
+    assert lines[start + 1].split() == ['Run', 'Program', 'Median', '95%', 'CI', 'Relative']
+    assert lines[start + 2].startswith(' 1.  Python line 2') and lines[start + 2].endswith('baseline')
+    assert lines[start + 3].startswith(' 2.  Python line 3') and lines[start + 3].endswith('x slower')
+    assert lines[start + 4].split() == ['3.', 'Python', 'line', '4', '-', '-', '[exit', 'code', '3]']
+    assert 'Comparison of 1 run' not in output
+
+    with open(trace_path, encoding='utf-8') as file:
+        events = json.load(file)['traceEvents']
+    repeats = [event['args']['run'] for event in sorted((event for event in events if event['name'] == 'repeat'),
+                                                        key=lambda event: event['ts'])]
+    assert sorted(repeats[:3]) == sorted(repeats[3:6]) == sorted(repeats[6:9]) == [1, 2, 3]  # Interleaved by round.
+    assert repeats[9:] == [4, 4, 4]
+
+
+def test_line_directive() -> None:
+    many_file = '''\
+%% Blank lines are written above the code for each line above it unless there is a line directive.
+
+Directed: code
+Also:
+    more code
+Padded: code
+'''
+    languages = [{"name": "Directed", "command": "cat", "line_directive": "LINE $line $rawfile"},
+                 {"name": "Padded", "command": "cat"}]
+    settings_json = {"languages": languages, "show_runs": True, "show_output": True, "minimalist": True,
+                     "strip_code": "smart"}
+    output = runmanys(many_file, combine_with_base(settings_json), from_string=True)
+    lines = output.splitlines()
+    assert re.fullmatch(r'LINE 3 \S+', lines[1]) and lines[2] == 'code'
+    assert re.fullmatch(r'LINE 5 \S+', lines[6]) and lines[7] == 'more code'
+    assert lines[10] == '3. Padded' and lines[11:16] == [''] * 5 and lines[16] == 'code'
+
+
+@pytest.mark.skipif(shutil.which('gcc') is None, reason='requires gcc')
+def test_c_compile_error_excerpt() -> None:
+    many_file = '%% gcc quotes the line with an error, so C keeps the blank lines.\n\nC: int main() { retur }\n'
+    settings_json = {"show_runs": True, "show_output": True, "minimalist": True, "strip_code": "smart"}
+    output = runmanys(many_file, combine_with_base(settings_json), from_string=True)
+    assert ':3:' in output and 'int main() { retur }' in output and '^' in output
+
+
+def test_command_template() -> None:
+    template = command_template('cd $rawdir && cc $file -o $branch$ext.out $argv $HOME $line')
+    assert template is command_template('cd $rawdir && cc $file -o $branch$ext.out $argv $HOME $line')
+    assert template.placeholders == ['rawdir', 'file', 'branch', 'ext', 'argv', 'line']
+    assert str(template) == 'cd <rawdir> && cc <file> -o <branch><ext>.out <argv> $HOME <line>'
+    path, branch = os.path.join('dir', 'prog.c'), os.path.join('dir', 'prog')
+    parts = PathParts(path)
+    assert parts.fill_command(template.command, '$code $file', 'x') == \
+        f'cd dir && cc "{path}" -o "{branch}".c.out $code $file $HOME 1'
+    assert parts.fill_command('python', '1 2', '') == f'python "{path}" 1 2'
+    assert parts.fill_command('python', '', '') == f'python "{path}"'
+    assert parts.fill_command('cc $files -I $dirs -DLINE=$line', '', '', 7) == f'cc "{path}" -I "dir" -DLINE=7'
+
+
+@pytest.mark.skipif(not hasattr(os, 'sched_setaffinity'), reason='requires os.sched_setaffinity')
+def test_cpu_affinity() -> None:
+    many_file = '''\
+Python: import os; print(sorted(os.sched_getaffinity(0)))
+'''
+    usable = os.sched_getaffinity(0)  # pylint: disable=no-member
+    core = max(usable)
+    settings_json: Dict[str, Any] = {"show_runs": True, "show_output": True, "minimalist": True, "isolate_cores": True,
+                                     "languages": [{"name": "Python", "command": "python", "extension": ".py"}]}
+    for cpu_affinity in ([core], 'dedicated'):
+        settings_json["cpu_affinity"] = cpu_affinity
+        assert runmanys(many_file, combine_with_base(settings_json), from_string=True) == f'1. Python\n[{core}]\n\n\n'
+    assert os.sched_getaffinity(0) == usable  # pylint: disable=no-member
+
+    settings_json["cpu_affinity"], settings_json["show_errors"] = [core + 1], True
+    stderr = io.StringIO()
+    with redirect_stderr(stderr):
+        output = runmanys(many_file, combine_with_base(settings_json), from_string=True)
+    assert f'CPU cores [{core + 1}] are not usable' in stderr.getvalue()
+    assert output == f'1. Python\n{sorted(usable)}\n\n\n'
+
+
+def test_admission(tmp_path: pathlib.Path) -> None:
+    log = tmp_path / 'log'
+    code = f'''
+    import time
+    def write(text):
+        with open({str(log)!r}, 'a') as file:
+            file.write(text)
+    write('(')
+    time.sleep(0.2)
+    write(')')
+'''
+    many_file = f'Python:{code}Also:{code}Also:{code}'
+    settings_json: Dict[str, Any] = {"jobs": 3, "show_runs": True, "show_stats": True, "nondeterministic": True}
+    expected = runmanys(many_file, combine_with_base(settings_json), from_string=True)
+    assert log.read_text() != '()()()'
+    for limit in ({"max_concurrent": 1}, {"memory_estimate_mb": 1e12}):
+        log.unlink()
+        settings_json["languages"] = [{"name": "Python", **limit}]
+        assert runmanys(many_file, combine_with_base(settings_json), from_string=True) == expected
+        assert log.read_text() == '()()()'
+
+    trace_path = tmp_path / 'trace.json'
+    settings_json["languages"] = [{"name": "Python", "memory_estimate_mb": 1}]
+    runmanys(many_file * 2, combine_with_base(settings_json), from_string=True, trace=trace_path)
+    events = json.loads(trace_path.read_text())['traceEvents']
+    threads = {event['args']['name'] for event in events if event['name'] == 'thread_name'}
+    assert len([thread for thread in threads if thread.startswith('runmany-job')]) == 3
+
+
+def test_admission_order() -> None:
+    settings = Settings(Printer(io.StringIO()), {"languages": [{"name": "Python", "max_concurrent": 1}]})
+    python, printing = settings['python'], settings['print']
+    admission = Admission(2)
+    for rank, (language, item) in enumerate([(python, 'first'), (python, 'second'), (printing, 'third')]):
+        admission.add(rank, language, item)
+    assert admission.take() == 'first'
+    assert admission.take() == 'third'  # The second is more urgent but Python is at its limit.
+    admission.finish(python)
+    assert admission.take() == 'second'
+    admission.finish(printing)
+    admission.finish(python)
+    assert admission.take() is None
+
+
+def test_longest_first(tmp_path: pathlib.Path, cache_home: pathlib.Path) -> None:
+    log = tmp_path / 'log'
+    names = ('Quick', 'Quick', 'Quick', 'Quick', 'Slow')
+    many_file = ''.join(f'{name}: import time; open({str(log)!r}, "a").write("{name[0]}"); time.sleep(0.1); '
+                        f'print("{name}")\n' for name in names)
+    languages = [{"name": "Quick", "command": "python", "expected_time": 0.01},
+                 {"name": "Slow", "command": "python", "expected_time": 5.0}]
+    settings_json = {"show_runs": True, "show_output": True, "languages": languages, "jobs": 2,
+                     "nondeterministic": True}
+    output = runmanys(many_file, combine_with_base(settings_json), from_string=True)
+    assert [line for line in output.splitlines() if line.startswith(('Q', 'S'))] == list(names)
+    assert 'S' in log.read_text()[:2]
+    durations = json.loads((cache_home / 'runmany' / 'durations.json').read_text())
+    assert len(durations) == 2 and all(seconds > 0 for seconds in durations.values())
+
+    log.unlink()
+    settings_json["longest_first"] = False
+    assert runmanys(many_file, combine_with_base(settings_json), from_string=True) == output
+    assert log.read_text()[:3] == 'QQQ'
@@ -0,0 +1,92 @@
+"""Tests probing which languages are installed and skipping the ones that are not."""
+
+import io
+import os
+import json
+import pathlib
+from contextlib import redirect_stderr, redirect_stdout
+from typing import Any, Dict, Iterator
+import pytest
+from runmany import runmanys, cmdline
+from runmany.probing import Probes, command_executables, probe_languages
+from runmany.settings import Settings
+from runmany.util import Printer
+
+
+@pytest.fixture(autouse=True)
+def cache_home(tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch) -> Iterator[pathlib.Path]:
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path))
+    yield tmp_path
+
+
+def settings_with(languages: Any, **settings: Any) -> Settings:
+    return Settings(Printer(io.StringIO()), {"languages": languages, **settings})
+
+
+def test_command_executables() -> None:
+    assert command_executables('python') == ['python']
+    assert command_executables('cd $dir && gcc -c $file && gnatmake $file && $branch $argv') == ['gcc', 'gnatmake']
+    assert command_executables('kotlinc $file -d "$rawbranch.jar" && java -jar "$rawbranch.jar"') == ['kotlinc', 'java']
+    assert command_executables('') == []
+
+
+def test_probe_cache(cache_home: pathlib.Path) -> None:
+    counter = cache_home / 'counter'
+    settings = settings_with([{"name": "Probed", "probe": f'echo x >> "{counter}" && echo Probed 1.2.3'},
+                              {"name": "Absent", "command": "runmany-absent-executable $file"}])
+    probes = Probes()
+    assert probes.probe(settings['probed']) == (True, 'Probed 1.2.3')
+    assert probes.probe(settings['absent']) == (False, '"runmany-absent-executable" was not found')
+    assert probes.probe(settings['probed']) == (True, 'Probed 1.2.3')
+    assert counter.read_text().count('x') == 1
+
+    with open(cache_home / 'runmany' / 'probes.json', encoding='utf-8') as file:
+        assert len(json.load(file)) == 2
+    assert Probes().probe(settings['probed']) == (True, 'Probed 1.2.3')  # As if in a new invocation.
+    assert counter.read_text().count('x') == 1
+
+    expired = settings_with(settings.languages, probe_ttl=0)
+    assert Probes().probe(expired['probed']) == (True, 'Probed 1.2.3')
+    assert counter.read_text().count('x') == 2
+    assert probes.probe(expired['probed']) == (True, 'Probed 1.2.3')  # Still known to the first invocation.
+    assert counter.read_text().count('x') == 2
+
+
+def test_probe_languages() -> None:
+    settings = settings_with([{"name": "Failing", "probe": "exit 1"}])
+    probes = probe_languages(settings, True)
+    assert probes['Failing'] == (False, 'probe "exit 1" failed')
+    assert probes['Python'][0] and probes['Python'][1].startswith('Python')
+    assert probes['Print'][0]
+
+
+def test_skip_missing() -> None:
+    many_file = 'Absent: 1\nPython: print(2)\nAbsent: 3\n'
+    languages: Dict[str, Any] = {"name": "Absent", "command": "runmany-absent-executable $file", "skip_missing": True}
+    with io.StringIO() as stderr, redirect_stderr(stderr):
+        output = runmanys(many_file, {"languages": [languages], "show_equal": False}, from_string=True)
+        errors = stderr.getvalue()
+    assert '1/1 program successfully run!' in output
+    assert 'Absent' not in output
+    assert errors.count('it is not installed ("runmany-absent-executable" was not found). Skipping program.') == 2
+    assert 'Cannot run Absent on line 3' in errors
+
+
+def test_probes_per_invocation(tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv('PATH', f'{tmp_path}{os.pathsep}{os.environ["PATH"]}')
+    language = {"name": "Late", "command": "runmany-late-executable", "skip_missing": True, "probe_ttl": 0}
+    settings = {"languages": [language], "show_errors": False}
+    assert 'Late' not in runmanys('Late: 1\n', settings, from_string=True)
+    executable = tmp_path / 'runmany-late-executable'
+    executable.write_text('#!/bin/sh\necho late\n')
+    executable.chmod(0o755)
+    assert 'late' in runmanys('Late: 1\n', settings, from_string=True)  # Installed since the last invocation.
+
+
+def test_cmdline_languages() -> None:
+    with io.StringIO() as stdout, redirect_stdout(stdout):
+        cmdline(['--languages'])
+        lines = stdout.getvalue().splitlines()
+    python = next(line for line in lines if line.startswith('Python '))
+    assert python.split()[1:3] == ['installed', 'Python']
+    assert len(lines) == len(Settings(Printer(io.StringIO())).computed_languages())
@@ -117,3 +117,194 @@ def test_cmdline():
     verify_to_file([manyfile, '-s', settings, '-o', outfile], output2)
     verify_to_file([manyfile, '-s', settings, '--outfile', outfile], output2)
     verify_to_file(['-o', outfile, '-s', settings, manyfile], output2)
+
+
+def test_concurrent_runmanys():
+    from concurrent.futures import ThreadPoolExecutor  # pylint: disable=import-outside-toplevel
+    from runmany import runmanys  # pylint: disable=import-outside-toplevel
+
+    def case(i):
+        many_file = ''.join(f'Print: thread {i} snippet {j}\nnot a section of thread {i}\n' for j in range(5))
+        return many_file, {"minimalist": i % 2 == 0, "show_errors": i % 3 == 0}
+
+    def run_case(many_file, settings):
+        errfile = io.StringIO()
+        return runmanys(many_file, settings, from_string=True, errfile=errfile), errfile.getvalue()
+
+    cases = [case(i) for i in range(24)]
+    expected = [runmanys(many_file, settings, from_string=True) for many_file, settings in cases]
+    with ThreadPoolExecutor(max_workers=len(cases)) as executor:
+        futures = [executor.submit(run_case, many_file, settings) for many_file, settings in cases]
+        actual = [future.result() for future in futures]
+    assert [output for output, _ in actual] == expected
+    for i, (output, errors) in enumerate(actual):
+        assert output.count(f'thread {i} ') == 5
+        assert errors.count('RunMany Error') == (5 if i % 3 == 0 else 0)
+        assert errors.count(f'thread {i}"') == (5 if i % 3 == 0 else 0)
+        assert errors.count('thread ') == errors.count(f'thread {i}"')
+
+
+def test_trace(tmp_path):
+    from runmany import runmanys  # pylint: disable=import-outside-toplevel
+    many_file = 'Settings: {"jobs": 2}\nPython: print(1)\nPython: exit(3)\nPrint: printed\n'
+    trace_path = tmp_path / 'trace.json'
+    expected = runmanys(many_file, from_string=True)
+    assert runmanys(many_file, from_string=True, trace=trace_path) == expected
+
+    with open(trace_path, encoding='utf-8') as file:
+        events = json.load(file)['traceEvents']
+    names = {event['name'] for event in events}
+    for name in ('load', 'settings', 'parse', 'plan', 'settings update', 'write file', 'spawn', 'wait', 'run', 'print'):
+        assert name in names
+    runs = sorted((event['args']['line'], event['args']['language'], event['args']['exit_code'])
+                  for event in events if event['name'] == 'run')
+    assert runs == [(2, 'Python', 0), (3, 'Python', 3), (4, 'Print', 0)]
+    threads = {event['args']['name'] for event in events if event['name'] == 'thread_name'}
+    assert any(thread.startswith('runmany-job') for thread in threads)
+
+
+def test_metrics_file(tmp_path):
+    from runmany import runmanys  # pylint: disable=import-outside-toplevel
+    many_file = 'Stdin for Python: x\nAlso: x\nPython: print(1)\nAlso: exit(2)\nAlso: import time; time.sleep(9)\n' \
+                'Print: printed\n'
+    metrics_path = tmp_path / 'runmany.prom'
+    expected = runmanys(many_file, {"timeout": 1.5}, from_string=True)
+    assert runmanys(many_file, {"timeout": 1.5}, from_string=True, metrics_file=metrics_path) == expected
+    assert os.listdir(tmp_path) == ['runmany.prom']
+
+    with open(metrics_path, encoding='utf-8') as file:
+        samples = dict(line.rsplit(' ', 1) for line in file.read().splitlines() if not line.startswith('#'))
+    assert samples['runmany_runs_total{language="Python"}'] == '6'
+    assert samples['runmany_runs_total{language="Print"}'] == '1'
+    assert samples['runmany_runs_failed_total{language="Python"}'] == '4'
+    assert samples['runmany_timeouts_total{language="Python"}'] == '2'
+    assert samples['runmany_run_duration_seconds_count{language="Python"}'] == '6'
+    assert samples['runmany_run_duration_seconds_bucket{language="Python",le="+Inf"}'] == '6'
+    assert samples['runmany_run_duration_seconds_bucket{language="Python",le="1.0"}'] == '4'
+    assert (samples['runmany_cache_hits_total'], samples['runmany_cache_misses_total']) == ('3', '4')
+    assert float(samples['runmany_cache_hit_ratio']) == 3 / 7
+    assert float(samples['runmany_wall_time_seconds']) > 1.5
+
+    many_file = 'Argv: 1\nAlso: 1\nPython: print(1)\n'
+    runmanys(many_file, {"show_time": True, "calibrate_time": True}, from_string=True,
+             metrics_file=os.fsencode(metrics_path))
+    with open(metrics_path, encoding='utf-8') as file:
+        samples = dict(line.rsplit(' ', 1) for line in file.read().splitlines() if not line.startswith('#'))
+    assert (samples['runmany_cache_hits_total'], samples['runmany_cache_misses_total']) == ('1', '1')
+
+
+def test_shared_runs(tmp_path):
+    from runmany import runmanys  # pylint: disable=import-outside-toplevel
+    log = tmp_path / 'log'
+    snippet = f"open(r'{log}', 'a').write('ran\\n'); print('shared')"
+    many_file = f'Python: {snippet}\nPrint: between\nAlso: x\nPython: {snippet}\nAlso: {snippet}\n'
+    assert runmanys(many_file, {"strip_code": "smart"}, from_string=True).count('shared') == 3
+    assert log.read_text().count('ran') == 1
+
+    log.unlink()
+    settings = 'Settings: {"languages": [{"name": "Python", "binary_output": %s}]}\n'
+    runmanys(settings % 'false' + f'Python: {snippet}\n' + settings % 'true' + f'Python: {snippet}\n',
+             from_string=True)
+    assert log.read_text().count('ran') == 2
+
+
+def test_binary_output(tmp_path):
+    from runmany import runmany, runmanys  # pylint: disable=import-outside-toplevel
+    many_file = '''\
+Settings: {"languages": [{"name": "Python", "binary_output": true}], "runs": 2, "minimalist": true}
+Python: import sys; sys.stdout.buffer.write(bytes(range(256)) * 1000)
+Also: import sys; sys.stdout.buffer.write(bytes(range(256)) * 1000)
+Also: import sys; sys.stdout.buffer.write(b'\\xff\\r\\n'); sys.exit(1)
+'''
+    out_path = tmp_path / 'out.txt'
+    runmany(many_file, outfile=out_path, from_string=True)
+    with open(out_path, 'rb') as file:
+        output = file.read()
+    assert output.count(bytes(range(256)) * 1000) == 2
+    assert b'3. Python [exit code 1]\n\xff\r\n\n' in output
+    assert b'2/3 had the exact same stdout. Equal runs grouped: [3] [1 2]' in output
+
+    for jobs in (2, 3):
+        runmany(many_file.replace('"minimalist": true', f'"minimalist": true, "jobs": {jobs}'), outfile=out_path,
+                from_string=True)
+        with open(out_path, 'rb') as file:
+            assert file.read() == output
+
+    text = runmanys(many_file, from_string=True)
+    assert '�\r\n' in text and '2/3 programs successfully run' in text
+
+    cached_file = '''\
+Settings: {"languages": [{"name": "Python", "binary_output": true}], "minimalist": true, "jobs": 2}
+Argv: a
+Also: a
+Python: import sys; sys.stdout.buffer.write(bytes(range(256)))
+'''
+    runmany(cached_file, outfile=out_path, from_string=True)
+    with open(out_path, 'rb') as file:
+        assert file.read().count(bytes(range(256))) == 2
+
+
+def test_binary_output_shared(tmp_path):
+    from runmany import runmany  # pylint: disable=import-outside-toplevel
+    block = bytes(range(256)) * 40000
+    snippet = 'import sys; sys.stdout.buffer.write(bytes(range(256)) * 40000)'
+    many_file = f'Python: {snippet}\n' * 4
+    out_path = tmp_path / 'out.txt'
+    settings = {"binary_output": True, "strip_code": "yes", "minimalist": True, "show_stats": False,
+                "show_equal": False}
+    for jobs in (1, 4):
+        runmany(many_file, {**settings, "jobs": jobs}, out_path, from_string=True)
+        with open(out_path, 'rb') as file:
+            output = file.read()
+        assert output.count(block) == 4 and len(output) < 5 * len(block)
+
+
+def test_batch_compile(tmp_path):
+    from runmany import runmanys  # pylint: disable=import-outside-toplevel
+    compiler, log = tmp_path / 'compiler.py', tmp_path / 'log'
+    compiler.write_text(f'''\
+import sys, shutil
+open({str(log)!r}, 'a').write(str(len(sys.argv) - 1))
+print('compiling')
+bad = [file for file in sys.argv[1:] if 'bad' in open(file).read()]
+for file in bad:
+    print(file + ':1: error: bad code')
+    print('    bad')
+if bad:
+    sys.exit(1)
+for file in sys.argv[1:]:
+    shutil.copy(file, file + '.out')
+''')
+    languages = [{"name": "Batched", "extension": ".py", "compile_command": "false",
+                  "batch_compile_command": f'python "{compiler}" $files', "command": "python $rawfile.out"}]
+    settings = {"languages": languages, "minimalist": True, "show_equal": False}
+    many_file = 'Batched: print(1)\nBatched: print(2)\nBatched: print(3)\n'
+    assert runmanys(many_file, settings, from_string=True).splitlines()[:8] == \
+        ['1. Batched', '1', '', '', '2. Batched', '2', '', '']
+    assert log.read_text() == '3'
+
+    log.unlink()
+    output = runmanys(many_file.replace('print(2)', 'print(2) # bad'), settings, from_string=True)
+    assert log.read_text() == '32'
+    assert '2. Batched [exit code 1]\ncompiling\n' in output and ':1: error: bad code\n    bad\n' in output
+    assert '1. Batched\n1\n' in output and '3. Batched\n3\n' in output
+    assert output.count('error') == 1
+    expected = runmanys(many_file, settings, from_string=True)
+    assert runmanys(many_file, {**settings, "jobs": 2}, from_string=True) == expected
+
+
+def test_split_compile_errors():
+    from runmany.runner import Runner  # pylint: disable=import-outside-toplevel
+    paths = [os.path.join('dir1', 'tmpab.java'), os.path.join('dir2', 'xtmpab.java'), os.path.join('dir3', 'c.java')]
+    output = ('warning: something\n'
+              f'{paths[1]}:3: error: bad\n'
+              '    tmpab.java is mentioned here\n'
+              'xtmpab.java:4: error: worse\n'
+              f'Note: {paths[0]} uses unchecked operations\n'
+              'tmpab.java:5: error: also bad\n'
+              'c.javax is not c.java\n')
+    assert Runner.split_compile_errors(output, paths) == {
+        1: 'warning: something\n' f'{paths[1]}:3: error: bad\n' '    tmpab.java is mentioned here\n'
+           'xtmpab.java:4: error: worse\n',
+        0: 'warning: something\n' f'Note: {paths[0]} uses unchecked operations\n' 'tmpab.java:5: error: also bad\n'
+           'c.javax is not c.java\n'}
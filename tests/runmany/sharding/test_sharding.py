@@ -0,0 +1,74 @@
+"""Tests splitting programs between shards and merging the shards' results."""
+
+import io
+import pathlib
+from typing import List
+from contextlib import redirect_stderr
+import pytest
+from runmany import runmanys, cmdline
+from runmany.sharding import parse_shard
+
+MANY_FILE = '''\
+Argv for Python: 1
+Also: 2
+Python: import sys; print(sys.argv[1:])
+Python: print('same')
+Python: import sys; sys.exit(3)
+Print: same
+Python: print('other')
+Print: other
+Python: print('same')
+'''
+
+
+def merge(tmp_path: pathlib.Path, shard_files: List[pathlib.Path]) -> str:
+    outfile = tmp_path / 'merged.txt'
+    cmdline(['--merge', *map(str, shard_files), '-o', str(outfile)])
+    return outfile.read_text()
+
+
+@pytest.mark.parametrize('balance', (False, True))
+def test_merge(tmp_path: pathlib.Path, balance: bool) -> None:
+    expected = runmanys(MANY_FILE, from_string=True)
+    shard_files = [tmp_path / f'part{k}.json' for k in range(1, 4)]
+    outputs = [runmanys(MANY_FILE, from_string=True, shard=(k, 3), shard_file=shard_file, balance_shards=balance)
+               for k, shard_file in enumerate(shard_files, 1)]
+    assert sum(output.count('. Python') + output.count('. Print') for output in outputs) == 12
+    assert merge(tmp_path, shard_files[::-1]) == expected
+
+
+def test_missing_shard(tmp_path: pathlib.Path) -> None:
+    shard_file = tmp_path / 'shard1.json'
+    runmanys(MANY_FILE, from_string=True, shard=(1, 2), shard_file=shard_file)
+    with io.StringIO() as stderr, redirect_stderr(stderr):
+        merged = merge(tmp_path, [shard_file, shard_file])
+        errors = stderr.getvalue()
+    assert 'Shard 1/2 was given more than once. Skipping shard.' in errors
+    assert 'Shard 2 of 2 missing. Merging the rest.' in errors
+    assert merged.startswith('*')
+
+
+def test_parse_shard() -> None:
+    assert parse_shard('3/8') == (3, 8)
+    for text in ('0/2', '3/2', '1', 'a/b'):
+        with pytest.raises(ValueError):
+            parse_shard(text)
+
+
+def test_shard_needs_file(tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.chdir(tmp_path)
+    with io.StringIO() as stderr, redirect_stderr(stderr):
+        output = runmanys(MANY_FILE, from_string=True, shard=(1, 2))
+        errors = stderr.getvalue()
+    assert 'Can only run shard 1/2 when there is a shard file to write its results to. Skipping shard.' in errors
+    assert output == runmanys(MANY_FILE, from_string=True)
+    assert not list(tmp_path.iterdir())
+
+
+def test_shard_compare(tmp_path: pathlib.Path) -> None:
+    settings = {"compare": True, "show_errors": True}
+    with io.StringIO() as stderr, redirect_stderr(stderr):
+        output = runmanys(MANY_FILE, settings, from_string=True, shard=(1, 1), shard_file=tmp_path / 'shard1.json')
+        errors = stderr.getvalue()
+    assert 'Cannot compare programs in a shard' in errors and 'Skipping comparison.' in errors
+    assert 'Comparison of' not in output
@@ -0,0 +1,67 @@
+"""Tests sweeping argvs and stdins over ranges of values and fitting how programs grow."""
+
+import io
+import csv
+import json
+import math
+import pathlib
+from contextlib import redirect_stderr
+import pytest
+from runmany import runmanys
+from runmany.sweeps import expand, fit, sweep_values
+
+
+def test_sweep_values() -> None:
+    assert sweep_values('1..4') == ['1', '2', '3', '4']
+    assert sweep_values('0..1 step 0.25') == ['0', '0.25', '0.5', '0.75', '1']
+    assert sweep_values('1000..10000 x2') == ['1000', '2000', '4000', '8000']
+    assert sweep_values('1e3..1e4 * 10') == ['1000', '10000']
+    assert sweep_values(' small | big ') == ['small', 'big']
+    for invalid in ('1..2 x1', '1..2 step 0', '0..8 x2', '5..1', 'nope'):
+        with pytest.raises(ValueError):
+            sweep_values(invalid)
+    assert expand('-n {1|2} -v') == [('-n 1 -v', '1'), ('-n 2 -v', '2')]
+    assert expand('{no sweep') == [('{no sweep', None)]
+
+
+def test_fit() -> None:
+    sizes = [1000.0 * 2 ** i for i in range(6)]
+    for model, grow in (('O(n)', lambda n: n), ('O(n log n)', lambda n: n * math.log(n)), ('O(n^2)', lambda n: n * n)):
+        best = fit(sizes, [0.05 + 1e-9 * grow(n) for n in sizes])
+        assert best is not None and best[0] == model
+        assert best[1] == pytest.approx(0.05) and best[2] == pytest.approx(1e-9)
+    noisy = fit(sizes, [0.05, 0.051, 0.049, 0.05, 0.052, 0.05])
+    assert noisy is not None and noisy[0] == 'O(1)'
+    assert fit(sizes[:2], [1.0, 2.0]) is None
+
+
+def test_sweep(tmp_path: pathlib.Path) -> None:
+    many_file = '''\
+Argv sweep for Python: {1..3}
+Also: {oops..}
+Stdin sweep for Print: {5|6}
+Python: import sys; print(int(sys.argv[1]) ** 2); sys.exit(sys.argv[1] == '2')
+Print: printed
+Argv for Python: 1
+Python: print('not swept')
+'''
+    json_path, csv_path = tmp_path / 'sweep.json', tmp_path / 'sweep.csv'
+    with io.StringIO() as stderr, redirect_stderr(stderr):
+        output = runmanys(many_file, {"show_equal": False}, from_string=True, sweep_file=json_path)
+        runmanys(many_file, {"show_equal": False}, from_string=True, sweep_file=csv_path)
+        assert 'Invalid sweep "oops.." is not a range or list on line 2. Skipping snippet.' in stderr.getvalue()
+    assert '\n1\n' in output and '\n4\n' in output and '\n9\n' in output
+    lines = output[output.index('Sweep of 2 programs over 5 values:'):].splitlines()
+    assert lines[1].split() == ['Value', 'Python', 'line', '4', 'Print', 'line', '5']
+    assert [line.split()[0] for line in lines[2:7]] == ['1', '2', '3', '5', '6']
+    assert lines[3].split()[1] == '-' and lines[5].split()[1] == '-'
+    assert lines[7].startswith('Python line 4 grows as too few sizes to fit')
+
+    with open(json_path, encoding='utf-8') as file:
+        data = json.load(file)
+    assert data['values'] == ['1', '2', '3', '5', '6']
+    assert [(program['language'], program['line']) for program in data['programs']] == [('Python', 4), ('Print', 5)]
+    assert data['programs'][0]['times'][1] is None and data['programs'][0]['times'][3] is None
+    with open(csv_path, encoding='utf-8', newline='') as file:
+        rows = list(csv.reader(file))
+    assert rows[0] == ['value', 'Python line 4', 'Print line 5'] and len(rows) == 6
@@ -294,6 +294,23 @@ Python: print('stdin reset')
     verify('stdin.txt', many_file)
 
 
+def test_stdin_file(tmp_path: pathlib.Path) -> None:
+    data = tmp_path / 'data.txt'
+    data.write_bytes(b'line\n' * 100000)
+    many_file = f'''\
+Stdin from file for Python: {data}
+Also: {tmp_path / 'missing.txt'}
+Python: import sys; print(len(sys.stdin.read()))
+'''
+    for precise_time in (False, True):  # Each repetition must read the whole file.
+        with io.StringIO() as stderr, redirect_stderr(stderr):
+            output = runmanys(many_file, {**BASE_SETTINGS, "runs": 2, "precise_time": precise_time}, from_string=True)
+            errors = stderr.getvalue()
+        assert f'Stdin file "{tmp_path / "missing.txt"}" on line 2 not found. Skipping stdin.' in errors
+        assert ' stdin file at line 1 '.center(60, '-') + f'\n{data}\n' in output
+        assert '\n500000\n' in output
+
+
 def test_disabled1() -> None:
     many_file = '''\
 Stdin for Python:
@@ -0,0 +1,162 @@
+"""Tests running programs on runmany-worker servers started on localhost."""
+
+import io
+import os
+import time
+import socket
+import tempfile
+import threading
+import socketserver
+from contextlib import contextmanager, redirect_stderr, ExitStack
+from typing import Any, Dict, Iterator, List, Optional
+import pytest
+from runmany import runmanys
+from runmany.settings import Settings
+from runmany.util import Printer
+from runmany.worker import Worker, make_server, server_address
+
+MANY_FILE = '''\
+Argv for Python: 1
+Also: 2
+Stdin for Python: a
+Also: b
+Python: import sys
+    print(sys.argv[1:], input())
+Also: print('python')
+Print: printed
+Also: printed again
+'''
+
+TOKEN = 'test token'
+SETTINGS: Dict[str, Any] = {"show_code": True, "show_errors": False, "worker_token": TOKEN}
+
+
+@contextmanager
+def started_worker(languages: Optional[List[str]] = None, address: str = '127.0.0.1:0') -> Iterator[Worker]:
+    with Worker(Settings(Printer(io.StringIO())), 2, TOKEN, languages) as worker:
+        with make_server(address, worker) as server:
+            thread = threading.Thread(target=server.serve_forever, daemon=True)
+            thread.start()
+            setattr(worker, 'address', server_address(server))
+            try:
+                yield worker
+            finally:
+                server.shutdown()
+
+
+@contextmanager
+def started_workers(languages_list: List[Optional[List[str]]]) -> Iterator[List[Worker]]:
+    with ExitStack() as stack:
+        yield [stack.enter_context(started_worker(languages)) for languages in languages_list]
+
+
+def run_on(addresses: List[str], **settings: Any) -> str:
+    return runmanys(MANY_FILE, {**SETTINGS, "workers": addresses, **settings}, from_string=True)
+
+
+def test_workers_match_local() -> None:
+    expected = runmanys(MANY_FILE, SETTINGS, from_string=True)
+    with started_workers([['Python', 'Print'], ['python', 'print'], ['Python', 'Print']]) as workers:
+        assert run_on([getattr(worker, 'address') for worker in workers]) == expected
+        assert sum(worker.programs_run for worker in workers) == 4
+        assert all(worker.programs_run for worker in workers)
+
+
+def test_language_routing() -> None:
+    expected = runmanys(MANY_FILE, SETTINGS, from_string=True)
+    with started_workers([['Print'], ['Python'], []]) as (printer, python, nothing):
+        assert run_on([getattr(worker, 'address') for worker in (printer, python, nothing)]) == expected
+        assert (printer.programs_run, python.programs_run, nothing.programs_run) == (2, 2, 0)
+
+
+def test_worker_loss() -> None:
+    class CrashingHandler(socketserver.StreamRequestHandler):
+        def handle(self) -> None:
+            if b'"info"' in self.rfile.readline():
+                self.wfile.write(b'{"languages": ["python", "print"], "jobs": 4}\n')
+
+    expected = runmanys(MANY_FILE, SETTINGS, from_string=True)
+    with socketserver.ThreadingTCPServer(('127.0.0.1', 0), CrashingHandler) as crashing:
+        threading.Thread(target=crashing.serve_forever, daemon=True).start()
+        with socket.socket() as unused:
+            unused.bind(('127.0.0.1', 0))
+            unused_address = f'127.0.0.1:{unused.getsockname()[1]}'
+        with started_worker(['Python']) as worker:
+            addresses = [server_address(crashing), unused_address, getattr(worker, 'address')]
+            assert run_on(addresses) == expected
+            assert worker.programs_run == 2  # The Print programs were run locally.
+        crashing.shutdown()
+    assert run_on([unused_address]) == expected
+
+
+@pytest.mark.skipif(not hasattr(socket, 'AF_UNIX'), reason='Unix sockets required')
+def test_unix_socket_worker() -> None:
+    expected = runmanys(MANY_FILE, SETTINGS, from_string=True)
+    with tempfile.TemporaryDirectory() as directory:
+        with started_worker(['Python', 'Print'], f'unix:{os.path.join(directory, "worker.sock")}') as worker:
+            assert run_on([getattr(worker, 'address')]) == expected
+            assert worker.programs_run == 4
+
+
+def test_token() -> None:
+    expected = runmanys(MANY_FILE, SETTINGS, from_string=True)
+    with started_worker(['Python', 'Print']) as worker:
+        for token in ('wrong token', ''):
+            with io.StringIO() as stderr, redirect_stderr(stderr):
+                assert run_on([getattr(worker, 'address')], worker_token=token, show_errors=True) == expected
+                assert stderr.getvalue().count('RunMany Error') == 1
+        assert worker.programs_run == 0
+    with pytest.raises(ValueError):
+        Worker(Settings(Printer(io.StringIO())), 2, '')
+
+
+def test_worker_commands() -> None:
+    languages = [{"name": "Python", "command": "echo not run by the worker"}]
+    with started_worker(['Python', 'Print']) as worker:
+        output = run_on([getattr(worker, 'address')], languages=languages)
+        assert worker.programs_run == 4
+    assert 'not run by the worker' not in output
+    assert "['1'] a" in output
+
+
+def test_worker_error_reply() -> None:
+    runs = []
+
+    class FailingHandler(socketserver.StreamRequestHandler):
+        def handle(self) -> None:
+            if b'"info"' in self.rfile.readline():
+                self.wfile.write(b'{"languages": ["python", "print"], "jobs": 4}\n')
+            else:
+                runs.append(1)
+                self.wfile.write(b'{"error": "ValueError: could not run it"}\n')
+
+    with socketserver.ThreadingTCPServer(('127.0.0.1', 0), FailingHandler) as failing:
+        threading.Thread(target=failing.serve_forever, daemon=True).start()
+        with io.StringIO() as stderr, redirect_stderr(stderr):
+            output = run_on([server_address(failing)], show_errors=True)
+            errors = stderr.getvalue()
+        failing.shutdown()
+    assert len(runs) == 4  # The worker is still used after a program fails on it.
+    assert errors.count('"ValueError: could not run it". Skipping program.') == 4
+    assert '0/0 programs successfully run!' in output
+
+
+def test_worker_deadline() -> None:
+    many_file = 'Python: import time; time.sleep(5)\nPython: print(2)\n'
+    with started_worker(['Python']) as worker:
+        start_time = time.perf_counter()
+        output = runmanys(many_file, {**SETTINGS, "workers": [getattr(worker, 'address')], "total_timeout": 1.0},
+                          from_string=True)
+        assert time.perf_counter() - start_time < 3
+    assert '[exit code T]' in output
+
+
+def test_worker_binary_output(tmp_path: Any) -> None:
+    from runmany import runmany  # pylint: disable=import-outside-toplevel
+    many_file = 'Python: import sys; sys.stdout.buffer.write(bytes(range(256)))\n'
+    settings = {**SETTINGS, "languages": [{"name": "Python", "binary_output": True}]}
+    out_path = tmp_path / 'out.txt'
+    with started_worker(['Python']) as worker:
+        runmany(many_file, {**settings, "workers": [getattr(worker, 'address')]}, out_path, from_string=True)
+        assert worker.programs_run == 1
+    assert bytes(range(256)) in out_path.read_bytes()